@@ -0,0 +1,134 @@
+# benchmarks/bench_feed.py
+# Latence de /api/feed pour des comptes qui suivent 5 et 20 chaînes (fusion à
+# la lecture, 20 = seuil FEED_INBOX_THRESHOLD par défaut) et un compte qui en
+# suit 5 000 (fil précalculé), sur une base SQLite temporaire générée ici. La
+# fusion à la lecture est aussi mesurée pour le gros compte, pour montrer ce
+# que le fil précalculé évite.
+#
+#   python benchmarks/bench_feed.py [--creators 6000] [--videos-per-creator 20] [--requests 300]
+import argparse
+import contextvars
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOLLOWS = (5, 20, 5000)
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 if values else 0.0
+
+
+def seed(home, creators, per_creator, rng):
+    now = datetime.utcnow()
+    n_users = creators + len(FOLLOWS)
+    with home.db.engine.begin() as conn:
+        conn.execute(home.User.__table__.insert(), [
+            {"id": i, "email": f"feed{i}@ashn.dev", "display_name": f"feed{i}", "password_hash": "x",
+             "created_at": now, "is_admin": False}
+            for i in range(1, n_users + 1)
+        ])
+        videos = home.Video.__table__
+        batch = []
+        for creator in range(1, creators + 1):
+            for j in range(per_creator):
+                batch.append({
+                    "title": f"Vidéo {creator}-{j}", "category": "jeux", "creator": f"feed{creator}",
+                    "external_url": f"https://cdn.example.com/{creator}/{j}.mp4", "user_id": creator,
+                    "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                })
+            if len(batch) >= 10_000:
+                conn.execute(videos.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(videos.insert(), batch)
+        readers = {}
+        for offset, n in enumerate(FOLLOWS, 1):
+            reader = creators + offset
+            readers[n] = reader
+            conn.execute(home.Follow.__table__.insert(), [
+                {"follower_id": reader, "followed_id": c, "created_at": now}
+                for c in rng.sample(range(1, creators + 1), n)
+            ])
+    return readers
+
+
+def measure(get, url, n):
+    """Latences de ``n`` parcours : première page puis les 4 suivantes par curseur"""
+    first, deep = [], []
+    for _ in range(n):
+        cursor = ""
+        for page in range(5):
+            start = time.perf_counter()
+            data = get(f"{url}?cursor={cursor}").get_json()
+            (first if page == 0 else deep).append(time.perf_counter() - start)
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+    return first, deep
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence du fil d'abonnements de 5 à 5 000 chaînes suivies")
+    parser.add_argument("--creators", type=int, default=6000)
+    parser.add_argument("--videos-per-creator", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=300, help="parcours de 5 pages par cas")
+    args = parser.parse_args()
+    if args.creators < max(FOLLOWS):
+        sys.exit(f"--creators doit valoir au moins {max(FOLLOWS)}")
+
+    tmp = tempfile.mkdtemp(prefix="ashn-feed-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'feed.db')}",
+        UPLOAD_DIR=os.path.join(tmp, "uploads"),
+        DEBUG="False",
+        SERVER_TIMING="False",
+    )
+    sys.path.insert(0, ROOT)
+    import home
+
+    rng = random.Random(42)
+    with home.app.app_context():
+        home.db.create_all()
+        start = time.perf_counter()
+        readers = seed(home, args.creators, args.videos_per_creator, rng)
+        print(f"Base : {args.creators} chaînes × {args.videos_per_creator} vidéos en {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        home.build_feed_inbox_job(readers[max(FOLLOWS)])
+        print(f"Fil précalculé du compte à {max(FOLLOWS)} abonnements : {time.perf_counter() - start:.2f}s")
+        if home.app.config["FEED_INBOX_THRESHOLD"] < max(FOLLOWS[:-1]):
+            print("⚠️  FEED_INBOX_THRESHOLD est inférieur aux petits cas mesurés ici en fusion à la lecture")
+
+    cases = [(f"{n} abonnements", readers[n], None) for n in FOLLOWS]
+    cases.append((f"{max(FOLLOWS)} abonnements, fusion à la lecture", readers[max(FOLLOWS)], False))
+    print(f"{'cas':<44} {'page 1 p50':>10} {'p99':>8} {'pages 2-5 p50':>14} {'p99':>8}")
+    for label, user_id, inbox in cases:
+        if inbox is not None:
+            with home.app.app_context():
+                home.db.session.execute(
+                    home.db.update(home.User).where(home.User.id == user_id).values(feed_inbox=inbox)
+                )
+                home.db.session.commit()
+                home.invalidate_user(user_id)
+        client = home.app.test_client()
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+
+        def get(url):
+            return contextvars.Context().run(client.get, url)
+
+        n = args.requests if inbox is None else max(args.requests // 10, 5)
+        measure(get, "/api/feed", 3)  # préchauffage
+        first, deep = measure(get, "/api/feed", n)
+        print(f"{label:<44} {pct(first, 50):>8.2f}ms {pct(first, 99):>6.2f}ms "
+              f"{pct(deep, 50):>12.2f}ms {pct(deep, 99):>6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
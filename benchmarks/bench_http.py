@@ -0,0 +1,98 @@
+# benchmarks/bench_http.py
+# Octets transférés et latence de /, /watch/<id> et /api/videos selon la
+# négociation : réponse complète non compressée, gzip, brotli, puis
+# revalidation par If-None-Match (304). Le temps de transfert est estimé pour
+# un débit donné (--mbps) ; la latence mesurée est celle du serveur seul.
+#
+#   python benchmarks/seed.py --db /tmp/ashn-bench.db --scale small
+#   python benchmarks/bench_http.py --db /tmp/ashn-bench.db [--requests 200] [--mbps 10]
+import argparse
+import contextvars
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = (
+    ("identité", {}),
+    ("gzip", {"Accept-Encoding": "gzip"}),
+    ("brotli", {"Accept-Encoding": "gzip, br"}),
+)
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 if values else 0.0
+
+
+def measure(get, urls, headers, etags=None):
+    """Latences et tailles moyennes ; avec ``etags``, requêtes conditionnelles"""
+    latencies, sizes, statuses = [], [], {}
+    for url in urls:
+        h = dict(headers)
+        if etags is not None:
+            h["If-None-Match"] = etags[url]
+        start = time.perf_counter()
+        response = get(url, h)
+        latencies.append(time.perf_counter() - start)
+        sizes.append(len(response.data))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return latencies, sum(sizes) / len(sizes), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compression et requêtes conditionnelles sur les routes chaudes")
+    parser.add_argument("--db", required=True, help="base SQLite générée par benchmarks/seed.py")
+    parser.add_argument("--requests", type=int, default=200, help="requêtes par route et par variante")
+    parser.add_argument("--mbps", type=float, default=10.0, help="débit du client pour estimer le transfert")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ashn-http-")
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.abspath(args.db)}",
+        UPLOAD_DIR=os.path.join(tmp, "uploads"),
+        DEBUG="False",
+        SERVER_TIMING="False",
+    )
+    sys.path.insert(0, ROOT)
+    import home
+
+    with home.app.app_context():
+        max_video = home.db.session.query(home.db.func.max(home.Video.id)).scalar()
+        categories = [c for (c,) in home.db.session.query(home.Video.category).distinct()]
+    if not max_video:
+        sys.exit("Base vide : lancez d'abord benchmarks/seed.py")
+    rng = random.Random(args.seed)
+    routes = {
+        "home": [f"/?cat={rng.choice(categories)}" for _ in range(args.requests)],
+        "watch": [f"/watch/{rng.randint(1, max_video)}" for _ in range(args.requests)],
+        "api_videos": [f"/api/videos?cursor=&cat={rng.choice(categories)}&per_page=24" for _ in range(args.requests)],
+    }
+
+    client = home.app.test_client()
+
+    def get(url, headers):
+        return contextvars.Context().run(client.get, url, headers=headers)
+
+    print(f"Compression à partir de {home.app.config['COMPRESS_MIN_SIZE']} octets, "
+          f"brotli {'disponible' if home.http_cache.stats()['brotli'] else 'absent'} ; transfert estimé à {args.mbps:g} Mbit/s")
+    print(f"{'route':<12} {'variante':<18} {'octets':>9} {'p50 serveur':>12} {'p99':>8} {'+ transfert':>12}")
+    for route, urls in routes.items():
+        unique = list(dict.fromkeys(urls))
+        etags = {url: get(url, {}).headers.get("ETag") for url in unique}  # préchauffage (caches, pool)
+        rows = [(label, *measure(get, urls, headers)) for label, headers in VARIANTS]
+        rows.append(("304 (If-None-Match)", *measure(get, urls, {"Accept-Encoding": "gzip, br"}, etags)))
+        for label, latencies, size, statuses in rows:
+            transfer = size * 8 / (args.mbps * 1_000_000) * 1000
+            note = "" if list(statuses) in ([200], [304]) else f"  statuts {statuses}"
+            print(f"{route:<12} {label:<18} {size:>9.0f} {pct(latencies, 50):>10.2f}ms {pct(latencies, 99):>6.2f}ms "
+                  f"{pct(latencies, 50) + transfer:>10.2f}ms{note}")
+    home.view_counter.discard()
+    print(home.http_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_media.py
+# Benchmark du serveur de médias locaux (/media/) sous gunicorn : débit des
+# téléchargements complets et latence des requêtes Range (navigation dans la vidéo).
+#
+#   python benchmarks/bench_media.py [--size-mb 256] [--workers 4] [--clients 16] [--seeks 400]
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, storage_dir, db_path):
+    env = dict(os.environ, LOCAL_STORAGE_DIR=storage_dir, DATABASE_URL=f"sqlite:///{db_path}", DEBUG="False")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "home:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn n'a pas démarré")
+
+
+def fetch(port, path, headers=None):
+    """Retourne (statut, octets reçus, temps jusqu'aux en-têtes, temps total)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("GET", path, headers=headers or {})
+    resp = conn.getresponse()
+    first = time.perf_counter() - start
+    received = 0
+    while True:
+        buf = resp.read(256 * 1024)
+        if not buf:
+            break
+        received += len(buf)
+    conn.close()
+    return resp.status, received, first, time.perf_counter() - start
+
+
+def run_parallel(n_threads, jobs):
+    results, lock = [], threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                job = jobs.pop()
+            res = job()
+            with lock:
+                results.append(res)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du serveur de médias locaux")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--downloads", type=int, default=16)
+    parser.add_argument("--seeks", type=int, default=400)
+    parser.add_argument("--range-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    storage_dir = os.path.join(tmp, "storage")
+    os.makedirs(storage_dir)
+    size = args.size_mb * 1024 * 1024
+    with open(os.path.join(storage_dir, "bench.mp4"), "wb") as fh:
+        for _ in range(args.size_mb):
+            fh.write(os.urandom(1024 * 1024))
+
+    port = free_port()
+    server = start_server(port, args.workers, storage_dir, os.path.join(tmp, "bench.db"))
+    try:
+        # Échauffement : le port est ouvert avant que les workers aient importé l'application
+        warmup = [lambda: fetch(port, "/media/bench.mp4", {"Range": "bytes=0-0"}) for _ in range(args.workers * 4)]
+        run_parallel(args.workers, warmup)
+
+        # Débit : téléchargements complets simultanés du même fichier
+        jobs = [lambda: fetch(port, "/media/bench.mp4") for _ in range(args.downloads)]
+        results, elapsed = run_parallel(args.clients, jobs)
+        assert all(r[0] == 200 and r[1] == size for r in results)
+        total_mb = sum(r[1] for r in results) / 1024 / 1024
+        print(f"téléchargements complets : {len(results)} x {args.size_mb} Mo en {elapsed:.2f} s "
+              f"-> {total_mb / elapsed:.0f} Mo/s")
+
+        # Navigation : plages aléatoires sur le même fichier
+        span = args.range_kb * 1024
+
+        def seek():
+            start = random.randrange(0, size - span)
+            return fetch(port, "/media/bench.mp4", {"Range": f"bytes={start}-{start + span - 1}"})
+
+        results, elapsed = run_parallel(args.clients, [seek for _ in range(args.seeks)])
+        assert all(r[0] == 206 and r[1] == span for r in results)
+        ttfb = [r[2] for r in results]
+        total = [r[3] for r in results]
+        print(f"requêtes Range de {args.range_kb} Ko : {len(results) / elapsed:.0f} req/s, "
+              f"en-têtes p50 {pct(ttfb, 0.5):.2f} ms p99 {pct(ttfb, 0.99):.2f} ms, "
+              f"total p50 {pct(total, 0.5):.2f} ms p99 {pct(total, 0.99):.2f} ms "
+              f"(moyenne {statistics.mean(total) * 1000:.2f} ms)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_render.py
+# Micro-benchmark du rendu de la page d'accueil : ancien rendu par
+# render_template_string (deux compilations par requête) contre les templates
+# enregistrés une fois dans le DictLoader.
+#
+#   python benchmarks/bench_render.py [--iterations 500] [--items 40]
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask import render_template, render_template_string  # noqa: E402
+import home  # noqa: E402
+
+# Reconstitue les templates d'avant : base avec {{ body|safe }} et barre de navigation en ligne
+LEGACY_NAV = home.NAV_HTML.replace("{% if user_name %}", "{% if current_user.is_authenticated %}").replace(
+    "{{ user_name }}", "{{ current_user.display_name }}")
+LEGACY_BASE = home.BASE_HTML.replace("{% block content %}{% endblock %}", "{{ body|safe }}").replace(
+    '{{ fragment("nav.html", user_name=current_user.display_name if current_user.is_authenticated else None) }}',
+    LEGACY_NAV)
+LEGACY_HOME = home.HOME_BODY.replace(
+    '{{ fragment("categories.html", active_cat=active_cat, q=q) }}', home.CATEGORY_BAR_HTML)
+
+
+def fake_items(n):
+    now = datetime.utcnow()
+    return [
+        home.Video(id=i, title=f"Vidéo {i}", creator="ASHN", category="tendance", views=i,
+                   thumb_url=f"https://example.com/{i}.webp", created_at=now)
+        for i in range(n)
+    ]
+
+
+def legacy(ctx):
+    body = render_template_string(LEGACY_HOME, **ctx)
+    return render_template_string(LEGACY_BASE, body=body, year=datetime.utcnow().year, title="ASHN Vidéos — Accueil")
+
+
+def compiled(ctx):
+    return render_template("home.html", title="ASHN Vidéos — Accueil", **ctx)
+
+
+def measure(fn, ctx, iterations):
+    fn(ctx)  # échauffement (compilation / remplissage des caches)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(ctx)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du rendu de la page d'accueil")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--items", type=int, default=40)
+    args = parser.parse_args()
+
+    ctx = {
+        "q": "",
+        "active_cat": "tendance",
+        "items": fake_items(args.items),
+        "categories": home.CATEGORIES,
+        "categories_map": home.CATEGORIES_MAP,
+    }
+    with home.app.test_request_context("/"):
+        before = measure(legacy, ctx, args.iterations)
+        after = measure(compiled, ctx, args.iterations)
+
+    for name, res in (("render_template_string", before), ("templates compilés", after)):
+        print(f"{name:24s} moyenne {res['mean_ms']:.3f} ms  p50 {res['p50_ms']:.3f} ms  p99 {res['p99_ms']:.3f} ms")
+    print(f"gain : x{before['mean_ms'] / after['mean_ms']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# benchmarks/bench_routes.py
+# Charge sur les routes chaudes : home, watch, api_videos, like_video,
+# comment_post et show_profil. Latences p50/p90/p99 et requêtes par seconde,
+# en processus (client de test Flask) et/ou contre un gunicorn local. Chaque
+# exécution est ajoutée en JSON Lines (commit, échelle, résultats) et comparée
+# à la précédente de même configuration pour repérer les régressions.
+#
+#   python benchmarks/seed.py --db /tmp/ashn-bench.db --scale small
+#   python benchmarks/bench_routes.py --db /tmp/ashn-bench.db [--mode both] [--requests 300] [--concurrency 8]
+#
+# Attention : like_video et comment_post écrivent dans la base de benchmark.
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+from seed import BENCH_PASSWORD
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "bench_routes.jsonl")
+# Régression signalée si la médiane dépasse de 20 % celle de l'exécution
+# précédente (le p99 sur quelques centaines de requêtes est trop bruité)
+REGRESSION_THRESHOLD = 1.2
+
+
+class Targets:
+    """Paramètres tirés au hasard parmi les données de la base"""
+
+    def __init__(self, database_url, seed):
+        from sqlalchemy import create_engine
+        engine = create_engine(database_url)
+        with engine.connect() as conn:
+            self.max_video = conn.exec_driver_sql("SELECT MAX(id) FROM videos").scalar() or 0
+            self.max_user = conn.exec_driver_sql("SELECT MAX(id) FROM users").scalar() or 0
+            self.categories = [r[0] for r in conn.exec_driver_sql("SELECT DISTINCT category FROM videos")]
+            self.counts = {
+                table: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+                for table in ("users", "videos", "likes", "comments", "follows")
+            }
+            self.dialect = engine.dialect.name
+        engine.dispose()
+        if not self.max_video or not self.max_user:
+            sys.exit("Base vide : lancez d'abord benchmarks/seed.py")
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def video(self):
+        with self.lock:
+            return self.rng.randint(1, self.max_video)
+
+    def user(self):
+        with self.lock:
+            return self.rng.randint(1, self.max_user)
+
+    def category(self):
+        with self.lock:
+            return self.rng.choice(self.categories)
+
+
+# Route -> (méthode, fabrique du chemin, formulaire, connecté)
+ROUTES = {
+    "home": ("GET", lambda t: f"/?cat={t.category()}", None, False),
+    "watch": ("GET", lambda t: f"/watch/{t.video()}", None, False),
+    "api_videos": ("GET", lambda t: f"/api/videos?cursor=&per_page=12&cat={t.category()}", None, False),
+    "like_video": ("POST", lambda t: f"/video/like/{t.video()}", None, True),
+    "comment_post": ("POST", lambda t: f"/watch/{t.video()}/comment", {"body": "Commentaire de benchmark"}, True),
+    "show_profil": ("GET", lambda t: f"/profil/bench{t.user()}", None, False),
+}
+
+
+def pct(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2) if values else None
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": pct(latencies, 50),
+        "p90_ms": pct(latencies, 90),
+        "p99_ms": pct(latencies, 99),
+        "max_ms": pct(latencies, 100),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_route(send, targets, route, n_requests, concurrency):
+    """n requêtes sur ``concurrency`` threads.
+
+    ``send(slot, method, path, form, logged_in)`` retourne le statut HTTP ; ``slot``
+    (numéro du thread) garde la même session d'une route à l'autre, pour que la
+    connexion (hachage du mot de passe) ne soit pas mesurée.
+    """
+    method, make_path, form, logged_in = ROUTES[route]
+    latencies, errors, lock = [], [0], threading.Lock()
+    remaining = [n_requests]
+
+    def worker(slot):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            path = make_path(targets)
+            start = time.perf_counter()
+            try:
+                status = send(slot, method, path, form, logged_in)
+            except Exception:
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                if status is not None and status < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+
+def inprocess_sender(targets):
+    import home
+    clients = {}
+
+    def client(slot, logged_in):
+        # Un client par thread et par rôle : les cookies ne sont pas partagés
+        c = clients.get((slot, logged_in))
+        if c is None:
+            c = clients[(slot, logged_in)] = home.app.test_client()
+            if logged_in:
+                c.post("/login", data={"email": f"bench{targets.user()}@ashn.dev", "password": BENCH_PASSWORD})
+        return c
+
+    def send(slot, method, path, form, logged_in):
+        return client(slot, logged_in).open(path, method=method, data=form).status_code
+
+    return send
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(port, workers, env):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "home:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn n'a pas démarré")
+
+
+def http_sender(port, targets):
+    cookies = {}
+
+    def request(method, path, form=None, cookie=None):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        try:
+            headers = {"Cookie": cookie} if cookie else {}
+            body = None
+            if form is not None:
+                body = urllib.parse.urlencode(form)
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp
+        finally:
+            conn.close()
+
+    def send(slot, method, path, form, logged_in):
+        cookie = None
+        if logged_in:
+            cookie = cookies.get(slot)
+            if cookie is None:
+                resp = request("POST", "/login", {"email": f"bench{targets.user()}@ashn.dev", "password": BENCH_PASSWORD})
+                cookie = cookies[slot] = (resp.headers.get("Set-Cookie") or "").split(";", 1)[0]
+        return request(method, path, form, cookie).status
+
+    return send
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except OSError:
+        return None, None
+
+
+def previous_run(path, record):
+    """Dernière exécution enregistrée avec le même mode, la même base et les mêmes paramètres"""
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as fh:
+        for line in fh:
+            try:
+                old = json.loads(line)
+            except ValueError:
+                continue
+            if all(old.get(k) == record[k] for k in ("mode", "dataset", "config")):
+                last = old
+    return last
+
+
+def report(record, previous):
+    against = f", comparé à {previous['commit']} du {previous['timestamp']}" if previous else ""
+    print(f"\n== {record['mode']} ({record['commit']}{'+' if record['dirty'] else ''}{against})")
+    print(f"{'route':<14}{'req':>6}{'err':>5}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'req/s':>9}  vs précédent")
+    regressions = 0
+    for route, r in record["routes"].items():
+        delta = ""
+        old = (previous or {}).get("routes", {}).get(route)
+        if old and old.get("p50_ms") and r["p50_ms"] and old.get("p99_ms") and r["p99_ms"]:
+            ratio = r["p50_ms"] / old["p50_ms"]
+            delta = f"p50 {ratio - 1:+.0%}, p99 {r['p99_ms'] / old['p99_ms'] - 1:+.0%}"
+            if ratio > REGRESSION_THRESHOLD:
+                delta += " ⚠️"
+                regressions += 1
+        print(f"{route:<14}{r['requests']:>6}{r['errors']:>5}{r['p50_ms'] or 0:>9.1f}{r['p90_ms'] or 0:>9.1f}"
+              f"{r['p99_ms'] or 0:>9.1f}{r['rps'] or 0:>9.0f}  {delta}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence et débit des routes chaudes")
+    parser.add_argument("--db", help="fichier SQLite rempli par seed.py (sinon DATABASE_URL)")
+    parser.add_argument("--mode", choices=("inprocess", "gunicorn", "both"), default="both")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="routes à mesurer, séparées par des virgules")
+    parser.add_argument("--requests", type=int, default=300, help="requêtes mesurées par route")
+    parser.add_argument("--warmup", type=int, default=20, help="requêtes non mesurées par route")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients simultanés")
+    parser.add_argument("--workers", type=int, default=4, help="workers gunicorn")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="fichier JSON Lines des résultats")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    if "DATABASE_URL" not in os.environ:
+        sys.exit("Indiquez --db ou DATABASE_URL")
+    os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="ashn-bench-"))
+    os.environ["DEBUG"] = "False"
+    sys.path.insert(0, ROOT)
+
+    routes = [r for r in args.routes.split(",") if r]
+    for route in routes:
+        if route not in ROUTES:
+            sys.exit(f"Route inconnue: {route}")
+    targets = Targets(os.environ["DATABASE_URL"], args.seed)
+    commit, dirty = git_revision()
+    modes = ["inprocess", "gunicorn"] if args.mode == "both" else [args.mode]
+
+    regressions = 0
+    for mode in modes:
+        proc = None
+        if mode == "inprocess":
+            send = inprocess_sender(targets)
+            config = {"requests": args.requests, "concurrency": args.concurrency}
+        else:
+            port = free_port()
+            proc = start_gunicorn(port, args.workers, dict(os.environ))
+            send = http_sender(port, targets)
+            config = {"requests": args.requests, "concurrency": args.concurrency, "workers": args.workers}
+        try:
+            results = {}
+            for route in routes:
+                run_route(send, targets, route, args.warmup, args.concurrency)
+                results[route] = run_route(send, targets, route, args.requests, args.concurrency)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit,
+            "dirty": dirty,
+            "mode": mode,
+            # Identifie la base : likes et commentaires augmentent à chaque exécution
+            "dataset": {"dialect": targets.dialect, "users": targets.counts["users"], "videos": targets.counts["videos"]},
+            "counts": targets.counts,
+            "config": config,
+            "python": sys.version.split()[0],
+            "routes": results,
+        }
+        regressions += report(record, previous_run(args.output, record))
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+    print(f"\nRésultats ajoutés à {args.output}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
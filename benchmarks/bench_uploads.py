@@ -0,0 +1,218 @@
+# benchmarks/bench_uploads.py
+# Disponibilité des workers gunicorn pendant des uploads concurrents, face à
+# un faux serveur de stockage Supabase local au débit limité. Mesure le temps
+# de réponse des uploads, le délai jusqu'à l'envoi effectif vers le stockage,
+# et la latence d'une requête légère lancée en continu pendant ce temps.
+#
+#   python benchmarks/bench_uploads.py [--workers 2] [--uploads 8] [--size-mb 16] [--storage-kbps 4096]
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.ZmFrZQ"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fake_storage(kbps):
+    """Serveur qui accepte les uploads de l'API storage Supabase à ``kbps`` Kio/s par connexion"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _read_throttled(self, n):
+            block = 64 * 1024
+            while n > 0:
+                start = time.perf_counter()
+                got = len(self.rfile.read(min(block, n)))
+                if not got:
+                    break
+                n -= got
+                time.sleep(max(0.0, got / (kbps * 1024) - (time.perf_counter() - start)))
+
+        def do_POST(self):
+            length = self.headers.get("Content-Length")
+            if length is not None:
+                self._read_throttled(int(length))
+            else:
+                while True:  # Transfer-Encoding: chunked
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    self._read_throttled(size)
+                    self.rfile.readline()
+            body = json.dumps({"Key": self.path.split("/object/", 1)[-1]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(port, workers, env):
+    subprocess.run(
+        [sys.executable, "-m", "flask", "init-database"],
+        cwd=ROOT, env=dict(env, FLASK_APP="home.py"), check=True, stdout=subprocess.DEVNULL,
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--timeout", "300", "home:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn n'a pas démarré")
+
+
+def request(port, method, path, body=None, headers=None, timeout=300):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        return resp.status, resp.headers, data
+    finally:
+        conn.close()
+
+
+def login(port):
+    form = urllib.parse.urlencode({"email": "demo@ashn.dev", "password": "demo1234"})
+    _, headers, _ = request(port, "POST", "/login", form, {"Content-Type": "application/x-www-form-urlencoded"})
+    cookie = headers.get("Set-Cookie", "")
+    return cookie.split(";", 1)[0]
+
+
+def multipart(file_path, title):
+    boundary = uuid.uuid4().hex
+    with open(file_path, "rb") as fh:
+        data = fh.read()
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="title"\r\n\r\n{title}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="bench.mp4"\r\n'
+        f"Content-Type: video/mp4\r\n\r\n".encode(),
+        data,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ]
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disponibilité des workers pendant des uploads concurrents")
+    parser.add_argument("--workers", type=int, default=2, help="workers gunicorn (sync)")
+    parser.add_argument("--uploads", type=int, default=8, help="uploads simultanés")
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--storage-kbps", type=int, default=4096, help="débit du faux stockage par connexion (Kio/s)")
+    args = parser.parse_args()
+
+    storage = fake_storage(args.storage_kbps)
+    tmp = tempfile.mkdtemp(prefix="ashn-bench-")
+    port = free_port()
+    env = dict(
+        os.environ,
+        SUPABASE_URL=f"http://127.0.0.1:{storage.server_port}",
+        SUPABASE_KEY=FAKE_KEY,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        UPLOAD_DIR=os.path.join(tmp, "uploads"),
+        DEBUG="False",
+    )
+    file_path = os.path.join(tmp, "bench.mp4")
+    with open(file_path, "wb") as fh:
+        fh.write(os.urandom(args.size_mb * 1024 * 1024))
+
+    proc = start_server(port, args.workers, env)
+    try:
+        cookie = login(port)
+        body, content_type = multipart(file_path, "bench")
+        upload_times, video_ids, lock = [], [], threading.Lock()
+        done = threading.Event()
+
+        def upload():
+            start = time.perf_counter()
+            status, headers, _ = request(port, "POST", "/upload", body, {"Content-Type": content_type, "Cookie": cookie})
+            elapsed = time.perf_counter() - start
+            match = re.search(r"/watch/(\d+)", headers.get("Location", ""))
+            with lock:
+                upload_times.append(elapsed)
+                if status == 302 and match:
+                    video_ids.append(int(match.group(1)))
+
+        probes, probe_errors = [], [0]
+
+        def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    request(port, "GET", "/api/videos?cursor=&per_page=1", timeout=30)
+                    probes.append(time.perf_counter() - start)
+                except OSError:
+                    probe_errors[0] += 1
+                time.sleep(0.05)
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        start = time.perf_counter()
+        threads = [threading.Thread(target=upload) for _ in range(args.uploads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        responded = time.perf_counter() - start
+
+        # Attente de l'envoi effectif vers le stockage (statut != pending)
+        pending = set(video_ids)
+        while pending and time.perf_counter() - start < 600:
+            for vid in list(pending):
+                _, _, data = request(port, "GET", f"/api/videos/{vid}/status")
+                if json.loads(data)["transcode_status"] != "pending":
+                    pending.discard(vid)
+            time.sleep(0.2)
+        stored = time.perf_counter() - start
+        done.set()
+        prober.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+        storage.shutdown()
+
+    print(f"{args.uploads} uploads de {args.size_mb} Mo, {args.workers} workers gunicorn, stockage à {args.storage_kbps} Kio/s")
+    print(f"  réponses aux uploads : toutes en {responded:.2f}s (max {max(upload_times):.2f}s, {len(video_ids)} réussis)")
+    print(f"  fichiers dans le stockage : {stored:.2f}s{' (délai dépassé)' if pending else ''}")
+    print(f"  requête légère pendant ce temps : {len(probes)} requêtes, p50 {pct(probes, 50):.1f} ms, "
+          f"p99 {pct(probes, 99):.1f} ms, max {pct(probes, 100):.1f} ms, {probe_errors[0]} erreurs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# benchmarks/seed.py
+# Remplit une base de benchmark à une échelle réaliste : popularité des vidéos
+# en longue traîne, likes uniques par (utilisateur, vidéo), commentaires et
+# abonnements, compteurs dénormalisés cohérents. Génération déterministe
+# (--seed) et par lots : mémoire constante quelle que soit l'échelle.
+#
+#   python benchmarks/seed.py --db /tmp/ashn-bench.db [--scale small|medium|full]
+#   DATABASE_URL=postgresql://... python benchmarks/seed.py --scale full
+#
+# Tous les comptes créés ont le mot de passe BENCH_PASSWORD (bench<i>@ashn.dev).
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SCALES = {
+    #          utilisateurs, vidéos, likes, commentaires, abonnements
+    "small": (1_000, 10_000, 100_000, 50_000, 20_000),
+    "medium": (10_000, 100_000, 1_000_000, 500_000, 200_000),
+    "full": (100_000, 1_000_000, 10_000_000, 5_000_000, 2_000_000),
+}
+BENCH_PASSWORD = "bench1234"
+BATCH_SIZE = 10_000
+START = datetime(2024, 1, 1)
+SPAN = timedelta(days=730)
+
+
+def skewed(rng, n):
+    """Identifiant dans 1..n en longue traîne, puis mélangé pour ne pas favoriser les plus anciens"""
+    rank = int(n * rng.random() ** 3)  # ~55 % des tirages sur les 10 % les plus populaires
+    return (rank * 2654435761) % n + 1
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert(conn, table, rows, label):
+    start = time.perf_counter()
+    count = 0
+    for batch in batches(rows):
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f"  {label}: {count} lignes en {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f}/s)")
+    return count
+
+
+def gen_users(n, password_hash):
+    for i in range(1, n + 1):
+        yield {
+            "id": i,
+            "email": f"bench{i}@ashn.dev",
+            "display_name": f"bench{i}",
+            "handle": f"bench{i}",
+            "password_hash": password_hash,
+            "created_at": START + SPAN * (i / n) / 4,
+            "is_admin": False,
+        }
+
+
+def gen_videos(rng, n, n_users, categories, first_id):
+    for i in range(n):
+        vid = first_id + i
+        yield {
+            "id": vid,
+            "title": f"Vidéo {vid} {rng.choice(('chat', 'musique', 'jeu', 'recette', 'voyage', 'tuto'))}",
+            "description": f"Description de la vidéo {vid}",
+            "category": rng.choice(categories),
+            "external_url": f"https://cdn.example.com/videos/{vid}.mp4",
+            "thumb_url": f"https://cdn.example.com/thumbs/{vid}.webp",
+            "duration": f"{rng.randint(0, 20)}:{rng.randint(0, 59):02d}",
+            "creator": "bench",
+            "views": int(100_000 * rng.random() ** 4),
+            "likes": 0,
+            "dislikes": 0,
+            "comment_count": 0,
+            "user_id": skewed(rng, n_users),
+            "created_at": START + SPAN * (i / n),
+            "transcode_status": "",
+        }
+
+
+def gen_likes(rng, n, n_users, first_video, n_videos):
+    """``n`` likes répartis sur les utilisateurs, sans doublon (utilisateur, vidéo)"""
+    per_user = max(1, n // n_users)
+    produced = 0
+    for user_id in range(1, n_users + 1):
+        want = min(per_user if user_id < n_users else n - produced, n_videos // 2)
+        seen = set()
+        while len(seen) < want:
+            seen.add(first_video - 1 + skewed(rng, n_videos))
+        for video_id in seen:
+            yield {
+                "user_id": user_id,
+                "video_id": video_id,
+                "is_like": rng.random() < 0.9,
+                "created_at": START + SPAN * rng.random(),
+            }
+        produced += want
+        if produced >= n:
+            return
+
+
+def gen_comments(rng, n, n_users, first_video, n_videos):
+    for i in range(n):
+        yield {
+            "video_id": first_video - 1 + skewed(rng, n_videos),
+            "user_id": rng.randint(1, n_users),
+            "body": f"Commentaire {i} : super vidéo !",
+            "created_at": START + SPAN * rng.random(),
+        }
+
+
+def gen_follows(rng, n, n_users):
+    per_user = max(1, n // n_users)
+    for follower in range(1, n_users + 1):
+        seen = set()
+        while len(seen) < min(per_user, n_users - 1):
+            followed = skewed(rng, n_users)
+            if followed != follower:
+                seen.add(followed)
+        for followed in seen:
+            yield {"follower_id": follower, "followed_id": followed, "created_at": START + SPAN * rng.random()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remplit une base de benchmark à échelle réaliste")
+    parser.add_argument("--db", help="fichier SQLite (sinon DATABASE_URL)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.db:
+        if os.path.exists(args.db):
+            sys.exit(f"{args.db} existe déjà : supprimez-le pour repartir d'une base vide")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    elif "DATABASE_URL" not in os.environ:
+        sys.exit("Indiquez --db ou DATABASE_URL")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.security import generate_password_hash
+    import home
+
+    n_users, n_videos, n_likes, n_comments, n_follows = SCALES[args.scale]
+    rng = random.Random(args.seed)
+    categories = [c["id"] for c in home.CATEGORIES]
+    print(f"Échelle {args.scale}: {n_users} utilisateurs, {n_videos} vidéos, {n_likes} likes, "
+          f"{n_comments} commentaires, {n_follows} abonnements")
+
+    start = time.perf_counter()
+    with home.app.app_context():
+        home.db.create_all()
+        engine = home.db.engine
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            home.search.install(conn)
+            first_user = (conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM users").scalar() or 0) + 1
+            first_video = (conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM videos").scalar() or 0) + 1
+        if first_user != 1:
+            sys.exit("La base contient déjà des utilisateurs : utilisez une base vide")
+
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            insert(conn, home.User.__table__, gen_users(n_users, generate_password_hash(BENCH_PASSWORD)), "utilisateurs")
+            insert(conn, home.Video.__table__, gen_videos(rng, n_videos, n_users, categories, first_video), "vidéos")
+            insert(conn, home.Like.__table__, gen_likes(rng, n_likes, n_users, first_video, n_videos), "likes")
+            insert(conn, home.Comment.__table__, gen_comments(rng, n_comments, n_users, first_video, n_videos), "commentaires")
+            insert(conn, home.Follow.__table__, gen_follows(rng, n_follows, n_users), "abonnements")
+
+            t = time.perf_counter()
+            conn.execute(home.db.text(
+                "UPDATE videos SET "
+                "likes = (SELECT COUNT(*) FROM likes WHERE likes.video_id = videos.id AND likes.is_like = :t), "
+                "dislikes = (SELECT COUNT(*) FROM likes WHERE likes.video_id = videos.id AND likes.is_like = :f), "
+                "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.video_id = videos.id)"
+            ), {"t": True, "f": False})
+            videos = home.Video.__table__
+            conn.execute(home.db.update(videos).values(trending=home.trending_sql(videos)))
+            home.recount_users(conn)
+            print(f"  compteurs: {time.perf_counter() - t:.1f}s")
+            if engine.dialect.name == "postgresql":
+                # Identifiants explicites : on recale les séquences
+                for table in ("users", "videos"):
+                    conn.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                    )
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    print(f"✅ Base prête en {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/stress_likes.py
+# Test de charge concurrent des likes/dislikes : plusieurs threads cliquent en
+# même temps (y compris avec le même compte) puis on vérifie que les compteurs
+# de chaque vidéo sont égaux à COUNT(*) sur la table likes. Une séquence de
+# clics déterministe vérifie aussi chaque bascule et le 404 d'une vidéo
+# inexistante. Code de sortie 1 au premier écart : utilisable en CI.
+#
+#   python benchmarks/stress_likes.py [--threads 16] [--clicks 200] [--users 8] [--videos 3]
+#
+# Par défaut une base SQLite temporaire est utilisée ; DATABASE_URL permet de
+# viser une base PostgreSQL de test (elle sera remplie).
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "stress.db")
+
+from home import app, db, User, Video, Like  # noqa: E402
+
+
+def seed(n_users, n_videos):
+    with app.app_context():
+        db.create_all()
+        users = []
+        for i in range(n_users):
+            u = User(email=f"stress{i}-{time.time_ns()}@ashn.dev", display_name=f"stress{i}")
+            u.set_password("stress")
+            db.session.add(u)
+            users.append(u)
+        videos = [Video(title=f"Stress {i}", category="tendance") for i in range(n_videos)]
+        db.session.add_all(videos)
+        db.session.commit()
+        return [u.email for u in users], [v.id for v in videos]
+
+
+def clicker(email, video_ids, clicks, errors):
+    client = app.test_client()
+    client.post("/login", data={"email": email, "password": "stress"})
+    for _ in range(clicks):
+        action = random.choice(("like", "dislike"))
+        r = client.post(f"/video/{action}/{random.choice(video_ids)}")
+        if r.status_code != 200:
+            errors.append(r.status_code)
+
+
+def check_counts(video_ids):
+    """Compteurs de chaque vidéo == COUNT(*) sur likes"""
+    with app.app_context():
+        for vid in video_ids:
+            v = db.session.get(Video, vid)
+            likes = Like.query.filter_by(video_id=vid, is_like=True).count()
+            dislikes = Like.query.filter_by(video_id=vid, is_like=False).count()
+            print(f"vidéo {vid}: compteurs {v.likes}/{v.dislikes}, COUNT(*) {likes}/{dislikes}")
+            assert (v.likes, v.dislikes) == (likes, dislikes), f"vidéo {vid}: écart compteurs / lignes"
+
+
+def check_sequence(email, video_id):
+    """Bascules d'un seul compte sur une vidéo, puis vidéo inexistante"""
+    client = app.test_client()
+    client.post("/login", data={"email": email, "password": "stress"})
+    with app.app_context():
+        v = db.session.get(Video, video_id)
+        mine = Like.query.filter_by(video_id=video_id).join(User).filter(User.email == email).first()
+        likes, dislikes = v.likes, v.dislikes
+    if mine is not None:  # on repart d'une absence de réaction
+        r = client.post(f"/video/{'like' if mine.is_like else 'dislike'}/{video_id}")
+        likes, dislikes = r.get_json()["likes"], r.get_json()["dislikes"]
+    steps = [
+        ("like", (1, 0)),      # ajout
+        ("like", (0, 0)),      # retrait
+        ("dislike", (0, 1)),   # ajout
+        ("like", (1, 0)),      # changement de sens
+        ("dislike", (0, 1)),   # changement de sens
+        ("dislike", (0, 0)),   # retrait
+    ]
+    for action, (d_likes, d_dislikes) in steps:
+        r = client.post(f"/video/{action}/{video_id}")
+        assert r.status_code == 200, f"{action}: statut {r.status_code}"
+        got = (r.get_json()["likes"], r.get_json()["dislikes"])
+        assert got == (likes + d_likes, dislikes + d_dislikes), f"{action}: {got}"
+    with app.app_context():
+        missing = (db.session.query(db.func.max(Video.id)).scalar() or 0) + 1000
+    for action in ("like", "dislike"):
+        r = client.post(f"/video/{action}/{missing}")
+        assert r.status_code == 404, f"{action} sur une vidéo inexistante : statut {r.status_code}"
+    print("séquence de bascules et 404 : OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge concurrent des likes/dislikes")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--clicks", type=int, default=200)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--videos", type=int, default=3)
+    args = parser.parse_args()
+
+    emails, video_ids = seed(args.users, args.videos)
+    errors = []
+    # Plus de threads que d'utilisateurs : le même compte clique en parallèle
+    threads = [
+        threading.Thread(target=clicker, args=(emails[i % len(emails)], video_ids, args.clicks, errors))
+        for i in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = args.threads * args.clicks
+    print(f"{total} clics en {elapsed:.2f} s ({total / elapsed:.0f}/s), {len(errors)} erreurs")
+
+    try:
+        assert not errors, f"statuts en erreur : {sorted(set(errors))}"
+        check_counts(video_ids)
+        check_sequence(emails[0], video_ids[0])
+        check_counts(video_ids)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ Compteurs cohérents")
+
+
+if __name__ == "__main__":
+    main()
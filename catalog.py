@@ -0,0 +1,70 @@
+# catalog.py
+# Lecture en flux d'un catalogue de vidéos (JSON Lines ou CSV) pour l'import
+# en masse : une ligne à la fois, par lots, en mémoire constante.
+import csv
+import itertools
+import json
+
+FIELDS = ("title", "category", "creator", "external_url", "thumb_url", "duration", "user")
+
+
+class CatalogError(ValueError):
+    """Ligne du catalogue illisible ou incomplète"""
+
+    def __init__(self, line, message):
+        super().__init__(f"ligne {line}: {message}")
+        self.line = line
+
+
+def detect_format(filename):
+    return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+
+def read_catalog(fh, fmt):
+    """Itère sur ``(numéro de ligne, dict)`` ; une ligne invalide donne ``(numéro, CatalogError)``"""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        return
+    for line_no, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, CatalogError(line_no, f"JSON invalide ({e})")
+            continue
+        if not isinstance(row, dict):
+            yield line_no, CatalogError(line_no, "objet JSON attendu")
+            continue
+        yield line_no, {k: (str(v).strip() if v is not None else "") for k, v in row.items()}
+
+
+def clean_row(line_no, row, categories, default_category="tendance"):
+    """Normalise une ligne du catalogue ; lève CatalogError si elle est inutilisable"""
+    title = row.get("title", "")
+    external_url = row.get("external_url", "")
+    if not title:
+        raise CatalogError(line_no, "titre manquant")
+    if not external_url.startswith(("http://", "https://")):
+        raise CatalogError(line_no, "external_url manquante ou invalide")
+    category = row.get("category", "")
+    return {
+        "title": title[:200],
+        "category": category if category in categories else default_category,
+        "creator": (row.get("creator") or "Anonyme")[:80],
+        "external_url": external_url[:500],
+        "thumb_url": row.get("thumb_url")[:500] if row.get("thumb_url") else None,
+        "duration": (row.get("duration") or "")[:20],
+        "user": row.get("user", ""),
+    }
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,124 @@
+# db_routing.py
+# Routage lecture / écriture entre la base principale et une réplique en
+# lecture. Les routes déclarées en lecture seule lisent sur la réplique ; toute
+# écriture (flush, INSERT / UPDATE / DELETE) part sur la base principale, et
+# l'utilisateur qui vient d'écrire relit sur la principale pendant quelques
+# secondes (il voit ses propres écritures malgré le retard de la réplique).
+# Les caches partagés (pages, utilisateurs) se remplissent depuis la principale :
+# voir primary().
+import contextlib
+import contextvars
+import time
+
+import sqlalchemy as sa
+from flask import g, request, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = "replica"
+STICKY_KEY = "_db_primary_until"
+
+# Routage de la requête HTTP en cours (None hors requête : CLI, workers de tâches)
+_current = contextvars.ContextVar("db_route", default=None)
+
+
+class Route:
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def _is_write(clause):
+    if isinstance(clause, sa.sql.expression.UpdateBase):
+        return True
+    if isinstance(clause, sa.sql.expression.TextClause):
+        words = clause.text.split(None, 1)
+        return not words or words[0].upper() not in ("SELECT", "WITH", "EXPLAIN")
+    return False
+
+
+class RoutingSession(Session):
+    """Session Flask-SQLAlchemy qui envoie les lectures des routes en lecture seule sur la réplique"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        route = _current.get()
+        if route is not None and bind is None:
+            if self._flushing or _is_write(clause):
+                # Écriture : la suite de la requête relit aussi sur la principale
+                route.wrote = True
+                route.replica = False
+            elif route.replica:
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextlib.contextmanager
+def primary():
+    """Lectures sur la base principale dans le bloc, même dans une route en lecture seule.
+
+    À utiliser pour remplir un cache partagé (pages, utilisateurs) : une entrée
+    lue sur une réplique en retard survivrait à l'invalidation qui l'a périmée.
+    """
+    route = _current.get()
+    if route is None or not route.replica:
+        yield
+        return
+    route.replica = False
+    try:
+        yield
+    finally:
+        if not route.wrote:
+            route.replica = True
+
+
+def engine_options(url, pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping):
+    """Options create_engine() du pool ; SQLite en mémoire garde le pool imposé par Flask-SQLAlchemy"""
+    options = {"pool_pre_ping": pre_ping, "pool_recycle": pool_recycle}
+    backend = sa.engine.make_url(url)
+    if backend.get_backend_name() != "sqlite" or backend.database not in (None, "", ":memory:"):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    return options
+
+
+class ReadRouting:
+    """Branche le routage sur une application Flask : ``@routing.read_only`` marque une route"""
+
+    def __init__(self, sticky_seconds=10.0):
+        self.sticky_seconds = sticky_seconds
+        self.endpoints = set()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def read_only(self, view):
+        self.endpoints.add(view.__name__)
+        return view
+
+    def _before_request(self):
+        replica = request.endpoint in self.endpoints and request.method in ("GET", "HEAD")
+        if replica and STICKY_KEY in session:
+            if session[STICKY_KEY] > time.time():
+                replica = False
+            else:
+                session.pop(STICKY_KEY)
+        g._db_route_token = _current.set(Route(replica))
+
+    def _after_request(self, response):
+        route = _current.get()
+        if route is not None and route.wrote and self.sticky_seconds > 0:
+            session[STICKY_KEY] = time.time() + self.sticky_seconds
+        return response
+
+    @staticmethod
+    def _teardown_request(exc):
+        token = g.pop("_db_route_token", None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                _current.set(None)
@@ -1,12 +1,50 @@
 import os
-from flask import Flask, request, render_template_string, url_for, redirect, abort, jsonify, flash
+import sys
+import click
+import contextvars
+import io
+from flask import Flask, request, render_template, url_for, redirect, abort, jsonify, flash, send_from_directory, session
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload, Session, object_session
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from flask_migrate import Migrate
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+from jinja2 import DictLoader
+from markupsafe import Markup
+import collections
+import functools
+import re
+import unicodedata
+import heapq
+import itertools
+import math
+import sqlite3
+import hmac
 from supabase import create_client, Client
+from storage import SupabaseStorage, LocalStorage, ChunkedUploadStore, UploadError, UrlResolver, BackgroundUploader
+from view_counter import ViewCounter
+import search
+import query_audit
+from media_server import send_media
+from page_cache import PageCache
+from transcode import analyze_video, transcode_hls, format_duration
+from jobs import JobQueue
+from metrics import Instrumentation, Registry as MetricsRegistry
+import catalog
+import db_routing
+from http_cache import HttpCache, weak_etag
+import multiprocessing
+import signal
+import threading
+import base64
+import json
+import tempfile
+import time
 import uuid
 
 # ------------------------------
@@ -19,14 +57,88 @@ app = Flask(__name__)
 app.config.update(
     SQLALCHEMY_DATABASE_URI=os.environ.get("DATABASE_URL", "sqlite:///ashn.db"),
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    DATABASE_REPLICA_URL=os.environ.get("DATABASE_REPLICA_URL", ""),  # réplique en lecture (vide = base principale)
+    DB_POOL_SIZE=int(os.environ.get("DB_POOL_SIZE", 5)),  # connexions gardées par worker et par base
+    DB_MAX_OVERFLOW=int(os.environ.get("DB_MAX_OVERFLOW", 10)),  # connexions en plus lors des pics
+    DB_POOL_TIMEOUT=float(os.environ.get("DB_POOL_TIMEOUT", 10)),  # secondes d'attente d'une connexion libre
+    DB_POOL_RECYCLE=int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # secondes avant de rouvrir une connexion
+    DB_POOL_PRE_PING=os.environ.get("DB_POOL_PRE_PING", "True") == "True",  # vérifie la connexion avant usage
+    REPLICA_STICKY_SECONDS=float(os.environ.get("REPLICA_STICKY_SECONDS", 10)),  # lectures sur la principale après une écriture
     SECRET_KEY=os.environ.get("SECRET_KEY", "dev-ashn-secret-key-change-in-production"),
     MAX_CONTENT_LENGTH=1024 * 1024 * 1024,  # 1 Go max
+    UPLOAD_DIR=os.environ.get("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "ashn-uploads")),
+    UPLOAD_CHUNK_SIZE=int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)),  # 8 Mo par morceau
+    LOCAL_STORAGE_DIR=os.environ.get("LOCAL_STORAGE_DIR", ""),
+    STORAGE_UPLOAD_WORKERS=int(os.environ.get("STORAGE_UPLOAD_WORKERS", 4)),  # threads d'envoi par worker web
+    STORAGE_UPLOAD_MAX_PENDING=int(os.environ.get("STORAGE_UPLOAD_MAX_PENDING", 64)),  # fichiers en attente
+    STORAGE_UPLOAD_ATTEMPTS=int(os.environ.get("STORAGE_UPLOAD_ATTEMPTS", 5)),
+    STORAGE_UPLOAD_BACKOFF=float(os.environ.get("STORAGE_UPLOAD_BACKOFF", 2)),  # secondes, doublées à chaque échec
+    HLS_DIR=os.environ.get("HLS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "hls")),
+    JOB_WORKERS=int(os.environ.get("JOB_WORKERS", 2)),  # processus lancés par `flask worker`
+    JOB_MAX_ATTEMPTS=int(os.environ.get("JOB_MAX_ATTEMPTS", 5)),
+    JOB_BACKOFF_BASE=float(os.environ.get("JOB_BACKOFF_BASE", 5)),  # secondes, doublées à chaque échec
+    JOB_BACKOFF_MAX=float(os.environ.get("JOB_BACKOFF_MAX", 600)),  # secondes
+    JOB_LOCK_TIMEOUT=float(os.environ.get("JOB_LOCK_TIMEOUT", 600)),  # tâche abandonnée au-delà sans battement de cœur
+    JOB_HEARTBEAT_INTERVAL=float(os.environ.get("JOB_HEARTBEAT_INTERVAL", 60)),  # secondes, renouvellement du bail
+    JOB_POLL_INTERVAL=float(os.environ.get("JOB_POLL_INTERVAL", 1)),  # secondes
+    STORAGE_SIGNED_URLS=os.environ.get("STORAGE_SIGNED_URLS", "False") == "True",  # bucket privé
+    STORAGE_URL_TTL=int(os.environ.get("STORAGE_URL_TTL", 3600)),  # secondes
+    STORAGE_SIGNED_URL_EXPIRES=int(os.environ.get("STORAGE_SIGNED_URL_EXPIRES", 3600)),  # secondes
+    VIEW_FLUSH_INTERVAL=float(os.environ.get("VIEW_FLUSH_INTERVAL", 5)),  # secondes
+    USER_CACHE_TTL=int(os.environ.get("USER_CACHE_TTL", 60)),  # secondes ; délai de révocation sur les autres machines
+    PAGE_CACHE_SIZE=int(os.environ.get("PAGE_CACHE_SIZE", 512)),  # pages en mémoire par worker
+    PAGE_CACHE_TTL=int(os.environ.get("PAGE_CACHE_TTL", 60)),  # secondes
+    COMMENTS_PER_PAGE=int(os.environ.get("COMMENTS_PER_PAGE", 20)),
+    API_COUNT_TTL=int(os.environ.get("API_COUNT_TTL", 60)),  # secondes
+    VIEW_FLUSH_MAX_PENDING=int(os.environ.get("VIEW_FLUSH_MAX_PENDING", 1000)),  # vidéos distinctes
+    METRICS_DIR=os.environ.get("METRICS_DIR", ""),  # instantanés des workers (défaut: UPLOAD_DIR/metrics)
+    METRICS_FLUSH_INTERVAL=float(os.environ.get("METRICS_FLUSH_INTERVAL", 5)),  # secondes
+    METRICS_TOKEN=os.environ.get("METRICS_TOKEN", ""),  # jeton Bearer du scraper ; vide = admins seulement
+    SERVER_TIMING=os.environ.get("SERVER_TIMING", "False") == "True",  # en-tête Server-Timing, pour les admins seulement
+    RECO_TOP_K=int(os.environ.get("RECO_TOP_K", 20)),  # voisins conservés par vidéo
+    RECO_MAX_ITEMS_PER_USER=int(os.environ.get("RECO_MAX_ITEMS_PER_USER", 500)),  # échantillon au-delà
+    RECO_BLOCK_SIZE=int(os.environ.get("RECO_BLOCK_SIZE", 500)),  # vidéos par bloc de calcul
+    RECO_COMMENT_WEIGHT=float(os.environ.get("RECO_COMMENT_WEIGHT", 0.5)),  # un like vaut 1
+    TRENDING_DECAY=float(os.environ.get("TRENDING_DECAY", 45000)),  # secondes d'avance pour 10x plus d'engagement
+    TRENDING_VIEW_WEIGHT=float(os.environ.get("TRENDING_VIEW_WEIGHT", 0.05)),
+    TRENDING_LIKE_WEIGHT=float(os.environ.get("TRENDING_LIKE_WEIGHT", 1)),
+    TRENDING_DISLIKE_WEIGHT=float(os.environ.get("TRENDING_DISLIKE_WEIGHT", 1)),
+    TRENDING_COMMENT_WEIGHT=float(os.environ.get("TRENDING_COMMENT_WEIGHT", 2)),
+    FEED_PER_PAGE=int(os.environ.get("FEED_PER_PAGE", 24)),
+    PROFILE_PER_PAGE=int(os.environ.get("PROFILE_PER_PAGE", 24)),  # vidéos par page du profil
+    FEED_INBOX_THRESHOLD=int(os.environ.get("FEED_INBOX_THRESHOLD", 20)),  # abonnements au-delà desquels le fil est précalculé
+    FEED_INBOX_SIZE=int(os.environ.get("FEED_INBOX_SIZE", 1000)),  # vidéos gardées par fil précalculé
+    FEED_FOLLOW_BACKFILL=int(os.environ.get("FEED_FOLLOW_BACKFILL", 50)),  # vidéos reprises d'une nouvelle chaîne suivie
+    COMPRESS_MIN_SIZE=int(os.environ.get("COMPRESS_MIN_SIZE", 1024)),  # octets, en dessous la réponse part telle quelle
+    COMPRESS_GZIP_LEVEL=int(os.environ.get("COMPRESS_GZIP_LEVEL", 6)),
+    COMPRESS_BROTLI_QUALITY=int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5)),
+    HTTP_PAGE_SMAXAGE=int(os.environ.get("HTTP_PAGE_SMAXAGE", 30)),  # secondes en cache partagé (CDN), pages anonymes
+    HTTP_API_MAX_AGE=int(os.environ.get("HTTP_API_MAX_AGE", 5)),  # secondes, /api/videos
     DEBUG=os.environ.get("DEBUG", "True") == "True",
 )
 
 # Fix pour PostgreSQL sur Render
 if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://", "postgresql://", 1)
+if app.config['DATABASE_REPLICA_URL'].startswith("postgres://"):
+    app.config['DATABASE_REPLICA_URL'] = app.config['DATABASE_REPLICA_URL'].replace("postgres://", "postgresql://", 1)
+
+# Pool de connexions de chaque base ; la réplique est un bind sans modèle, choisi par RoutingSession
+def _engine_options(url):
+    return db_routing.engine_options(
+        url,
+        pool_size=app.config["DB_POOL_SIZE"],
+        max_overflow=app.config["DB_MAX_OVERFLOW"],
+        pool_timeout=app.config["DB_POOL_TIMEOUT"],
+        pool_recycle=app.config["DB_POOL_RECYCLE"],
+        pre_ping=app.config["DB_POOL_PRE_PING"],
+    )
+
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+if app.config["DATABASE_REPLICA_URL"]:
+    app.config["SQLALCHEMY_BINDS"] = {
+        db_routing.REPLICA_BIND: {"url": app.config["DATABASE_REPLICA_URL"], **_engine_options(app.config["DATABASE_REPLICA_URL"])},
+    }
 
 # Initialisation Supabase
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
@@ -37,10 +149,75 @@ supabase: Client = None
 if SUPABASE_URL and SUPABASE_KEY:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Backend de stockage : Supabase si configuré, sinon dossier local (dev / tests)
+storage = None
+if supabase:
+    storage = SupabaseStorage(supabase, SUPABASE_BUCKET)
+elif app.config["LOCAL_STORAGE_DIR"]:
+    storage = LocalStorage(app.config["LOCAL_STORAGE_DIR"])
+
+# URLs de lecture mises en cache par chemin de stockage
+url_resolver = None
+if storage:
+    url_resolver = UrlResolver(
+        storage,
+        ttl=app.config["STORAGE_URL_TTL"],
+        signed=app.config["STORAGE_SIGNED_URLS"],
+        signed_expires=app.config["STORAGE_SIGNED_URL_EXPIRES"],
+    )
+
+# Sessions d'upload par morceaux (reprenables)
+upload_store = ChunkedUploadStore(app.config["UPLOAD_DIR"], chunk_size=app.config["UPLOAD_CHUNK_SIZE"])
+
+# Fichiers reçus, gardés sur le disque local jusqu'à leur envoi vers le stockage
+SPOOL_DIR = os.path.join(app.config["UPLOAD_DIR"], "spool")
+os.makedirs(SPOOL_DIR, exist_ok=True)
+background_uploader = None
+if storage:
+    background_uploader = BackgroundUploader(
+        storage,
+        workers=app.config["STORAGE_UPLOAD_WORKERS"],
+        max_pending=app.config["STORAGE_UPLOAD_MAX_PENDING"],
+        attempts=app.config["STORAGE_UPLOAD_ATTEMPTS"],
+        backoff=app.config["STORAGE_UPLOAD_BACKOFF"],
+    )
+
 # Initialisation de la base de données
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={"class_": db_routing.RoutingSession})
 migrate = Migrate(app, db)
 
+# Routes en lecture seule servies par la réplique (@read_routing.read_only)
+read_routing = db_routing.ReadRouting(sticky_seconds=app.config["REPLICA_STICKY_SECONDS"])
+read_routing.init_app(app)
+
+# Mesures par requête (SQL, templates) : en-tête Server-Timing et /metrics
+instrumentation = Instrumentation(
+    MetricsRegistry(
+        app.config["METRICS_DIR"] or os.path.join(app.config["UPLOAD_DIR"], "metrics"),
+        flush_interval=app.config["METRICS_FLUSH_INTERVAL"],
+    ),
+    server_timing=lambda: app.config["SERVER_TIMING"] and current_user.is_authenticated and current_user.is_admin,
+)
+instrumentation.init_app(app)
+instrumentation.init_engine(Engine)  # tous les moteurs, y compris les binds
+instrumentation.watch_pool(lambda: db.engine, (("bind", "primary"),))
+if app.config["DATABASE_REPLICA_URL"]:
+    instrumentation.watch_pool(lambda: db.engines[db_routing.REPLICA_BIND], (("bind", db_routing.REPLICA_BIND),))
+
+# Réponses 304 (ETag) et compression gzip / brotli
+http_cache = HttpCache(
+    min_size=app.config["COMPRESS_MIN_SIZE"],
+    gzip_level=app.config["COMPRESS_GZIP_LEVEL"],
+    brotli_quality=app.config["COMPRESS_BROTLI_QUALITY"],
+)
+http_cache.init_app(app)
+
+# Politiques Cache-Control : pages partagées des anonymes (navigateur toujours
+# revalidé, CDN quelques secondes), pages personnelles, API publique
+PUBLIC_PAGE_CACHE = f"public, max-age=0, s-maxage={app.config['HTTP_PAGE_SMAXAGE']}"
+PRIVATE_PAGE_CACHE = "private, no-cache"
+API_CACHE = f"public, max-age={app.config['HTTP_API_MAX_AGE']}"
+
 # Initialisation de Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -54,9 +231,20 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, index=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    display_name = db.Column(db.String(120), nullable=False)
+    display_name = db.Column(db.String(120), nullable=False, index=True)
+    handle = db.Column(db.String(40), unique=True, index=True, nullable=True)  # URL du profil (/profil/<handle>)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_admin = db.Column(db.Boolean, default=False)
+    feed_inbox = db.Column(db.Boolean, default=False, nullable=False, server_default=db.false())  # fil précalculé (FeedInbox)
+    # Compteurs dénormalisés, mis à jour en relatif dans la transaction qui les change
+    follower_count = db.Column(db.Integer, default=0, nullable=False, server_default="0")
+    following_count = db.Column(db.Integer, default=0, nullable=False, server_default="0")
+    video_count = db.Column(db.Integer, default=0, nullable=False, server_default="0")
+    total_views = db.Column(db.BigInteger, default=0, nullable=False, server_default="0")
+
+    @property
+    def profile_handle(self) -> str:
+        return self.handle or self.display_name
 
     def set_password(self, raw):
         self.password_hash = generate_password_hash(raw)
@@ -65,6 +253,59 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, raw)
 
 
+# -------------------------
+# Score « tendance » (classement « hot » à la Reddit)
+# -------------------------
+# trending = trending_base + signe(e) * log10(max(|e|, 1)), où e est l'engagement
+# pondéré et trending_base = (publication - TRENDING_EPOCH) / TRENDING_DECAY.
+# Le vieillissement est porté par la date de publication : le score d'une
+# vidéo ne change que lorsque ses compteurs changent, dans la même requête
+# UPDATE, et l'ordre reste valable sans jamais recalculer toute la table.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+
+def trending_base_for(created_at) -> float:
+    return ((created_at or datetime.utcnow()) - TRENDING_EPOCH).total_seconds() / app.config["TRENDING_DECAY"]
+
+def trending_score(views=0, likes=0, dislikes=0, comments=0, base=0.0) -> float:
+    c = app.config
+    e = ((views or 0) * c["TRENDING_VIEW_WEIGHT"] + (likes or 0) * c["TRENDING_LIKE_WEIGHT"]
+         - (dislikes or 0) * c["TRENDING_DISLIKE_WEIGHT"] + (comments or 0) * c["TRENDING_COMMENT_WEIGHT"])
+    return base + (math.copysign(math.log10(abs(e)), e) if abs(e) > 1 else 0.0)
+
+def trending_sql(t, views=None, likes=None, dislikes=None, comments=None):
+    """Même score en SQL, à partir des nouvelles valeurs des compteurs (colonnes de ``t`` par défaut)"""
+    c = app.config
+    e = (
+        (views if views is not None else db.func.coalesce(t.c.views, 0)) * c["TRENDING_VIEW_WEIGHT"]
+        + (likes if likes is not None else db.func.coalesce(t.c.likes, 0)) * c["TRENDING_LIKE_WEIGHT"]
+        - (dislikes if dislikes is not None else db.func.coalesce(t.c.dislikes, 0)) * c["TRENDING_DISLIKE_WEIGHT"]
+        + (comments if comments is not None else t.c.comment_count) * c["TRENDING_COMMENT_WEIGHT"]
+    )
+    magnitude = db.case((db.func.abs(e) > 1, db.func.log10(db.func.abs(e))), else_=0.0)
+    return t.c.trending_base + db.func.sign(e) * magnitude
+
+def _default_trending_base(context):
+    return trending_base_for(context.get_current_parameters().get("created_at"))
+
+def _default_trending(context):
+    params = context.get_current_parameters()
+    return trending_score(
+        params.get("views"), params.get("likes"), params.get("dislikes"), params.get("comment_count"),
+        trending_base_for(params.get("created_at")),
+    )
+
+@db.event.listens_for(Engine, "connect")
+def _sqlite_math_functions(dbapi_connection, connection_record):
+    """log10() et sign() pour les SQLite compilés sans les fonctions mathématiques"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    try:
+        dbapi_connection.execute("SELECT log10(10), sign(-1)")
+    except sqlite3.OperationalError:
+        dbapi_connection.create_function("log10", 1, lambda x: math.log10(x) if x and x > 0 else None, deterministic=True)
+        dbapi_connection.create_function("sign", 1, lambda x: None if x is None else (x > 0) - (x < 0), deterministic=True)
+
+
 class Video(db.Model):
     __tablename__ = "videos"
     id = db.Column(db.Integer, primary_key=True)
@@ -72,27 +313,87 @@ class Video(db.Model):
     description = db.Column(db.Text, default="")
     category = db.Column(db.String(40), default="tendance", index=True)
     supabase_path = db.Column(db.String(500), nullable=True)
-    external_url = db.Column(db.String(500), nullable=True)
+    external_url = db.Column(db.String(500), nullable=True, index=True)  # clé naturelle de l'import de catalogue
     thumb_url = db.Column(db.String(500), nullable=True)
     duration = db.Column(db.String(20), default="")
     creator = db.Column(db.String(80), default="Anonyme")
     views = db.Column(db.Integer, default=0)
     likes = db.Column(db.Integer, default=0)
     dislikes = db.Column(db.Integer, default=0)
+    # Renseignés une fois par l'analyse post-upload
+    duration_seconds = db.Column(db.Float, nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    video_codec = db.Column(db.String(20), nullable=True)
+    audio_codec = db.Column(db.String(20), nullable=True)
+    thumb_srcset = db.Column(db.String(2000), nullable=True)
+    comment_count = db.Column(db.Integer, default=0, nullable=False, server_default="0")
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    hls_manifest = db.Column(db.String(500), nullable=True)
+    transcode_status = db.Column(db.String(20), default="")  # pending (envoi), upload_failed, processing, ready, failed
+    # Score « tendance » (voir trending_sql) et sa part due à la date de publication
+    trending_base = db.Column(db.Float, nullable=False, default=_default_trending_base, server_default="0")
+    trending = db.Column(db.Float, nullable=False, default=_default_trending, server_default="0")
+
+    # Listes triées par date : accueil et suggestions (par catégorie), profil, API ;
+    # onglet Tendances : les N meilleurs scores
+    __table_args__ = (
+        db.Index("ix_videos_category_created", "category", "created_at", "id"),
+        db.Index("ix_videos_user_created", "user_id", "created_at"),
+        db.Index("ix_videos_created", "created_at", "id"),
+        db.Index("ix_videos_trending", "trending", "id"),
+    )
+
+    @property
+    def hls_url(self):
+        if self.hls_manifest:
+            return url_for("hls", filename=self.hls_manifest)
+        return ""
 
     @property
     def source_url(self):
-        if self.supabase_path and supabase:
+        if self.supabase_path and url_resolver:
             try:
-                res = supabase.storage.from_(SUPABASE_BUCKET).get_public_url(self.supabase_path)
-                return res
+                res = url_resolver.resolve(self.supabase_path)
+                if res:
+                    return res
             except:
                 pass
         return self.external_url or ""
 
 
+# Cache des pages d'accueil, invalidé par catégorie quand une vidéo change
+page_cache = PageCache(
+    os.path.join(app.config["UPLOAD_DIR"], "page-cache"),
+    maxsize=app.config["PAGE_CACHE_SIZE"],
+    ttl=app.config["PAGE_CACHE_TTL"],
+)
+
+def _touched_category(mapper, connection, target):
+    """Note les catégories modifiées ; elles sont invalidées au commit"""
+    tags = object_session(target).info.setdefault("page_cache_tags", set())
+    tags.add(target.category)
+    tags.add(TRENDING_TAB)  # l'onglet Tendances montre toutes les catégories
+    history = sa_inspect(target).attrs.category.history
+    tags.update(c for c in history.deleted if c)
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    db.event.listen(Video, _event, _touched_category)
+
+@db.event.listens_for(Session, "after_commit")
+def _invalidate_page_cache(sess):
+    for category in sess.info.pop("page_cache_tags", ()):
+        page_cache.invalidate(category)
+
+@db.event.listens_for(Session, "after_rollback")
+def _discard_page_cache_tags(sess):
+    sess.info.pop("page_cache_tags", None)
+
+# Index plein texte créé avec la table (triggers FTS5 / colonne tsvector)
+db.event.listen(Video.__table__, "after_create", lambda target, connection, **kw: search.install(connection))
+
+
 class Comment(db.Model):
     __tablename__ = "comments"
     id = db.Column(db.Integer, primary_key=True)
@@ -104,6 +405,9 @@ class Comment(db.Model):
     user = db.relationship('User', backref='comments', lazy=True)
     video = db.relationship('Video', backref='comments', lazy=True)
 
+    # Pagination par clé des commentaires d'une vidéo
+    __table_args__ = (db.Index("ix_comments_video_created", "video_id", "created_at", "id"),)
+
 
 class Like(db.Model):
     __tablename__ = "likes"
@@ -113,7 +417,11 @@ class Like(db.Model):
     is_like = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint("user_id", "video_id", name="unique_user_video_like"),)
+    # (user_id, video_id) est couvert par la contrainte unique ; comptage par vidéo
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "video_id", name="unique_user_video_like"),
+        db.Index("ix_likes_video", "video_id", "is_like"),
+    )
 
 
 class Follow(db.Model):
@@ -123,12 +431,67 @@ class Follow(db.Model):
     followed_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint("follower_id", "followed_id", name="unique_follow"),)
+    # (follower_id, followed_id) est couvert par la contrainte unique ; abonnés d'un compte
+    __table_args__ = (
+        db.UniqueConstraint("follower_id", "followed_id", name="unique_follow"),
+        db.Index("ix_follows_followed", "followed_id", "follower_id"),
+    )
+
+
+class FeedInbox(db.Model):
+    """Fil d'abonnements précalculé des comptes qui suivent beaucoup de chaînes.
+
+    Alimenté à la publication (tâche fanout_feed) ; les autres comptes
+    reconstituent leur fil à la lecture (voir feed_page).
+    """
+    __tablename__ = "feed_inbox"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    video_id = db.Column(db.Integer, db.ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    creator_id = db.Column(db.Integer, nullable=False)  # retrait d'une chaîne au désabonnement
+    created_at = db.Column(db.DateTime, nullable=False)  # date de la vidéo
+
+    # Lecture du fil par pages (created_at, video_id) décroissantes
+    __table_args__ = (db.Index("ix_feed_inbox_user_created", "user_id", "created_at", "video_id"),)
+
+
+class Recommendation(db.Model):
+    """Voisins d'une vidéo par co-engagement, recalculés par `flask build-recommendations`"""
+    __tablename__ = "video_recommendations"
+    video_id = db.Column(db.Integer, db.ForeignKey("videos.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 = plus proche voisin
+    recommended_id = db.Column(db.Integer, db.ForeignKey("videos.id"), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Tâche de fond exécutée par `flask worker` (voir jobs.py)"""
+    __tablename__ = "jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(60), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # prochaine tentative
+    locked_by = db.Column(db.String(120), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Réservation de la prochaine tâche due
+    __table_args__ = (db.Index("ix_jobs_status_run_at", "status", "run_at"),)
 
 
 # -------------------------
 # Données constantes
 # -------------------------
+TRENDING_TAB = "tendance"  # onglet par défaut : toutes catégories, par score tendance
+
 CATEGORIES = [
     {"id": "tendance", "label": "Tendances"},
     {"id": "jeux", "label": "Jeux"},
@@ -138,45 +501,420 @@ CATEGORIES = [
 CATEGORIES_MAP = {c["id"]: c for c in CATEGORIES}
 ALLOWED_EXTENSIONS = {"mp4", "webm", "ogg", "mov", "m4v"}
 
+# -------------------------
+# Compteur de vues (write-behind)
+# -------------------------
+def flush_views(deltas):
+    """Écrit les vues accumulées (et le score tendance) en une seule requête UPDATE groupée"""
+    t = Video.__table__
+    views = db.func.coalesce(t.c.views, 0) + db.bindparam("delta")
+    params = [{"video_id": d["id"], "delta": d["delta"]} for d in deltas]
+    owner = db.select(t.c.user_id).where(t.c.id == db.bindparam("video_id")).scalar_subquery()
+    with app.app_context():
+        db.session.execute(
+            db.update(t).where(t.c.id == db.bindparam("video_id"))
+            .values(views=views, trending=trending_sql(t, views=views)),
+            params,
+        )
+        db.session.execute(
+            db.update(User.__table__).where(User.__table__.c.id == owner)
+            .values(total_views=User.__table__.c.total_views + db.bindparam("delta")),
+            params,
+        )
+        db.session.commit()
+
+view_counter = ViewCounter(
+    flush_views,
+    interval=app.config["VIEW_FLUSH_INTERVAL"],
+    max_pending=app.config["VIEW_FLUSH_MAX_PENDING"],
+)
+
 # -------------------------
 # Login manager
 # -------------------------
+class CachedUser(UserMixin):
+    """Copie en lecture seule des champs utilisés à chaque requête.
+
+    Tout autre attribut charge l'utilisateur depuis la base à la demande.
+    """
+
+    FIELDS = ("id", "email", "display_name", "is_admin", "created_at", "feed_inbox")
+
+    def __init__(self, user: "User"):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(user, field))
+
+    def __getattr__(self, name):
+        return getattr(db.session.get(User, self.id), name)
+
+# Utilisateurs connectés en cache quelques secondes ; invalidés au bannissement / à la promotion.
+# L'invalidation passe par des fichiers de UPLOAD_DIR : immédiate pour les workers
+# de la même machine (ou partageant ce dossier), sinon effective après USER_CACHE_TTL.
+user_cache = PageCache(
+    os.path.join(app.config["UPLOAD_DIR"], "user-cache"),
+    maxsize=10000,
+    ttl=app.config["USER_CACHE_TTL"],
+)
+
+def invalidate_user(user_id: int):
+    user_cache.invalidate(f"user-{user_id}")
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+
+    def fetch():
+        # Cache partagé : lu sur la principale pour qu'une invalidation (bannissement,
+        # rétrogradation) ne soit pas suivie d'une copie périmée venue de la réplique
+        with db_routing.primary():
+            u = db.session.get(User, user_id, populate_existing=True)
+        return CachedUser(u) if u else None
+
+    return user_cache.get_or_render(("user", user_id), f"user-{user_id}", fetch)
 
 # -------------------------
 # Utils
 # -------------------------
+def make_handle(display_name: str) -> str:
+    """Identifiant d'URL unique dérivé du nom affiché (« Élodie M. » -> elodie-m, elodie-m-2...)"""
+    ascii_name = unicodedata.normalize("NFKD", display_name).encode("ascii", "ignore").decode()
+    base = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")[:30] or "chaine"
+    taken = set(db.session.execute(
+        db.select(User.handle).where(db.or_(User.handle == base, User.handle.like(f"{base}-%")))
+    ).scalars())
+    handle, n = base, 1
+    while handle in taken:
+        n += 1
+        handle = f"{base}-{n}"
+    return handle
+
+def adjust_user_counts(user_id: int, **deltas):
+    """Ajoute ``deltas`` (follower_count=1, video_count=-1...) aux compteurs de l'utilisateur, dans la transaction en cours"""
+    if user_id is None:
+        return
+    db.session.execute(
+        db.update(User).where(User.id == user_id)
+        .values({getattr(User, name): getattr(User, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+
+def recount_users(conn):
+    """Recalcule tous les compteurs des utilisateurs à partir des lignes (réparation, migration, seed)"""
+    conn.execute(db.text(
+        "UPDATE users SET "
+        "follower_count = (SELECT COUNT(*) FROM follows WHERE follows.followed_id = users.id), "
+        "following_count = (SELECT COUNT(*) FROM follows WHERE follows.follower_id = users.id), "
+        "video_count = (SELECT COUNT(*) FROM videos WHERE videos.user_id = users.id), "
+        "total_views = (SELECT COALESCE(SUM(views), 0) FROM videos WHERE videos.user_id = users.id)"
+    ))
+
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def upload_to_supabase(file_data, filename: str) -> str:
-    """Upload un fichier vers Supabase Storage et retourne le chemin"""
-    if not supabase:
-        raise Exception("Supabase n'est pas configuré")
-    
+def storage_name(filename: str):
+    """Nom unique dans le stockage et type MIME d'un fichier envoyé"""
     ext = filename.rsplit(".", 1)[1].lower() if "." in filename else "mp4"
-    unique_name = f"{uuid.uuid4()}.{ext}"
-    
+    return f"{uuid.uuid4()}.{ext}", f"video/{ext}"
+
+def create_uploaded_video(local_path: str, filename: str, form) -> "Video":
+    """Crée la vidéo (en attente) et met le fichier en file d'envoi vers le stockage.
+
+    ``local_path`` est déplacé dans le dossier d'envoi : la requête se termine
+    dès que le fichier est sur le disque local, sans attendre le stockage. Si
+    l'envoi est refusé (UploadError), le fichier est remis à ``local_path`` :
+    l'appelant peut réessayer.
+    """
+    if not background_uploader:
+        raise UploadError("Supabase n'est pas configuré", 503)
+    name, content_type = storage_name(filename)
+    spooled = os.path.join(SPOOL_DIR, name)
+    os.replace(local_path, spooled)
+
+    category = form.get("category") or "tendance"
+    v = Video(
+        title=(form.get("title") or "Sans titre").strip(),
+        description=(form.get("description") or "").strip(),
+        category=category if category in CATEGORIES_MAP else "tendance",
+        supabase_path=name,
+        thumb_url=None,  # rempli par l'analyse post-upload
+        duration="",
+        creator=(form.get("creator") or current_user.display_name or "Anonyme").strip(),
+        user_id=current_user.id,
+        transcode_status="pending",
+    )
+    db.session.add(v)
+    adjust_user_counts(current_user.id, video_count=1)
+    db.session.commit()
     try:
-        res = supabase.storage.from_(SUPABASE_BUCKET).upload(
-            unique_name,
-            file_data,
-            {"content-type": f"video/{ext}"}
-        )
-        return unique_name
-    except Exception as e:
-        print(f"Erreur upload Supabase: {e}")
+        background_uploader.submit(name, spooled, content_type, functools.partial(upload_pushed, v.id, spooled))
+    except UploadError:
+        db.session.delete(v)
+        adjust_user_counts(current_user.id, video_count=-1)
+        db.session.commit()
+        os.replace(spooled, local_path)
         raise
+    return v
+
+def upload_pushed(video_id: int, local_path: str, error):
+    """Fin de l'envoi vers le stockage : lance le traitement, ou marque l'échec.
+
+    En cas d'échec le fichier reste dans le dossier d'envoi pour `flask resume-uploads`.
+    """
+    with app.app_context():
+        v = db.session.get(Video, video_id)
+        if v is not None:
+            if error is None:
+                submit_processing(v)
+                job_queue.enqueue("fanout_feed", {"first_id": v.id, "last_id": v.id}, key=f"fanout-video-{v.id}")
+            else:
+                v.transcode_status = "upload_failed"
+            db.session.commit()
+    if error is None or v is None:
+        os.remove(local_path)
+
+# -------------------------
+# Tâches de fond (flask worker) : analyse, miniatures, HLS, réparation des compteurs
+# -------------------------
+job_queue = JobQueue(
+    Job,
+    db.session,
+    app.app_context,
+    max_attempts=app.config["JOB_MAX_ATTEMPTS"],
+    backoff_base=app.config["JOB_BACKOFF_BASE"],
+    backoff_max=app.config["JOB_BACKOFF_MAX"],
+    lock_timeout=app.config["JOB_LOCK_TIMEOUT"],
+    heartbeat_interval=app.config["JOB_HEARTBEAT_INTERVAL"],
+    poll_interval=app.config["JOB_POLL_INTERVAL"],
+)
+
+def transcode_source(v: "Video") -> str:
+    """Chemin local ou URL absolue lisible par ffmpeg"""
+    if v.supabase_path and isinstance(storage, LocalStorage):
+        return storage.path_for(v.supabase_path)
+    if v.supabase_path and url_resolver:
+        return url_resolver.resolve(v.supabase_path)
+    return v.external_url or ""
+
+def submit_processing(v: "Video"):
+    """Met en file l'analyse de la vidéo (durée, résolution, miniatures), suivie du HLS.
+
+    La tâche est ajoutée dans la transaction de l'appelant : elle n'existe que
+    si la vidéo est bien enregistrée.
+    """
+    if not transcode_source(v):
+        return
+    v.transcode_status = "processing"
+    db.session.flush()
+    job_queue.enqueue("analyze_video", {"video_id": v.id}, key=f"analyze-video-{v.id}")
+
+def store_thumbnails(thumbnails: dict) -> dict:
+    """Envoie les miniatures WebP dans le stockage et retourne {largeur: URL}"""
+    urls = {}
+    for width, local_path in sorted(thumbnails.items()):
+        path = "thumbs/" + os.path.basename(local_path)
+        try:
+            storage.upload(path, local_path, "image/webp")
+            urls[width] = storage.get_public_url(path)
+        finally:
+            os.remove(local_path)
+    return urls
+
+def video_failed(payload: dict, error: Exception):
+    Video.query.filter_by(id=payload["video_id"]).update({"transcode_status": "failed"})
+
+def analysis_failed(payload: dict, error: Exception):
+    # Sans métadonnées, le transcodage relira la source lui-même
+    submit_transcode(payload["video_id"])
+
+@job_queue.handler("analyze_video", on_failure=analysis_failed)
+def analyze_video_job(video_id: int):
+    v = db.session.get(Video, video_id)
+    if v is None:
+        return None
+    thumbs_dir = os.path.join(app.config["UPLOAD_DIR"], "thumbs")
+    media = analyze_video(transcode_source(v), thumbs_dir, uuid.uuid4().hex)
+    urls = store_thumbnails(media.pop("thumbnails"))
+    main_width = 640 if 640 in urls else max(urls)
+    v.duration = format_duration(media["duration"])
+    v.duration_seconds = media["duration"]
+    v.width, v.height = media["width"], media["height"]
+    v.video_codec, v.audio_codec = media["video_codec"], media["audio_codec"]
+    v.thumb_url = urls[main_width]
+    v.thumb_srcset = ", ".join(f"{url} {w}w" for w, url in sorted(urls.items()))
+    submit_transcode(video_id, media)
+    db.session.commit()
+    return media
+
+def submit_transcode(video_id: int, media: dict = None):
+    """Met la vidéo en file pour le transcodage HLS (dans la transaction en cours)"""
+    job_queue.enqueue(
+        "transcode_video",
+        {"video_id": video_id, "media": media},
+        key=f"transcode-video-{video_id}",
+    )
+
+@job_queue.handler("transcode_video", max_attempts=3, on_failure=video_failed)
+def transcode_video_job(video_id: int, media: dict = None):
+    v = db.session.get(Video, video_id)
+    if v is None:
+        return None
+    os.makedirs(app.config["HLS_DIR"], exist_ok=True)
+    manifest = transcode_hls(transcode_source(v), app.config["HLS_DIR"], str(video_id), media)
+    v.hls_manifest, v.transcode_status = manifest, "ready"
+    db.session.commit()
+    return {"manifest": manifest}
+
+@job_queue.handler("repair_counters")
+def repair_counters_job(video_id: int):
+    """Recalcule likes, dislikes et commentaires d'une vidéo à partir des lignes"""
+    counts = db.session.execute(db.text(
+        "UPDATE videos SET "
+        "likes = (SELECT COUNT(*) FROM likes WHERE video_id = :v AND is_like = :t), "
+        "dislikes = (SELECT COUNT(*) FROM likes WHERE video_id = :v AND is_like = :f), "
+        "comment_count = (SELECT COUNT(*) FROM comments WHERE video_id = :v) "
+        "WHERE id = :v RETURNING likes, dislikes, comment_count"
+    ), {"v": video_id, "t": True, "f": False}).first()
+    t = Video.__table__
+    db.session.execute(db.update(t).where(t.c.id == video_id).values(trending=trending_sql(t)))
+    db.session.commit()
+    return dict(counts._mapping) if counts else None
+
+@job_queue.handler("fanout_feed")
+def fanout_feed_job(first_id: int, last_id: int):
+    """Ajoute les vidéos first_id..last_id aux fils précalculés des abonnés (idempotent)"""
+    added = db.session.execute(db.text(
+        "INSERT INTO feed_inbox (user_id, video_id, creator_id, created_at) "
+        "SELECT f.follower_id, v.id, v.user_id, v.created_at FROM videos v "
+        "JOIN follows f ON f.followed_id = v.user_id "
+        "JOIN users u ON u.id = f.follower_id "
+        "WHERE v.id BETWEEN :a AND :b AND u.feed_inbox = :t "
+        "ON CONFLICT (user_id, video_id) DO NOTHING"
+    ), {"a": first_id, "b": last_id, "t": True}).rowcount
+    db.session.commit()
+    return {"added": added}
+
+def backfill_inbox(user_id: int, creator_id: int = None):
+    """Reprend dans le fil précalculé les dernières vidéos de chaque chaîne suivie (ou de ``creator_id``)"""
+    params = {"u": user_id, "n": app.config["FEED_FOLLOW_BACKFILL"]}
+    creator = ""
+    if creator_id is not None:
+        creator, params["c"] = "AND f.followed_id = :c ", creator_id
+    db.session.execute(db.text(
+        "INSERT INTO feed_inbox (user_id, video_id, creator_id, created_at) "
+        "SELECT :u, id, user_id, created_at FROM ("
+        "  SELECT v.id, v.user_id, v.created_at, ROW_NUMBER() OVER ("
+        "    PARTITION BY v.user_id ORDER BY v.created_at DESC, v.id DESC) AS rn "
+        "  FROM follows f JOIN videos v ON v.user_id = f.followed_id "
+        f"  WHERE f.follower_id = :u {creator}"
+        ") recent WHERE rn <= :n "
+        "ON CONFLICT (user_id, video_id) DO NOTHING"
+    ), params)
+
+def trim_inbox(user_id: int) -> int:
+    """Ne garde que les FEED_INBOX_SIZE vidéos les plus récentes du fil précalculé"""
+    boundary = db.session.execute(
+        db.select(FeedInbox.created_at, FeedInbox.video_id)
+        .where(FeedInbox.user_id == user_id)
+        .order_by(FeedInbox.created_at.desc(), FeedInbox.video_id.desc())
+        .offset(app.config["FEED_INBOX_SIZE"]).limit(1)
+    ).first()
+    if boundary is None:
+        return 0
+    return db.session.execute(db.delete(FeedInbox).where(
+        FeedInbox.user_id == user_id,
+        db.or_(
+            FeedInbox.created_at < boundary.created_at,
+            db.and_(FeedInbox.created_at == boundary.created_at, FeedInbox.video_id <= boundary.video_id),
+        ),
+    )).rowcount
+
+@job_queue.handler("build_feed_inbox")
+def build_feed_inbox_job(user_id: int):
+    """Passe un compte au fil précalculé : activation et reprise dans la même transaction"""
+    updated = db.session.execute(
+        db.update(User).where(User.id == user_id, User.feed_inbox.is_(False)).values(feed_inbox=True)
+    ).rowcount
+    if not updated:
+        db.session.rollback()
+        return None
+    backfill_inbox(user_id)
+    trim_inbox(user_id)
+    db.session.commit()
+    invalidate_user(user_id)
+    return {"inbox": db.session.query(FeedInbox).filter_by(user_id=user_id).count()}
+
+def run_worker(kinds=None, burst: bool = False):
+    """Point d'entrée d'un processus worker (arrêt propre sur SIGTERM / Ctrl+C)"""
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    processed = job_queue.work(stop, kinds=kinds, burst=burst)
+    print(f"Worker {os.getpid()} arrêté ({processed} tâches)")
+
+def encode_cursor(v) -> str:
+    """Curseur opaque pointant après ``v`` (vidéo, commentaire) dans l'ordre (created_at, id) décroissant"""
+    raw = json.dumps({"c": v.created_at.isoformat(), "i": v.id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Retourne (created_at, id) ou lève ValueError si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["c"]), int(data["i"])
+    except Exception:
+        raise ValueError("Curseur invalide")
+
+def encode_score_cursor(v) -> str:
+    """Curseur opaque pointant après ``v`` dans l'ordre (trending, id) décroissant"""
+    raw = json.dumps({"s": v.trending, "i": v.id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_score_cursor(cursor: str):
+    """Retourne (trending, id) ou lève ValueError si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return float(data["s"]), int(data["i"])
+    except Exception:
+        raise ValueError("Curseur invalide")
+
+def listing_query(cat):
+    """Vidéos d'un onglet et leur colonne de tri (départagée par id) : l'onglet
+    Tendances couvre toutes les catégories par score, les autres une catégorie par date"""
+    if cat == TRENDING_TAB:
+        return Video.query, Video.trending  # parcours de ix_videos_trending
+    query = Video.query.filter_by(category=cat) if cat else Video.query
+    return query, Video.created_at
+
+# Nombre total de résultats par (catégorie, recherche), mis en cache quelques secondes
+_count_cache = {}
+
+def cached_count(key, query) -> int:
+    now = time.monotonic()
+    hit = _count_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    if len(_count_cache) > 1000:
+        _count_cache.clear()
+    total = query.count()
+    _count_cache[key] = (now + app.config["API_COUNT_TTL"], total)
+    return total
 
 def init_db():
     """Initialise la base de données avec des données de test"""
     with app.app_context():
         try:
             db.create_all()
+            # create_all ignore les tables existantes : on ajoute les index manquants
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(db.engine, checkfirst=True)
+            # Bases existantes : create_all ne recrée pas la table videos
+            with db.engine.begin() as conn:
+                search.install(conn)
             if User.query.count() == 0:
-                u = User(email="demo@ashn.dev", display_name="Demo")
+                u = User(email="demo@ashn.dev", display_name="Demo", handle="demo")
                 u.set_password("demo1234")
                 db.session.add(u)
                 db.session.commit()
@@ -196,6 +934,7 @@ def init_db():
                         user_id=user.id,
                     )
                     db.session.add(demo)
+                    adjust_user_counts(user.id, video_count=1)
                     db.session.commit()
                     print("✅ Vidéo de démo créée")
         except Exception as e:
@@ -224,26 +963,7 @@ BASE_HTML = """<!DOCTYPE html>
     </style>
 </head>
 <body class="bg-darker">
-    <nav class="bg-dark shadow-lg border-b border-dark sticky top-0 z-50">
-        <div class="container mx-auto px-4 py-3 flex items-center justify-between">
-            <a href="{{ url_for('home') }}" class="text-2xl font-bold text-red-600 flex items-center">
-                <svg class="w-8 h-8 mr-2" fill="currentColor" viewBox="0 0 20 20">
-                    <path d="M10 18a8 8 0 100-16 8 8 0 000 16zM9.555 7.168A1 1 0 008 8v4a1 1 0 001.555.832l3-2a1 1 0 000-1.664l-3-2z"/>
-                </svg>
-                ASHN Vidéos
-            </a>
-            <div class="flex items-center space-x-4">
-                {% if current_user.is_authenticated %}
-                    <a href="{{ url_for('upload_form') }}" class="bg-red-600 text-white px-4 py-2 rounded-lg hover:bg-red-700 transition">Upload</a>
-                    <span class="text-gray">{{ current_user.display_name }}</span>
-                    <a href="{{ url_for('logout') }}" class="text-gray hover:text-white transition">Déconnexion</a>
-                {% else %}
-                    <a href="{{ url_for('login') }}" class="text-red-500 hover:text-red-400 transition">Connexion</a>
-                    <a href="{{ url_for('register') }}" class="bg-red-600 text-white px-4 py-2 rounded-lg hover:bg-red-700 transition">Inscription</a>
-                {% endif %}
-            </div>
-        </div>
-    </nav>
+    {{ fragment("nav.html", user_name=current_user.display_name if current_user.is_authenticated else None) }}
     
     {% with messages = get_flashed_messages() %}
         {% if messages %}
@@ -255,7 +975,7 @@ BASE_HTML = """<!DOCTYPE html>
         {% endif %}
     {% endwith %}
     
-    {{ body|safe }}
+    {% block content %}{% endblock %}
     
     <footer class="bg-dark text-gray text-center py-6 mt-12 border-t border-dark">
         <p>&copy; {{ year }} ASHN Vidéos</p>
@@ -263,6 +983,41 @@ BASE_HTML = """<!DOCTYPE html>
 </body>
 </html>"""
 
+NAV_HTML = """
+<nav class="bg-dark shadow-lg border-b border-dark sticky top-0 z-50">
+    <div class="container mx-auto px-4 py-3 flex items-center justify-between">
+        <a href="{{ url_for('home') }}" class="text-2xl font-bold text-red-600 flex items-center">
+            <svg class="w-8 h-8 mr-2" fill="currentColor" viewBox="0 0 20 20">
+                <path d="M10 18a8 8 0 100-16 8 8 0 000 16zM9.555 7.168A1 1 0 008 8v4a1 1 0 001.555.832l3-2a1 1 0 000-1.664l-3-2z"/>
+            </svg>
+            ASHN Vidéos
+        </a>
+        <div class="flex items-center space-x-4">
+            {% if user_name %}
+                <a href="{{ url_for('feed') }}" class="text-gray hover:text-white transition">Abonnements</a>
+                <a href="{{ url_for('upload_form') }}" class="bg-red-600 text-white px-4 py-2 rounded-lg hover:bg-red-700 transition">Upload</a>
+                <span class="text-gray">{{ user_name }}</span>
+                <a href="{{ url_for('logout') }}" class="text-gray hover:text-white transition">Déconnexion</a>
+            {% else %}
+                <a href="{{ url_for('login') }}" class="text-red-500 hover:text-red-400 transition">Connexion</a>
+                <a href="{{ url_for('register') }}" class="bg-red-600 text-white px-4 py-2 rounded-lg hover:bg-red-700 transition">Inscription</a>
+            {% endif %}
+        </div>
+    </div>
+</nav>
+"""
+
+CATEGORY_BAR_HTML = """
+<div class="flex gap-2 overflow-x-auto pb-2">
+    {% for cat in categories %}
+        <a href="?cat={{ cat.id }}&q={{ q }}" 
+           class="px-4 py-2 rounded-lg whitespace-nowrap {% if cat.id == active_cat %}bg-red-600 text-white{% else %}bg-dark text-gray hover:bg-gray-800{% endif %} transition">
+            {{ cat.label }}
+        </a>
+    {% endfor %}
+</div>
+"""
+
 HOME_BODY = """
 <main class="container mx-auto px-4 py-8">
     <div class="mb-6">
@@ -273,22 +1028,15 @@ HOME_BODY = """
             <button type="submit" class="bg-red-600 text-white px-6 py-2 rounded-lg hover:bg-red-700 transition">Rechercher</button>
         </form>
         
-        <div class="flex gap-2 overflow-x-auto pb-2">
-            {% for cat in categories %}
-                <a href="?cat={{ cat.id }}&q={{ q }}" 
-                   class="px-4 py-2 rounded-lg whitespace-nowrap {% if cat.id == active_cat %}bg-red-600 text-white{% else %}bg-dark text-gray hover:bg-gray-800{% endif %} transition">
-                    {{ cat.label }}
-                </a>
-            {% endfor %}
-        </div>
+        {{ fragment("categories.html", active_cat=active_cat, q=q) }}
     </div>
     
     <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-4">
         {% for video in items %}
             <div class="bg-dark rounded-lg overflow-hidden hover:bg-gray-900 transition cursor-pointer">
-                <a href="{{ url_for('watch', video_id=video.id) }}">
+                <a href="{{ url_for('watch', video_id=video.id) }}" class="relative block">
                     {% if video.thumb_url %}
-                        <img src="{{ video.thumb_url }}" alt="{{ video.title }}" class="w-full h-48 object-cover">
+                        <img src="{{ video.thumb_url }}" {% if video.thumb_srcset %}srcset="{{ video.thumb_srcset }}" sizes="(min-width: 1280px) 25vw, (min-width: 768px) 50vw, 100vw"{% endif %} alt="{{ video.title }}" loading="lazy" class="w-full h-48 object-cover">
                     {% else %}
                         <div class="w-full h-48 bg-gray-800 flex items-center justify-center">
                             <svg class="w-16 h-16 text-gray-600" fill="currentColor" viewBox="0 0 20 20">
@@ -296,6 +1044,9 @@ HOME_BODY = """
                             </svg>
                         </div>
                     {% endif %}
+                    {% if video.duration %}
+                        <span class="absolute bottom-2 right-2 bg-black bg-opacity-80 text-white text-xs px-1 rounded">{{ video.duration }}</span>
+                    {% endif %}
                 </a>
                 <div class="p-4">
                     <h3 class="font-semibold mb-2 text-white">
@@ -324,17 +1075,76 @@ WATCH_BODY = """
     <div class="grid grid-cols-1 lg:grid-cols-3 gap-6">
         <div class="lg:col-span-2">
             <div class="bg-black rounded-lg overflow-hidden mb-4">
-                <video id="video-player" controls class="w-full h-auto" style="max-height: 600px;">
-                    <source src="{{ video.source_url }}" type="video/mp4">
-                    Votre navigateur ne supporte pas la lecture vidéo.
-                </video>
+                {% if video.transcode_status in ('pending', 'upload_failed') %}
+                    <div class="flex items-center justify-center text-gray" style="aspect-ratio: 16 / 9;">
+                        {% if video.transcode_status == 'pending' %}⏳ Vidéo en cours d'envoi, elle sera bientôt disponible.{% else %}⚠️ Cette vidéo n'est pas disponible.{% endif %}
+                    </div>
+                {% else %}
+                    <video id="video-player" controls preload="metadata" playsinline {% if video.thumb_url %}poster="{{ video.thumb_url }}"{% endif %} class="w-full h-auto" style="max-height: 600px;">
+                        {% if not video.hls_manifest %}
+                            <source src="{{ video.source_url }}" type="video/mp4">
+                        {% endif %}
+                        Votre navigateur ne supporte pas la lecture vidéo.
+                    </video>
+                    {% if video.hls_manifest %}
+                        <script src="https://cdn.jsdelivr.net/npm/hls.js@1"></script>
+                        <script>
+                            (function () {
+                                var video = document.getElementById('video-player');
+                                var src = '{{ video.hls_url }}';
+                                if (video.canPlayType('application/vnd.apple.mpegurl')) {
+                                    video.src = src;
+                                } else if (window.Hls && Hls.isSupported()) {
+                                    var hls = new Hls();
+                                    hls.loadSource(src);
+                                    hls.attachMedia(video);
+                                } else {
+                                    video.src = '{{ video.source_url }}';
+                                }
+                            })();
+                        </script>
+                    {% endif %}
+                {% endif %}
             </div>
             
+            {% if current_user.is_authenticated and current_user.id == video.user_id and video.transcode_status in ('pending', 'upload_failed', 'processing', 'failed') %}
+                <div id="processing-status" class="bg-yellow-900 border border-yellow-700 text-yellow-200 px-4 py-3 rounded mb-4">
+                    {% if video.transcode_status == 'pending' %}
+                        ⏳ Envoi de la vidéo vers le stockage en cours…
+                    {% elif video.transcode_status == 'upload_failed' %}
+                        ⚠️ L'envoi de la vidéo vers le stockage a échoué, il sera relancé par un administrateur.
+                    {% elif video.transcode_status == 'failed' %}
+                        ⚠️ La conversion en streaming adaptatif a échoué : la vidéo originale est diffusée.
+                    {% else %}
+                        ⏳ Conversion en streaming adaptatif en cours, la vidéo originale est diffusée en attendant.
+                    {% endif %}
+                </div>
+                {% if video.transcode_status in ('pending', 'processing') %}
+                    <script>
+                        // Recharge la page quand le traitement passe à l'étape suivante
+                        (function poll() {
+                            setTimeout(function () {
+                                fetch('{{ url_for("api_video_status", video_id=video.id) }}')
+                                    .then(function (r) { return r.json(); })
+                                    .then(function (data) {
+                                        if (data.transcode_status !== '{{ video.transcode_status }}') {
+                                            location.reload();
+                                        } else {
+                                            poll();
+                                        }
+                                    })
+                                    .catch(poll);
+                            }, 5000);
+                        })();
+                    </script>
+                {% endif %}
+            {% endif %}
+            
             <h1 class="text-2xl font-bold mb-3 text-white">{{ video.title }}</h1>
             <div class="flex items-center justify-between mb-4 bg-dark p-4 rounded-lg">
                 <div>
                     <p class="text-white font-semibold">{{ video.creator }}</p>
-                    <p class="text-gray text-sm">{{ video.views }} vues • {{ video.created_at.strftime('%d %b %Y') }}</p>
+                    <p class="text-gray text-sm">{{ views }} vues • {{ video.created_at.strftime('%d %b %Y') }}</p>
                 </div>
                 
                 {% if current_user.is_authenticated %}
@@ -358,7 +1168,7 @@ WATCH_BODY = """
             </div>
             
             <div class="mb-6">
-                <h3 class="text-xl font-semibold mb-4 text-white">{{ comments|length }} commentaire{% if comments|length > 1 %}s{% endif %}</h3>
+                <h3 class="text-xl font-semibold mb-4 text-white">{{ video.comment_count }} commentaire{% if video.comment_count > 1 %}s{% endif %}</h3>
                 
                 {% if current_user.is_authenticated %}
                     <form method="post" action="{{ url_for('comment_post', video_id=video.id) }}" class="mb-6">
@@ -368,7 +1178,7 @@ WATCH_BODY = """
                     </form>
                 {% endif %}
                 
-                <div class="space-y-4">
+                <div id="comments" class="space-y-4">
                     {% for comment in comments %}
                         <div class="bg-dark p-4 rounded-lg">
                             <div class="flex items-center space-x-2 mb-2">
@@ -381,6 +1191,10 @@ WATCH_BODY = """
                         <p class="text-gray text-center py-4">Aucun commentaire pour le moment.</p>
                     {% endfor %}
                 </div>
+                {% if next_cursor %}
+                    <button id="more-comments" onclick="loadMoreComments({{ video.id }})" data-cursor="{{ next_cursor }}"
+                            class="w-full mt-4 bg-dark text-gray px-6 py-2 rounded-lg hover:bg-gray-800 transition">Afficher plus de commentaires</button>
+                {% endif %}
             </div>
         </div>
         
@@ -390,7 +1204,7 @@ WATCH_BODY = """
                 <div class="bg-dark rounded-lg overflow-hidden hover:bg-gray-900 transition cursor-pointer">
                     <a href="{{ url_for('watch', video_id=suggestion.id) }}">
                         {% if suggestion.thumb_url %}
-                            <img src="{{ suggestion.thumb_url }}" alt="{{ suggestion.title }}" 
+                            <img src="{{ suggestion.thumb_url }}" {% if suggestion.thumb_srcset %}srcset="{{ suggestion.thumb_srcset }}" sizes="320px"{% endif %} alt="{{ suggestion.title }}" loading="lazy" 
                                  class="w-full h-32 object-cover">
                         {% else %}
                             <div class="w-full h-32 bg-gray-800 flex items-center justify-center">
@@ -426,6 +1240,28 @@ function likeVideo(videoId) {
         .catch(err => console.error('Erreur like:', err));
 }
 
+function loadMoreComments(videoId) {
+    const button = document.getElementById('more-comments');
+    fetch(`/api/videos/${videoId}/comments?cursor=${encodeURIComponent(button.dataset.cursor)}`)
+        .then(r => r.json())
+        .then(data => {
+            const list = document.getElementById('comments');
+            data.items.forEach(c => {
+                const div = document.createElement('div');
+                div.className = 'bg-dark p-4 rounded-lg';
+                div.innerHTML = '<div class="flex items-center space-x-2 mb-2"><strong class="text-white"></strong>'
+                    + '<span class="text-gray text-sm"></span></div><p class="text-gray"></p>';
+                div.querySelector('strong').textContent = c.author;
+                div.querySelector('span').textContent = c.created_at_display;
+                div.querySelector('p').textContent = c.body;
+                list.appendChild(div);
+            });
+            if (data.next_cursor) button.dataset.cursor = data.next_cursor;
+            else button.remove();
+        })
+        .catch(err => console.error('Erreur commentaires:', err));
+}
+
 function dislikeVideo(videoId) {
     fetch(`/video/dislike/${videoId}`, {method: 'POST'})
         .then(r => r.json())
@@ -448,7 +1284,7 @@ UPLOAD_BODY = """
         </div>
     {% endif %}
     
-    <form method="post" enctype="multipart/form-data" class="max-w-2xl">
+    <form id="upload-form" method="post" enctype="multipart/form-data" class="max-w-2xl">
         <div class="space-y-4">
             <div>
                 <label class="block text-sm font-medium mb-2 text-white">Fichier vidéo</label>
@@ -484,12 +1320,74 @@ UPLOAD_BODY = """
                        class="w-full px-4 py-3 bg-dark border border-dark rounded-lg text-white focus:border-red-600 focus:outline-none">
             </div>
             
+            <div id="upload-progress" class="hidden">
+                <div class="w-full bg-gray-800 rounded-lg h-3"><div id="upload-bar" class="bg-red-600 h-3 rounded-lg" style="width: 0%"></div></div>
+                <p id="upload-text" class="text-gray text-sm mt-1"></p>
+            </div>
+            
             <button type="submit" class="w-full bg-red-600 text-white px-6 py-3 rounded-lg hover:bg-red-700 transition font-semibold">
                 Téléverser la vidéo
             </button>
         </div>
     </form>
 </main>
+
+<script>
+// Upload par morceaux : reprend au dernier morceau reçu par le serveur
+document.getElementById('upload-form').addEventListener('submit', async function (e) {
+    const form = e.target;
+    const file = form.file.files[0];
+    if (!file || !window.fetch || !file.slice) return;  // repli : envoi classique
+    e.preventDefault();
+
+    const key = 'ashn-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    const bar = document.getElementById('upload-bar');
+    const text = document.getElementById('upload-text');
+    document.getElementById('upload-progress').classList.remove('hidden');
+
+    try {
+        let session = null;
+        const saved = localStorage.getItem(key);
+        if (saved) {
+            const r = await fetch(`/upload/${saved}`);
+            if (r.ok) session = await r.json();
+        }
+        if (!session) {
+            const r = await fetch('/upload/init', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({filename: file.name, size: file.size}),
+            });
+            session = await r.json();
+            if (!r.ok) throw new Error(session.error);
+            localStorage.setItem(key, session.upload_id);
+        }
+
+        const parts = Math.ceil(file.size / session.chunk_size);
+        for (let part = session.next_part; part < parts; part++) {
+            const start = part * session.chunk_size;
+            const r = await fetch(`/upload/${session.upload_id}/part/${part}`, {
+                method: 'PUT',
+                body: file.slice(start, start + session.chunk_size),
+            });
+            if (!r.ok) throw new Error((await r.json()).error);
+            bar.style.width = Math.round(100 * (part + 1) / parts) + '%';
+            text.textContent = `Morceau ${part + 1} / ${parts}`;
+        }
+
+        text.textContent = 'Finalisation...';
+        const meta = new FormData(form);
+        meta.delete('file');
+        const r = await fetch(`/upload/${session.upload_id}/complete`, {method: 'POST', body: meta});
+        const data = await r.json();
+        if (!r.ok) throw new Error(data.error);
+        localStorage.removeItem(key);
+        window.location = data.url;
+    } catch (err) {
+        text.textContent = `Erreur : ${err.message} — renvoyez le formulaire pour reprendre.`;
+    }
+});
+</script>
 """
 
 AUTH_BODY = """
@@ -537,7 +1435,10 @@ PROFIL_BODY = """
     <div class="bg-dark rounded-lg p-6 mb-8">
         <h1 class="text-3xl font-bold mb-4 text-white">Profil de {{ user.display_name }}</h1>
         <div class="flex items-center space-x-6 text-gray">
-            <span><strong class="text-white">{{ videos|length }}</strong> vidéos</span>
+            <span><strong class="text-white">{{ user.video_count }}</strong> vidéos</span>
+            <span><strong class="text-white">{{ user.follower_count }}</strong> abonnés</span>
+            <span><strong class="text-white">{{ user.following_count }}</strong> abonnements</span>
+            <span><strong class="text-white">{{ user.total_views }}</strong> vues</span>
             <span>Membre depuis {{ user.created_at.strftime('%B %Y') }}</span>
         </div>
     </div>
@@ -572,43 +1473,188 @@ PROFIL_BODY = """
             </div>
         {% endfor %}
     </div>
+    {% if next_cursor %}
+        <div class="text-center mt-8">
+            <a href="{{ url_for('show_profil', username=user.profile_handle, cursor=next_cursor) }}" class="bg-dark text-white px-6 py-3 rounded-lg hover:bg-gray-800 transition inline-block">Vidéos plus anciennes</a>
+        </div>
+    {% endif %}
 </main>
 """
 
+FEED_BODY = """
+<main class="container mx-auto px-4 py-8">
+    <h1 class="text-3xl font-bold mb-6 text-white">Abonnements</h1>
+    <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-4">
+        {% for v in videos %}
+            <div class="bg-dark rounded-lg overflow-hidden hover:bg-gray-900 transition cursor-pointer">
+                <a href="{{ url_for('watch', video_id=v.id) }}" class="relative block">
+                    {% if v.thumb_url %}
+                        <img src="{{ v.thumb_url }}" {% if v.thumb_srcset %}srcset="{{ v.thumb_srcset }}" sizes="(min-width: 1280px) 25vw, (min-width: 768px) 50vw, 100vw"{% endif %} alt="{{ v.title }}" loading="lazy" class="w-full h-48 object-cover">
+                    {% else %}
+                        <div class="w-full h-48 bg-gray-800 flex items-center justify-center">
+                            <svg class="w-16 h-16 text-gray-600" fill="currentColor" viewBox="0 0 20 20">
+                                <path d="M10 18a8 8 0 100-16 8 8 0 000 16zM9.555 7.168A1 1 0 008 8v4a1 1 0 001.555.832l3-2a1 1 0 000-1.664l-3-2z"/>
+                            </svg>
+                        </div>
+                    {% endif %}
+                    {% if v.duration %}
+                        <span class="absolute bottom-2 right-2 bg-black bg-opacity-80 text-white text-xs px-1 rounded">{{ v.duration }}</span>
+                    {% endif %}
+                </a>
+                <div class="p-4">
+                    <h3 class="font-semibold mb-2 text-white">
+                        <a href="{{ url_for('watch', video_id=v.id) }}" class="hover:text-red-500 transition">{{ v.title }}</a>
+                    </h3>
+                    <p class="text-gray text-sm">{{ v.creator }}</p>
+                    <p class="text-gray text-sm">{{ v.created_at.strftime('%d %b %Y') }} · {{ v.views or 0 }} vues</p>
+                </div>
+            </div>
+        {% else %}
+            <div class="col-span-full text-center py-12">
+                <p class="text-gray text-lg">Aucune vidéo : abonnez-vous à des chaînes depuis leur profil.</p>
+            </div>
+        {% endfor %}
+    </div>
+    {% if next_cursor %}
+        <div class="text-center mt-8">
+            <a href="{{ url_for('feed', cursor=next_cursor) }}" class="bg-dark text-white px-6 py-3 rounded-lg hover:bg-gray-800 transition inline-block">Vidéos plus anciennes</a>
+        </div>
+    {% endif %}
+</main>
+"""
+
+ERROR_BODY = """
+<main class="container mx-auto px-4 py-8 text-center">
+    <h1 class="text-3xl font-bold text-white mb-4">{{ heading }}</h1>
+    <p class="text-gray mb-6">{{ message }}</p>
+    <p><a href="{{ url_for('home') }}" class="bg-red-600 text-white px-6 py-3 rounded-lg hover:bg-red-700 transition inline-block">Retour à l'accueil</a></p>
+</main>
+"""
+
+# -------------------------
+# Enregistrement des templates (compilés une seule fois par Jinja)
+# -------------------------
+def page(body: str) -> str:
+    """Fait hériter un corps de page du layout base.html"""
+    return '{% extends "base.html" %}{% block content %}' + body + "{% endblock %}"
+
+TEMPLATES = {
+    "base.html": BASE_HTML,
+    "nav.html": NAV_HTML,
+    "categories.html": CATEGORY_BAR_HTML,
+    "home_body.html": HOME_BODY,
+    "home.html": page("{{ body }}"),
+    "watch.html": page(WATCH_BODY),
+    "upload.html": page(UPLOAD_BODY),
+    "auth.html": page(AUTH_BODY),
+    "profil.html": page(PROFIL_BODY),
+    "feed.html": page(FEED_BODY),
+    "error.html": page(ERROR_BODY),
+}
+app.jinja_loader = DictLoader(TEMPLATES)
+
+@functools.lru_cache(maxsize=512)
+def _render_fragment(name: str, params: tuple) -> Markup:
+    return Markup(app.jinja_env.get_template(name).render(categories=CATEGORIES, **dict(params)))
+
+def fragment(name: str, **params) -> Markup:
+    """Rend un fragment statique une seule fois par jeu de paramètres (cache LRU)"""
+    return _render_fragment(name, tuple(sorted(params.items())))
+
+app.jinja_env.globals["fragment"] = fragment
+
+@app.context_processor
+def inject_year():
+    return {"year": datetime.utcnow().year}
+
 # -------------------------
 # Routes principales
 # -------------------------
 @app.get("/")
+@read_routing.read_only
 def home():
     try:
         q = (request.args.get("q") or "").strip()
         active_cat = request.args.get("cat") or CATEGORIES[0]["id"]
 
-        query = Video.query.filter_by(category=active_cat)
-        if q:
-            like = f"%{q}%"
-            query = query.filter(db.or_(Video.title.ilike(like), Video.creator.ilike(like)))
-        items = query.order_by(Video.created_at.desc()).limit(40).all()
-
-        body = render_template_string(
-            HOME_BODY,
-            q=q,
-            active_cat=active_cat,
-            items=items,
-            categories=CATEGORIES,
-            categories_map=CATEGORIES_MAP,
-        )
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="ASHN Vidéos — Accueil")
+        def render_body():
+            query, sort = listing_query(active_cat)
+            if q:
+                query = search.apply_search(query, Video, q)
+            # Grille partagée en cache jusqu'à la prochaine invalidation : lue sur la principale
+            with db_routing.primary():
+                items = query.order_by(sort.desc(), Video.id.desc()).limit(40).all()
+            body = Markup(render_template(
+                "home_body.html",
+                q=q,
+                active_cat=active_cat,
+                items=items,
+                categories=CATEGORIES,
+                categories_map=CATEGORIES_MAP,
+            ))
+            # Empreinte calculée une fois par rendu, puis servie depuis le cache avec la grille
+            return body, weak_etag("home", body)
+
+        def render_page(body):
+            return render_template("home.html", body=body, title="ASHN Vidéos — Accueil")
+
+        # La grille est partagée par tous ; seul l'en-tête dépend de l'utilisateur
+        body, body_etag = page_cache.get_or_render(("body", active_cat, q), active_cat, render_body)
+        if "_flashes" in session:
+            return render_page(body)  # message à usage unique : ni cache ni ETag
+
+        # Visiteurs anonymes : page complète en cache, avec l'ETag de la grille rendue
+        if not current_user.is_authenticated:
+            html, etag = page_cache.get_or_render(
+                ("page", active_cat, q), active_cat, lambda: (render_page(body), body_etag)
+            )
+            return http_cache.respond(etag, PUBLIC_PAGE_CACHE, lambda: html, vary=("Cookie",))
+        etag = weak_etag(body_etag, current_user.id, current_user.display_name, current_user.is_admin)
+        return http_cache.respond(etag, PRIVATE_PAGE_CACHE, lambda: render_page(body), vary=("Cookie",))
     except Exception as e:
         print(f"Erreur dans home(): {e}")
         return f"Erreur: {e}", 500
 
+def comments_page(video_id: int, cursor: str = None):
+    """Une page de commentaires (auteur chargé dans la même requête) et le curseur suivant"""
+    per_page = app.config["COMMENTS_PER_PAGE"]
+    query = Comment.query.options(joinedload(Comment.user)).filter(Comment.video_id == video_id)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            Comment.created_at < created_at,
+            db.and_(Comment.created_at == created_at, Comment.id < last_id),
+        ))
+    comments = query.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_cursor(comments[per_page - 1]) if len(comments) > per_page else None
+    return comments[:per_page], next_cursor
+
+def more_videos(v: "Video", limit: int = 8):
+    """Colonne « plus de vidéos » : voisins précalculés, complétés par les plus
+    récentes de la catégorie (vidéos sans engagement ou nouvelles)"""
+    more = (
+        Video.query.join(Recommendation, Recommendation.recommended_id == Video.id)
+        .filter(Recommendation.video_id == v.id)
+        .order_by(Recommendation.rank)
+        .limit(limit)
+        .all()
+    )
+    if len(more) < limit:
+        exclude = [v.id] + [m.id for m in more]
+        more += (
+            Video.query.filter(Video.id.notin_(exclude), Video.category == v.category)
+            .order_by(Video.created_at.desc())
+            .limit(limit - len(more))
+            .all()
+        )
+    return more
+
 @app.get("/watch/<int:video_id>")
+@read_routing.read_only
 def watch(video_id: int):
     try:
         v = Video.query.get_or_404(video_id)
-        v.views = (v.views or 0) + 1
-        db.session.commit()
+        view_counter.add(v.id)
 
         user_like = None
         is_following = False
@@ -619,43 +1665,71 @@ def watch(video_id: int):
                     follower_id=current_user.id, followed_id=v.user_id
                 ).first() is not None
 
-        more = (
-            Video.query.filter(Video.id != v.id, Video.category == v.category)
-            .order_by(Video.created_at.desc())
-            .limit(8)
-            .all()
-        )
+        more = more_videos(v)
 
-        comments = (
-            Comment.query
-            .filter(Comment.video_id == v.id)
-            .order_by(Comment.created_at.desc())
-            .all()
-        )
+        comments, next_cursor = comments_page(v.id)
 
-        body = render_template_string(
-            WATCH_BODY,
+        # Le nombre de vues n'entre pas dans l'ETag (faible) : il change à chaque visite
+        etag = weak_etag(
+            "watch", v.id, v.title, v.description, v.transcode_status, v.source_url, v.likes, v.dislikes,
+            v.comment_count, [(c.id, c.body) for c in comments], videos_etag(more),
+            current_user.get_id(), user_like and user_like.is_like, is_following,
+        )
+        return http_cache.respond(etag, PRIVATE_PAGE_CACHE, lambda: render_template(
+            "watch.html",
             video=v,
+            views=(v.views or 0) + view_counter.pending(v.id),
             more=more,
             comments=comments,
+            next_cursor=next_cursor,
             user_like=user_like,
-            is_following=is_following
-        )
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title=v.title)
+            is_following=is_following,
+            title=v.title,
+        ))
     except Exception as e:
         print(f"Erreur dans watch(): {e}")
         return f"Erreur: {e}", 500
 
+@app.get("/media/<path:filename>")
+def media(filename):
+    """Fichiers du stockage local, avec HTTP Range pour la navigation dans la vidéo"""
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    try:
+        path = storage.path_for(filename)
+    except UploadError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+    # Les fichiers stockés ont un nom unique et ne sont jamais réécrits
+    return send_media(request, path)
+
+@app.get("/hls/<path:filename>")
+def hls(filename):
+    # Chaque transcodage écrit dans un nouveau dossier : les fichiers publiés ne changent jamais
+    response = send_from_directory(app.config["HLS_DIR"], filename, conditional=True)
+    if filename.endswith(".m3u8"):
+        response.mimetype = "application/vnd.apple.mpegurl"
+    elif filename.endswith(".ts"):
+        response.mimetype = "video/mp2t"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+@app.get("/api/videos/<int:video_id>/status")
+def api_video_status(video_id: int):
+    v = Video.query.get_or_404(video_id)
+    return jsonify({"id": v.id, "transcode_status": v.transcode_status, "hls_url": v.hls_url})
+
 @app.get("/upload")
 @login_required
 def upload_form():
     try:
-        body = render_template_string(
-            UPLOAD_BODY, 
+        return render_template(
+            "upload.html",
             categories=CATEGORIES,
-            supabase_configured=bool(supabase)
+            supabase_configured=bool(storage),
+            title="Téléverser — ASHN Vidéos",
         )
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="Téléverser — ASHN Vidéos")
     except Exception as e:
         print(f"Erreur dans upload_form(): {e}")
         return f"Erreur: {e}", 500
@@ -664,15 +1738,11 @@ def upload_form():
 @login_required
 def upload_post():
     try:
-        if not supabase:
+        if not storage:
             flash("Supabase n'est pas configuré. Impossible d'uploader des vidéos.")
             return redirect(url_for("upload_form"))
 
         f = request.files.get("file")
-        title = (request.form.get("title") or "Sans titre").strip()
-        description = (request.form.get("description") or "").strip()
-        category = request.form.get("category") or "tendance"
-        creator = (request.form.get("creator") or current_user.display_name or "Anonyme").strip()
 
         if not f or f.filename == "":
             flash("Aucun fichier reçu")
@@ -681,35 +1751,94 @@ def upload_post():
             flash("Extension non supportée")
             return redirect(url_for("upload_form"))
 
-        file_data = f.read()
-        
+        # Werkzeug a déjà mis le fichier sur disque : on le copie par blocs,
+        # l'envoi vers le stockage se fait ensuite en arrière-plan.
+        fd, tmp_path = tempfile.mkstemp(dir=app.config["UPLOAD_DIR"])
         try:
-            supabase_path = upload_to_supabase(file_data, f.filename)
+            with os.fdopen(fd, "wb") as tmp:
+                f.save(tmp)
+            v = create_uploaded_video(tmp_path, f.filename, request.form)
         except Exception as e:
-            flash(f"Erreur lors de l'upload vers Supabase: {str(e)}")
+            flash(f"Erreur lors de l'upload: {str(e)}")
             return redirect(url_for("upload_form"))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
-        v = Video(
-            title=title,
-            description=description,
-            category=category if category in CATEGORIES_MAP else "tendance",
-            supabase_path=supabase_path,
-            thumb_url="https://picsum.photos/seed/ashn-" + str(uuid.uuid4())[:8] + "/640/360",
-            duration="",
-            creator=creator,
-            user_id=current_user.id,
-        )
-
-        db.session.add(v)
-        db.session.commit()
-
-        flash("Vidéo téléversée avec succès !")
+        flash("Vidéo reçue ! Elle sera disponible dans quelques instants.")
         return redirect(url_for("watch", video_id=v.id))
     except Exception as e:
         print(f"Erreur dans upload_post(): {e}")
         flash(f"Erreur lors de l'upload: {e}")
         return redirect(url_for("upload_form"))
 
+# -------------------------
+# Upload par morceaux (reprenable)
+# -------------------------
+@app.post("/upload/init")
+@login_required
+def upload_init():
+    try:
+        if not storage:
+            return jsonify({"error": "Supabase n'est pas configuré"}), 503
+        data = request.get_json(silent=True) or {}
+        filename = data.get("filename") or ""
+        total_size = int(data.get("size") or 0)
+        if not allowed_file(filename):
+            return jsonify({"error": "Extension non supportée"}), 400
+        if total_size <= 0 or total_size > app.config["MAX_CONTENT_LENGTH"]:
+            return jsonify({"error": "Taille de fichier invalide"}), 400
+        return jsonify(upload_store.create(current_user.id, filename, total_size))
+    except Exception as e:
+        print(f"Erreur dans upload_init(): {e}")
+        return jsonify({"error": str(e)}), 500
+
+def get_upload_session(upload_id: str) -> dict:
+    """Statut d'une session d'upload appartenant à l'utilisateur connecté"""
+    status = upload_store.status(upload_id)
+    if status["user_id"] != current_user.id:
+        raise UploadError("Session d'upload inconnue", 404)
+    return status
+
+@app.get("/upload/<upload_id>")
+@login_required
+def upload_status(upload_id):
+    try:
+        return jsonify(get_upload_session(upload_id))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+@app.put("/upload/<upload_id>/part/<int:part>")
+@login_required
+def upload_part(upload_id, part: int):
+    try:
+        get_upload_session(upload_id)
+        # Le corps est lu par blocs directement depuis le flux WSGI
+        status = upload_store.write_part(upload_id, part, request.stream, request.content_length)
+        return jsonify(status)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print(f"Erreur dans upload_part(): {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.post("/upload/<upload_id>/complete")
+@login_required
+def upload_complete(upload_id):
+    try:
+        status = get_upload_session(upload_id)
+        if not status["complete"]:
+            return jsonify({"error": "Upload incomplet", "next_part": status["next_part"]}), 409
+        v = create_uploaded_video(upload_store.data_path(upload_id), status["filename"], request.form)
+        upload_store.discard(upload_id)
+        flash("Vidéo reçue ! Elle sera disponible dans quelques instants.")
+        return jsonify({"id": v.id, "url": url_for("watch", video_id=v.id)})
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        print(f"Erreur dans upload_complete(): {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     try:
@@ -722,8 +1851,7 @@ def login():
             else:
                 login_user(u)
                 return redirect(url_for("home"))
-        body = render_template_string(AUTH_BODY, heading="Connexion", cta="Se connecter", mode="login")
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="Connexion — ASHN Vidéos")
+        return render_template("auth.html", heading="Connexion", cta="Se connecter", mode="login", title="Connexion — ASHN Vidéos")
     except Exception as e:
         print(f"Erreur dans login(): {e}")
         return f"Erreur: {e}", 500
@@ -742,12 +1870,26 @@ def register():
             else:
                 u = User(email=email, display_name=display_name)
                 u.set_password(password)
-                db.session.add(u)
-                db.session.commit()
-                login_user(u)
-                return redirect(url_for("home"))
-        body = render_template_string(AUTH_BODY, heading="Créer un compte", cta="S'inscrire", mode="register")
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="Inscription — ASHN Vidéos")
+                error = "Inscription impossible pour le moment, réessayez"
+                for _ in range(5):
+                    u.handle = make_handle(display_name)
+                    db.session.add(u)
+                    try:
+                        db.session.commit()
+                        error = None
+                        break
+                    except IntegrityError:
+                        # Inscription concurrente : même handle (le suffixe suivant est
+                        # choisi au prochain essai) ou même email
+                        db.session.rollback()
+                        if User.query.filter_by(email=email).first():
+                            error = "Cet email est déjà utilisé"
+                            break
+                if error is None:
+                    login_user(u)
+                    return redirect(url_for("home"))
+                flash(error)
+        return render_template("auth.html", heading="Créer un compte", cta="S'inscrire", mode="register", title="Inscription — ASHN Vidéos")
     except Exception as e:
         print(f"Erreur dans register(): {e}")
         return f"Erreur: {e}", 500
@@ -773,6 +1915,14 @@ def comment_post(video_id: int):
             return redirect(url_for("watch", video_id=v.id))
         c = Comment(video_id=v.id, user_id=current_user.id, body=body)
         db.session.add(c)
+        t = Video.__table__
+        Video.query.filter_by(id=v.id).update(
+            {
+                Video.comment_count: Video.comment_count + 1,
+                Video.trending: trending_sql(t, comments=t.c.comment_count + 1),
+            },
+            synchronize_session=False,
+        )
         db.session.commit()
         return redirect(url_for("watch", video_id=v.id))
     except Exception as e:
@@ -780,7 +1930,67 @@ def comment_post(video_id: int):
         flash("Erreur lors de l'ajout du commentaire")
         return redirect(url_for("watch", video_id=video_id))
 
+def resolve_source_urls(videos) -> dict:
+    """URLs de lecture d'une liste de vidéos, résolues en un seul lot"""
+    paths = [v.supabase_path for v in videos if v.supabase_path]
+    if not paths or not url_resolver:
+        return {}
+    try:
+        return url_resolver.resolve_many(paths)
+    except Exception as e:
+        print(f"Erreur résolution des URLs: {e}")
+        return {}
+
+def videos_etag(videos, *extra) -> str:
+    """ETag faible d'une liste de vidéos : les identifiants dans l'ordre et les champs
+    modifiables que sérialise video_to_json, lus sur les objets déjà chargés"""
+    return weak_etag(*extra, [
+        (v.id, v.title, v.creator, v.category, v.views, v.thumb_url, v.duration, v.hls_url, v.transcode_status)
+        for v in videos
+    ])
+
+def video_to_json(v: "Video", urls: dict = None) -> dict:
+    source_url = (urls or {}).get(v.supabase_path) if v.supabase_path else None
+    return {
+        "id": v.id,
+        "title": v.title,
+        "creator": v.creator,
+        "category": v.category,
+        "views": v.views,
+        "thumb_url": v.thumb_url,
+        "duration": v.duration,
+        "source_url": source_url or v.source_url,
+        "hls_url": v.hls_url,
+        "created_at": v.created_at.isoformat(),
+    }
+
+@app.get("/api/videos/<int:video_id>/comments")
+@read_routing.read_only
+def api_comments(video_id: int):
+    try:
+        try:
+            comments, next_cursor = comments_page(video_id, request.args.get("cursor"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "next_cursor": next_cursor,
+            "items": [
+                {
+                    "id": c.id,
+                    "author": c.user.display_name,
+                    "body": c.body,
+                    "created_at": c.created_at.isoformat(),
+                    "created_at_display": c.created_at.strftime('%d %b %Y à %H:%M'),
+                }
+                for c in comments
+            ],
+        })
+    except Exception as e:
+        print(f"Erreur dans api_comments(): {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.get("/api/videos")
+@read_routing.read_only
 def api_videos():
     try:
         page = max(int(request.args.get("page", 1)), 1)
@@ -788,62 +1998,122 @@ def api_videos():
         q = (request.args.get("q") or "").strip()
         cat = request.args.get("cat") or None
 
-        query = Video.query
-        if cat:
-            query = query.filter_by(category=cat)
+        cursor = request.args.get("cursor")
+
+        # Même sélection et même ordre que l'onglet de la page d'accueil
+        query, sort = listing_query(cat)
+        trending = cat == TRENDING_TAB
+
+        # Mode curseur (?cursor= pour la première page) : pagination par clé
+        # (created_at ou trending, id), coût constant quelle que soit la profondeur.
+        if cursor is not None:
+            if q:
+                query = search.apply_search(query, Video, q, rank=False)
+            result = {"per_page": per_page}
+            if request.args.get("with_total"):
+                result["total"] = cached_count((cat, q), query)
+            if cursor:
+                try:
+                    last_key, last_id = (decode_score_cursor if trending else decode_cursor)(cursor)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+                query = query.filter(db.or_(
+                    sort < last_key,
+                    db.and_(sort == last_key, Video.id < last_id),
+                ))
+            items = (
+                query.order_by(sort.desc(), Video.id.desc())
+                .limit(per_page + 1)
+                .all()
+            )
+            has_more = len(items) > per_page
+            items = items[:per_page]
+            result["next_cursor"] = (encode_score_cursor if trending else encode_cursor)(items[-1]) if has_more else None
+            urls = resolve_source_urls(items)
+            etag = videos_etag(items, "api_videos", request.query_string, has_more, result.get("total"), sorted(urls.items()))
+
+            def render():
+                result["items"] = [video_to_json(v, urls) for v in items]
+                return jsonify(result)
+            return http_cache.respond(etag, API_CACHE, render)
+
         if q:
-            like = f"%{q}%"
-            query = query.filter(db.or_(Video.title.ilike(like), Video.creator.ilike(like)))
+            query = search.apply_search(query, Video, q)
 
         total = query.count()
         items = (
-            query.order_by(Video.created_at.desc())
+            query.order_by(sort.desc(), Video.id.desc())
             .offset((page - 1) * per_page)
             .limit(per_page)
             .all()
         )
-        return jsonify({
+        urls = resolve_source_urls(items)
+        etag = videos_etag(items, "api_videos", request.query_string, total, sorted(urls.items()))
+        return http_cache.respond(etag, API_CACHE, lambda: jsonify({
             "page": page,
             "per_page": per_page,
             "total": total,
-            "items": [
-                {
-                    "id": v.id,
-                    "title": v.title,
-                    "creator": v.creator,
-                    "category": v.category,
-                    "views": v.views,
-                    "thumb_url": v.thumb_url,
-                    "source_url": v.source_url,
-                    "created_at": v.created_at.isoformat(),
-                }
-                for v in items
-            ],
-        })
+            "items": [video_to_json(v, urls) for v in items],
+        }))
     except Exception as e:
         print(f"Erreur dans api_videos(): {e}")
         return jsonify({"error": str(e)}), 500
 
+def toggle_reaction(video_id: int, user_id: int, is_like: bool):
+    """Bascule le like (ou dislike) d'un utilisateur en une seule transaction.
+
+    Chaque cas est une écriture conditionnelle (changement de sens, retrait,
+    ajout avec ON CONFLICT DO NOTHING) dont le nombre de lignes touchées donne
+    les deltas appliqués ensuite en relatif aux compteurs de la vidéo : les
+    compteurs restent égaux à COUNT(*) sur likes même avec des clics concurrents.
+    Retourne (likes, dislikes), ou None si la vidéo n'existe pas.
+    """
+    # Vérifié avant l'INSERT : avec les clés étrangères actives (PostgreSQL), une vidéo
+    # inexistante lèverait une IntegrityError au lieu d'un 404
+    if db.session.execute(db.select(Video.id).where(Video.id == video_id)).first() is None:
+        return None
+    params = {"u": user_id, "v": video_id, "want": is_like}
+    delta = 0
+    flipped = db.session.execute(db.text(
+        "UPDATE likes SET is_like = :want WHERE user_id = :u AND video_id = :v AND is_like <> :want"
+    ), params).rowcount
+    if flipped:
+        delta = 1
+    elif db.session.execute(db.text(
+        "DELETE FROM likes WHERE user_id = :u AND video_id = :v AND is_like = :want"
+    ), params).rowcount:
+        delta = -1
+    elif db.session.execute(db.text(
+        "INSERT INTO likes (user_id, video_id, is_like, created_at) VALUES (:u, :v, :want, :now) "
+        "ON CONFLICT (user_id, video_id) DO NOTHING"
+    ), dict(params, now=datetime.utcnow())).rowcount:
+        delta = 1
+
+    d_likes, d_dislikes = (delta, -flipped) if is_like else (-flipped, delta)
+    t = Video.__table__
+    likes = db.func.coalesce(t.c.likes, 0) + d_likes
+    dislikes = db.func.coalesce(t.c.dislikes, 0) + d_dislikes
+    row = db.session.execute(
+        db.update(t).where(t.c.id == video_id)
+        .values(likes=likes, dislikes=dislikes, trending=trending_sql(t, likes=likes, dislikes=dislikes))
+        .returning(t.c.likes, t.c.dislikes)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return row.likes, row.dislikes
+
 @app.route("/video/like/<int:video_id>", methods=["POST"])
 @login_required
 def like_video(video_id):
     try:
-        v = Video.query.get_or_404(video_id)
-        existing = Like.query.filter_by(user_id=current_user.id, video_id=v.id).first()
-        if existing:
-            if existing.is_like:
-                db.session.delete(existing)
-                v.likes = max((v.likes or 1) - 1, 0)
-            else:
-                existing.is_like = True
-                v.likes = (v.likes or 0) + 1
-                v.dislikes = max((v.dislikes or 1) - 1, 0)
-        else:
-            db.session.add(Like(user_id=current_user.id, video_id=v.id, is_like=True))
-            v.likes = (v.likes or 0) + 1
-        db.session.commit()
-        return jsonify({"likes": v.likes, "dislikes": v.dislikes})
+        counts = toggle_reaction(video_id, current_user.id, True)
+        if counts is None:
+            return jsonify({"error": "Vidéo introuvable"}), 404
+        return jsonify({"likes": counts[0], "dislikes": counts[1]})
     except Exception as e:
+        db.session.rollback()
         print(f"Erreur dans like_video(): {e}")
         return jsonify({"error": str(e)}), 500
 
@@ -851,42 +2121,132 @@ def like_video(video_id):
 @login_required
 def dislike_video(video_id):
     try:
-        v = Video.query.get_or_404(video_id)
-        existing = Like.query.filter_by(user_id=current_user.id, video_id=v.id).first()
-        if existing:
-            if not existing.is_like:
-                db.session.delete(existing)
-                v.dislikes = max((v.dislikes or 1) - 1, 0)
-            else:
-                existing.is_like = False
-                v.dislikes = (v.dislikes or 0) + 1
-                v.likes = max((v.likes or 1) - 1, 0)
-        else:
-            db.session.add(Like(user_id=current_user.id, video_id=v.id, is_like=False))
-            v.dislikes = (v.dislikes or 0) + 1
-        db.session.commit()
-        return jsonify({"likes": v.likes, "dislikes": v.dislikes})
+        counts = toggle_reaction(video_id, current_user.id, False)
+        if counts is None:
+            return jsonify({"error": "Vidéo introuvable"}), 404
+        return jsonify({"likes": counts[0], "dislikes": counts[1]})
     except Exception as e:
+        db.session.rollback()
         print(f"Erreur dans dislike_video(): {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/profil/<username>")
+@read_routing.read_only
 def show_profil(username):
     try:
-        user = User.query.filter_by(display_name=username).first_or_404()
-        videos = Video.query.filter_by(user_id=user.id).order_by(Video.created_at.desc()).all()
+        user = User.query.filter_by(handle=username).first()
+        if user is None:
+            # Anciens liens /profil/<nom affiché> : redirection permanente vers le handle
+            user = User.query.filter_by(display_name=username).order_by(User.id).first_or_404()
+            if user.handle:
+                return redirect(url_for("show_profil", username=user.handle, cursor=request.args.get("cursor")), 301)
+        per_page = app.config["PROFILE_PER_PAGE"]
+        query = Video.query.filter(Video.user_id == user.id)
+        cursor = request.args.get("cursor")
+        if cursor:
+            try:
+                created_at, last_id = decode_cursor(cursor)
+            except ValueError:
+                return redirect(url_for("show_profil", username=user.profile_handle))
+            query = query.filter(db.or_(
+                Video.created_at < created_at,
+                db.and_(Video.created_at == created_at, Video.id < last_id),
+            ))
+        videos = query.order_by(Video.created_at.desc(), Video.id.desc()).limit(per_page + 1).all()
+        next_cursor = encode_cursor(videos[per_page - 1]) if len(videos) > per_page else None
+        videos = videos[:per_page]
         is_following = False
         if current_user.is_authenticated:
             is_following = Follow.query.filter_by(
                 follower_id=current_user.id,
                 followed_id=user.id
             ).first() is not None
-        body = render_template_string(PROFIL_BODY, user=user, videos=videos, is_following=is_following)
-        return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title=f"Profil de {user.display_name}")
+        return render_template("profil.html", user=user, videos=videos, next_cursor=next_cursor,
+                               is_following=is_following, title=f"Profil de {user.display_name}")
     except Exception as e:
         print(f"Erreur dans show_profil(): {e}")
         return f"Erreur: {e}", 500
 
+def merged_uploads(creator_ids, after, limit: int):
+    """Fusion (k-way merge) des dernières vidéos de chaque chaîne, de la plus récente à la plus ancienne.
+
+    Chaque chaîne est une sous-requête bornée à ``limit`` lignes sur
+    ix_videos_user_created : on lit au plus k × limit lignes, quel que soit
+    le nombre total de vidéos des chaînes.
+    """
+    t = Video.__table__
+    streams = {}
+    for chunk in catalog.batched(creator_ids, 100):  # SQLite limite le nombre de SELECT par UNION
+        parts = []
+        for creator_id in chunk:
+            sel = db.select(t.c.created_at, t.c.id, t.c.user_id).where(t.c.user_id == creator_id)
+            if after:
+                sel = sel.where(db.or_(
+                    t.c.created_at < after[0], db.and_(t.c.created_at == after[0], t.c.id < after[1])
+                ))
+            parts.append(db.select(sel.order_by(t.c.created_at.desc(), t.c.id.desc()).limit(limit).subquery()))
+        for created_at, video_id, creator_id in db.session.execute(db.union_all(*parts)):
+            streams.setdefault(creator_id, []).append((created_at, video_id))
+    # L'ordre des lignes d'un UNION n'est pas garanti : chaque flux (≤ limit lignes) est retrié
+    merged = heapq.merge(*(sorted(rows, reverse=True) for rows in streams.values()), reverse=True)
+    return [video_id for _, video_id in itertools.islice(merged, limit)]
+
+def feed_page(user, cursor: str = None, per_page: int = None):
+    """Une page du fil d'abonnements et le curseur suivant (ValueError si le curseur est invalide)"""
+    per_page = per_page or app.config["FEED_PER_PAGE"]
+    after = decode_cursor(cursor) if cursor else None
+    if user.feed_inbox:
+        query = db.select(FeedInbox.video_id).where(FeedInbox.user_id == user.id)
+        if after:
+            query = query.where(db.or_(
+                FeedInbox.created_at < after[0],
+                db.and_(FeedInbox.created_at == after[0], FeedInbox.video_id < after[1]),
+            ))
+        ids = db.session.execute(
+            query.order_by(FeedInbox.created_at.desc(), FeedInbox.video_id.desc()).limit(per_page + 1)
+        ).scalars().all()
+    else:
+        creators = db.session.execute(
+            db.select(Follow.followed_id).where(Follow.follower_id == user.id)
+        ).scalars().all()
+        ids = merged_uploads(creators, after, per_page + 1) if creators else []
+    by_id = {v.id: v for v in Video.query.filter(Video.id.in_(ids))} if ids else {}
+    videos = [by_id[i] for i in ids if i in by_id]
+    next_cursor = encode_cursor(videos[per_page - 1]) if len(ids) > per_page and len(videos) >= per_page else None
+    return videos[:per_page], next_cursor
+
+@app.get("/feed")
+@login_required
+def feed():
+    try:
+        try:
+            videos, next_cursor = feed_page(current_user, request.args.get("cursor"))
+        except ValueError:
+            return redirect(url_for("feed"))
+        return render_template("feed.html", videos=videos, next_cursor=next_cursor, title="Abonnements")
+    except Exception as e:
+        print(f"Erreur dans feed(): {e}")
+        return f"Erreur: {e}", 500
+
+@app.get("/api/feed")
+@login_required
+def api_feed():
+    try:
+        per_page = min(max(int(request.args.get("per_page", app.config["FEED_PER_PAGE"])), 1), 50)
+        try:
+            videos, next_cursor = feed_page(current_user, request.args.get("cursor"), per_page)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        urls = resolve_source_urls(videos)
+        return jsonify({
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "items": [video_to_json(v, urls) for v in videos],
+        })
+    except Exception as e:
+        print(f"Erreur dans api_feed(): {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/follow/<int:user_id>", methods=["POST"])
 @login_required
 def follow_user(user_id):
@@ -898,9 +2258,25 @@ def follow_user(user_id):
         if existing:
             db.session.delete(existing)
             following = False
+            adjust_user_counts(current_user.id, following_count=-1)
+            adjust_user_counts(user_id, follower_count=-1)
+            # Sans condition : sans fil précalculé il n'y a simplement rien à supprimer
+            FeedInbox.query.filter_by(user_id=current_user.id, creator_id=user_id).delete()
         else:
             db.session.add(Follow(follower_id=current_user.id, followed_id=user_id))
             following = True
+            db.session.flush()
+            adjust_user_counts(current_user.id, following_count=1)
+            adjust_user_counts(user_id, follower_count=1)
+            # Lu en base et non sur current_user (copie en cache) : la tâche build_feed_inbox
+            # a pu activer le fil précalculé depuis un autre processus
+            has_inbox = db.session.execute(
+                db.select(User.feed_inbox).where(User.id == current_user.id)
+            ).scalar()
+            if has_inbox:
+                backfill_inbox(current_user.id, user_id)
+            elif Follow.query.filter_by(follower_id=current_user.id).count() > app.config["FEED_INBOX_THRESHOLD"]:
+                job_queue.enqueue("build_feed_inbox", {"user_id": current_user.id}, key=f"feed-inbox-{current_user.id}")
         db.session.commit()
         return jsonify({"following": following})
     except Exception as e:
@@ -916,8 +2292,21 @@ def ban_user(user_id):
             return redirect(url_for("home"))
         user = User.query.get_or_404(user_id)
         if user.id != current_user.id:
+            # Les abonnements du compte banni disparaissent avec lui : compteurs des autres comptes
+            follows = Follow.__table__
+            for column, other, counter in (
+                (follows.c.follower_id, follows.c.followed_id, User.follower_count),
+                (follows.c.followed_id, follows.c.follower_id, User.following_count),
+            ):
+                db.session.execute(
+                    db.update(User).where(User.id.in_(db.select(other).where(column == user.id)))
+                    .values({counter: counter - 1})
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.execute(follows.delete().where(db.or_(follows.c.follower_id == user.id, follows.c.followed_id == user.id)))
             db.session.delete(user)
             db.session.commit()
+            invalidate_user(user.id)
             flash(f"Utilisateur {user.display_name} banni")
         return redirect(url_for("home"))
     except Exception as e:
@@ -935,6 +2324,7 @@ def promote_user(user_id):
         user = User.query.get_or_404(user_id)
         user.is_admin = True
         db.session.commit()
+        invalidate_user(user.id)
         flash(f"Utilisateur {user.display_name} promu admin")
         return redirect(url_for("home"))
     except Exception as e:
@@ -942,16 +2332,509 @@ def promote_user(user_id):
         flash("Erreur lors de la promotion")
         return redirect(url_for("home"))
 
+@app.get("/admin/views/stats")
+@login_required
+def view_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(view_counter.stats())
+
+@app.get("/admin/cache/stats")
+@login_required
+def cache_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(page_cache.stats())
+
+@app.get("/admin/http/stats")
+@login_required
+def http_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(http_cache.stats())
+
+@app.get("/admin/uploads/stats")
+@login_required
+def upload_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(background_uploader.stats() if background_uploader else {})
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Mesures au format Prometheus, additionnées sur tous les workers de la machine"""
+    token = app.config["METRICS_TOKEN"]
+    if token:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return jsonify({"error": "Accès refusé"}), 403
+    elif not (current_user.is_authenticated and current_user.is_admin):
+        return jsonify({"error": "Accès refusé"}), 403
+    return instrumentation.exposition(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+def job_to_json(job: "Job") -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at.isoformat() if job.run_at else None,
+        "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@app.get("/api/jobs/<int:job_id>")
+@login_required
+def api_job_status(job_id: int):
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "Tâche introuvable"}), 404
+    return jsonify(job_to_json(job))
+
+@app.get("/admin/jobs/stats")
+@login_required
+def job_stats():
+    if not current_user.is_admin:
+        return jsonify({"error": "Accès refusé"}), 403
+    return jsonify(job_queue.stats())
+
 @app.errorhandler(404)
 def not_found_error(error):
-    body = "<main class='container mx-auto px-4 py-8 text-center'><h1 class='text-3xl font-bold text-white mb-4'>Page non trouvée</h1><p class='text-gray mb-6'>La page que vous recherchez n'existe pas.</p><p><a href='" + url_for('home') + "' class='bg-red-600 text-white px-6 py-3 rounded-lg hover:bg-red-700 transition inline-block'>Retour à l'accueil</a></p></main>"
-    return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="Erreur 404"), 404
+    return render_template("error.html", heading="Page non trouvée", message="La page que vous recherchez n'existe pas.", title="Erreur 404"), 404
 
 @app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
-    body = "<main class='container mx-auto px-4 py-8 text-center'><h1 class='text-3xl font-bold text-white mb-4'>Erreur interne</h1><p class='text-gray mb-6'>Une erreur s'est produite sur le serveur.</p><p><a href='" + url_for('home') + "' class='bg-red-600 text-white px-6 py-3 rounded-lg hover:bg-red-700 transition inline-block'>Retour à l'accueil</a></p></main>"
-    return render_template_string(BASE_HTML, body=body, year=datetime.utcnow().year, title="Erreur 500"), 500
+    return render_template("error.html", heading="Erreur interne", message="Une erreur s'est produite sur le serveur.", title="Erreur 500"), 500
+
+@app.cli.command("transcode")
+def transcode_command():
+    """Relance le transcodage HLS des vidéos non converties"""
+    os.makedirs(app.config["HLS_DIR"], exist_ok=True)
+    for v in Video.query.filter(Video.hls_manifest.is_(None)).all():
+        if not transcode_source(v):
+            continue
+        print(f"Transcodage de la vidéo {v.id}...")
+        try:
+            media = {
+                "width": v.width, "height": v.height, "audio_codec": v.audio_codec,
+            } if v.height else None
+            manifest = transcode_hls(transcode_source(v), app.config["HLS_DIR"], str(v.id), media)
+            v.hls_manifest, v.transcode_status = manifest, "ready"
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            v.transcode_status = "failed"
+        db.session.commit()
+
+@app.cli.command("worker")
+@click.option("--processes", "-p", type=int, default=None, help="Nombre de processus (défaut: JOB_WORKERS)")
+@click.option("--kind", "kinds", multiple=True, help="Ne traiter que ce type de tâche (répétable)")
+@click.option("--burst", is_flag=True, help="S'arrêter dès que la file est vide")
+def worker_command(processes, kinds, burst):
+    """Exécute les tâches de fond de la table jobs (sans broker externe)"""
+    processes = processes or app.config["JOB_WORKERS"]
+    kinds = list(kinds) or None
+    if processes == 1:
+        run_worker(kinds, burst)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    children = [
+        ctx.Process(target=run_worker, args=(kinds, burst), name=f"ashn-worker-{i}")
+        for i in range(processes)
+    ]
+    for p in children:
+        p.start()
+    print(f"✅ {processes} workers démarrés")
+
+    def stop(*_):
+        # Chaque worker termine sa tâche en cours avant de sortir
+        for p in children:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for p in children:
+            p.join()
+    except KeyboardInterrupt:
+        # Ctrl+C est aussi reçu par les workers (même groupe de processus)
+        for p in children:
+            p.join()
+
+@app.cli.command("resume-uploads")
+@click.option("--stale-after", default=3600, help="Relance aussi les envois en attente depuis plus de N secondes")
+def resume_uploads_command(stale_after):
+    """Relance l'envoi vers le stockage des vidéos en échec (ou bloquées en attente)"""
+    if not background_uploader:
+        raise click.ClickException("Aucun stockage configuré")
+    limit = datetime.utcnow() - timedelta(seconds=stale_after)
+    videos = Video.query.filter(db.or_(
+        Video.transcode_status == "upload_failed",
+        db.and_(Video.transcode_status == "pending", Video.created_at < limit),
+    )).all()
+    futures = []
+    for v in videos:
+        spooled = os.path.join(SPOOL_DIR, v.supabase_path)
+        if not os.path.exists(spooled):
+            print(f"❌ Vidéo {v.id}: fichier local introuvable")
+            continue
+        v.transcode_status = "pending"
+        db.session.commit()
+        content_type = f"video/{v.supabase_path.rsplit('.', 1)[-1]}"
+        futures.append(background_uploader.submit(
+            v.supabase_path, spooled, content_type, functools.partial(upload_pushed, v.id, spooled)
+        ))
+    for future in futures:
+        future.result()
+    print(f"✅ {len(futures)} envois relancés", background_uploader.stats())
+
+@app.cli.command("repair-counters")
+def repair_counters_command():
+    """Met en file le recalcul des compteurs (likes, commentaires) de toutes les vidéos"""
+    ids = [video_id for (video_id,) in db.session.query(Video.id)]
+    for video_id in ids:
+        job_queue.enqueue("repair_counters", {"video_id": video_id})
+    db.session.commit()
+    print(f"✅ {len(ids)} tâches ajoutées")
+
+def import_batch(conn, rows, user_ids):
+    """Insère un lot du catalogue ; retourne ``(insérées, doublons, sans utilisateur)``.
+
+    Les doublons (même ``external_url``) sont écartés dans le lot et contre la
+    base, par une seule requête indexée par lot. ``user_ids`` sert de cache
+    (email ou nom affiché -> id) entre les lots.
+    """
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["external_url"], row)
+    existing = set(conn.execute(
+        db.select(Video.external_url).where(Video.external_url.in_(list(unique)))
+    ).scalars())
+
+    wanted = {r["user"] for r in unique.values() if r["user"] and r["user"] not in user_ids}
+    if wanted:
+        if len(user_ids) > 10000:
+            user_ids.clear()
+        for uid, email, name in conn.execute(
+            db.select(User.id, User.email, User.display_name)
+            .where(db.or_(User.email.in_(wanted), User.display_name.in_(wanted)))
+        ):
+            user_ids[email] = user_ids[name] = uid
+        for key in wanted:
+            user_ids.setdefault(key, None)
+
+    now = datetime.utcnow()
+    values, orphans = [], 0
+    for url, row in unique.items():
+        if url in existing:
+            continue
+        user_id = user_ids.get(row["user"]) if row["user"] else None
+        orphans += user_id is None
+        values.append({
+            "title": row["title"], "category": row["category"], "creator": row["creator"],
+            "external_url": url, "thumb_url": row["thumb_url"], "duration": row["duration"],
+            "user_id": user_id, "created_at": now,
+        })
+    if values:
+        # executemany : SQLAlchemy regroupe les lignes en INSERT ... VALUES multiples
+        conn.execute(Video.__table__.insert(), values)
+        per_user = collections.Counter(r["user_id"] for r in values if r["user_id"] is not None)
+        if per_user:
+            users = User.__table__
+            conn.execute(
+                db.update(users).where(users.c.id == db.bindparam("uid"))
+                .values(video_count=users.c.video_count + db.bindparam("n")),
+                [{"uid": uid, "n": n} for uid, n in per_user.items()],
+            )
+    return len(values), len(rows) - len(values), orphans
+
+@app.cli.command("import-videos")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), default=None,
+              help="Format du fichier (défaut: d'après l'extension, jsonl pour stdin)")
+@click.option("--batch-size", default=5000, show_default=True, help="Lignes insérées par transaction")
+def import_videos_command(path, fmt, batch_size):
+    """Importe un catalogue de vidéos externes (JSON Lines ou CSV).
+
+    Champs : title, category, creator, external_url, thumb_url, duration, user
+    (email ou nom affiché du propriétaire). Le fichier est lu en flux et inséré
+    par lots : la mémoire reste constante quelle que soit sa taille. Une vidéo
+    dont l'external_url existe déjà est ignorée, l'import peut donc être relancé.
+    """
+    fmt = fmt or ("jsonl" if path == "-" else catalog.detect_format(path))
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "orphans": 0}
+    categories, user_ids = set(), {}
+    start = last_report = time.perf_counter()
+    first_id = (db.session.query(db.func.max(Video.id)).scalar() or 0) + 1
+
+    def fan_out():
+        # Fils d'abonnements précalculés : un seul passage pour toutes les vidéos importées
+        if stats["inserted"]:
+            last_id = db.session.query(db.func.max(Video.id)).scalar()
+            job_queue.enqueue("fanout_feed", {"first_id": first_id, "last_id": last_id})
+            db.session.commit()
+
+    def valid_rows(lines):
+        for line_no, row in lines:
+            stats["read"] += 1
+            try:
+                if isinstance(row, catalog.CatalogError):
+                    raise row
+                yield catalog.clean_row(line_no, row, CATEGORIES_MAP)
+            except catalog.CatalogError as e:
+                stats["rejected"] += 1
+                if stats["rejected"] <= 20:
+                    print(f"❌ {e}")
+
+    if path == "-":
+        fh = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        fh = open(path, encoding="utf-8-sig", newline="")
+    with fh:
+        for rows in catalog.batched(valid_rows(catalog.read_catalog(fh, fmt)), batch_size):
+            try:
+                with db.engine.begin() as conn:
+                    inserted, duplicates, orphans = import_batch(conn, rows, user_ids)
+            except Exception as e:
+                print(f"Erreur dans import_videos(): {e}")
+                fan_out()
+                raise click.ClickException(f"Import interrompu après {stats['inserted']} vidéos insérées")
+            stats["inserted"] += inserted
+            stats["duplicates"] += duplicates
+            stats["orphans"] += orphans
+            categories.update(r["category"] for r in rows)
+            if time.perf_counter() - last_report > 5:
+                last_report = time.perf_counter()
+                print(f"  {stats['read']} lignes lues ({stats['read'] / (last_report - start):,.0f}/s)")
+
+    # Insertions hors session ORM : les pages d'accueil sont invalidées ici
+    for category in categories | {TRENDING_TAB}:
+        page_cache.invalidate(category)
+    fan_out()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {stats['inserted']} vidéos importées, {stats['duplicates']} doublons ignorés, "
+          f"{stats['rejected']} lignes rejetées en {elapsed:.1f}s "
+          f"({stats['read'] / max(elapsed, 1e-9):,.0f} lignes/s)")
+    if stats["orphans"]:
+        print(f"⚠️  {stats['orphans']} vidéos sans utilisateur connu (user vide ou introuvable)")
+
+def engagement_chunks(conn, size=100_000):
+    """Lots ``(user_id, video_id, poids)`` : likes (1) et commentaires (un par vidéo et par auteur)"""
+    comment_weight = app.config["RECO_COMMENT_WEIGHT"]
+    queries = [
+        (db.select(Like.user_id, Like.video_id).where(Like.is_like.is_(True)), 1.0),
+        (db.select(Comment.user_id, Comment.video_id).distinct(), comment_weight),
+    ]
+    for query, weight in queries:
+        result = conn.execution_options(stream_results=True, yield_per=size).execute(query)
+        for rows in result.partitions():
+            yield [(user_id, video_id, weight) for user_id, video_id in rows]
+
+def build_recommendations():
+    """Recalcule toute la table video_recommendations ; retourne le nombre de vidéos couvertes"""
+    import recommend  # numpy / scipy : chargés seulement pour ce calcul hors ligne
+
+    started = datetime.utcnow()
+    with db.engine.connect() as conn:
+        users, videos, weights = recommend.load_interactions(engagement_chunks(conn))
+    matrix, video_ids = recommend.engagement_matrix(
+        users, videos, weights, max_items_per_user=app.config["RECO_MAX_ITEMS_PER_USER"]
+    )
+    del users, videos, weights
+    neighbours = recommend.top_neighbours(
+        matrix, video_ids, k=app.config["RECO_TOP_K"], block_size=app.config["RECO_BLOCK_SIZE"]
+    )
+    table = Recommendation.__table__
+    covered = 0
+    for batch in catalog.batched(neighbours, 1000):
+        rows = [
+            {"video_id": video_id, "rank": rank, "recommended_id": other, "score": score, "created_at": started}
+            for video_id, ranked in batch
+            for rank, (other, score) in enumerate(ranked)
+        ]
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.video_id.in_([video_id for video_id, _ in batch])))
+            conn.execute(table.insert(), rows)
+        covered += len(batch)
+    # Vidéos qui n'ont plus aucun voisin (engagement supprimé, vidéo supprimée)
+    with db.engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.created_at < started))
+    return covered
+
+@app.cli.command("build-recommendations")
+def build_recommendations_command():
+    """Recalcule les recommandations « plus de vidéos » (à lancer par cron, p. ex. chaque nuit)"""
+    start = time.perf_counter()
+    try:
+        covered = build_recommendations()
+    except Exception as e:
+        print(f"Erreur dans build_recommendations(): {e}")
+        raise click.ClickException("Recommandations non recalculées")
+    print(f"✅ Voisins calculés pour {covered} vidéos en {time.perf_counter() - start:.1f}s")
+
+@app.cli.command("sync-replica")
+def sync_replica_command():
+    """Copie la base principale SQLite dans la réplique (développement local).
+
+    Simule une réplication asynchrone : entre deux copies, la réplique est en
+    retard et seules les lectures collées à la base principale après une
+    écriture voient les nouvelles lignes. En production (PostgreSQL), la
+    réplique est alimentée par la réplication du serveur.
+    """
+    replica = db.engines.get(db_routing.REPLICA_BIND)
+    if replica is None:
+        print("❌ DATABASE_REPLICA_URL n'est pas configurée")
+        sys.exit(1)
+    if db.engine.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+        print("❌ Copie possible seulement entre deux bases SQLite ; utilisez la réplication du serveur")
+        sys.exit(1)
+    start = time.perf_counter()
+    replica.dispose()
+    source = sqlite3.connect(db.engine.url.database)
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    print(f"✅ Réplique {replica.url.database} synchronisée en {time.perf_counter() - start:.2f}s")
+
+@app.cli.command("trim-feeds")
+def trim_feeds_command():
+    """Ramène chaque fil précalculé à FEED_INBOX_SIZE vidéos (à lancer par cron)"""
+    removed = 0
+    for user_id in db.session.execute(db.select(User.id).where(User.feed_inbox.is_(True))).scalars().all():
+        removed += trim_inbox(user_id)
+        db.session.commit()
+    print(f"✅ {removed} entrées anciennes supprimées")
+
+@app.cli.command("repair-users")
+def repair_users_command():
+    """Attribue un handle aux comptes qui n'en ont pas et recalcule les compteurs des profils.
+
+    À lancer après la migration qui ajoute les colonnes ; ensuite les compteurs
+    sont tenus à jour par les abonnements, les envois, les vues et les bannissements.
+    """
+    start = time.perf_counter()
+    missing = User.query.filter(User.handle.is_(None)).order_by(User.id).all()
+    for user in missing:
+        user.handle = make_handle(user.display_name)
+        db.session.flush()  # visible par make_handle() pour le compte suivant
+    db.session.commit()
+    with db.engine.begin() as conn:
+        recount_users(conn)
+    print(f"✅ {len(missing)} handles attribués, compteurs recalculés en {time.perf_counter() - start:.1f}s")
+
+@app.cli.command("rebuild-trending")
+def rebuild_trending_command():
+    """Recalcule le score tendance de toutes les vidéos.
+
+    À lancer après la migration qui ajoute les colonnes, ou après un changement
+    de TRENDING_DECAY / TRENDING_*_WEIGHT ; le reste du temps le score est tenu
+    à jour à chaque vue, réaction ou commentaire.
+    """
+    t = Video.__table__
+    start = time.perf_counter()
+    total, last_id = 0, 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                db.select(t.c.id, t.c.created_at).where(t.c.id > last_id).order_by(t.c.id).limit(10_000)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                db.update(t).where(t.c.id == db.bindparam("video_id")).values(trending_base=db.bindparam("base")),
+                [{"video_id": video_id, "base": trending_base_for(created_at)} for video_id, created_at in rows],
+            )
+        total += len(rows)
+        last_id = rows[-1].id
+    with db.engine.begin() as conn:
+        conn.execute(db.update(t).values(trending=trending_sql(t)))
+    print(f"✅ Score tendance recalculé pour {total} vidéos en {time.perf_counter() - start:.1f}s")
+
+def audit_requests(v: "Video"):
+    """Requêtes des pages chaudes autour de la vidéo ``v`` : ``(libellé, url, connecté, budget)``
+
+    ``budget`` est le nombre maximal de SELECT de la route, caches froids
+    compris : un N+1 le fait dépasser quelle que soit la taille de la base.
+    """
+    word = (search.tokenize(v.title) or [""])[0]
+    return [
+        ("home", f"/?cat={v.category}", False, 2),
+        ("home (tendances)", "/?cat=tendance", False, 2),
+        ("home (recherche)", f"/?cat={v.category}&q={word}", False, 2),
+        ("watch", f"/watch/{v.id}", True, 8),
+        ("api_comments", f"/api/videos/{v.id}/comments", False, 2),
+        ("api_videos (curseur)", "/api/videos?cursor=", False, 2),
+        ("api_videos (curseur, catégorie)", f"/api/videos?cursor=&cat={v.category}", False, 2),
+        ("api_videos (curseur, tendances)", "/api/videos?cursor=&cat=tendance", False, 2),
+        ("api_videos (pages)", f"/api/videos?cat={v.category}&page=2", False, 3),
+        ("feed", "/feed", True, 4),
+        ("show_profil", f"/profil/{db.session.get(User, v.user_id).profile_handle}", True, 4),
+    ]
+
+@app.cli.command("explain-queries")
+@click.option("--verbose", "-v", is_flag=True, help="Affiche le plan complet de chaque requête")
+def explain_queries_command(verbose):
+    """Passe les requêtes des pages chaudes dans EXPLAIN et signale les parcours séquentiels.
+
+    Sort avec le code 1 si une requête parcourt une table entière, si une route
+    dépasse son budget de requêtes ou ne répond pas 200 : à lancer en CI après
+    chaque modification des requêtes ou des index.
+    """
+    v = Video.query.filter(Video.user_id.isnot(None)).order_by(Video.id.desc()).first()
+    if v is None:
+        raise click.ClickException("Base vide : lancez d'abord init-database")
+    engine = db.engine
+    tables = set(db.metadata.tables)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(v.user_id)
+        sess["_fresh"] = True
+    anonymous = app.test_client()
+
+    failures = 0
+    for label, url, logged_in, budget in audit_requests(v):
+        with query_audit.capture_selects(engine) as captured:
+            # Contexte vide : la requête a son propre contexte d'application
+            # (session SQLAlchemy, utilisateur dans g) au lieu de celui de la commande
+            get = (client if logged_in else anonymous).get
+            status = contextvars.Context().run(get, url).status_code
+        view_counter.discard()
+        print(f"\n== {label}  GET {url} -> {status} ({len(captured)} requêtes, budget {budget})")
+        if status != 200:
+            failures += 1
+            print(f"  ❌ statut {status}")
+        if len(captured) > budget:
+            failures += 1
+            print(f"  ❌ {len(captured)} requêtes pour un budget de {budget}")
+        seen = set()
+        for statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            result = query_audit.explain(engine, statement, parameters, tables)
+            first_line = " ".join(statement.split())[:110]
+            if result["seq_scans"]:
+                failures += 1
+                print(f"  ❌ parcours séquentiel de {', '.join(result['seq_scans'])}: {first_line}")
+            elif result["sorts"]:
+                print(f"  ⚠️  tri sans index ({'; '.join(result['sorts'])}): {first_line}")
+            else:
+                print(f"  ✅ {first_line}")
+            if verbose:
+                for line in result["plan"]:
+                    print(f"       {line}")
+
+    if failures:
+        print(f"\n❌ {failures} problème(s) : parcours séquentiel, budget de requêtes ou statut")
+        sys.exit(1)
+    print("\n✅ Aucun parcours séquentiel, budgets de requêtes respectés")
 
 @app.cli.command()
 def init_database():
@@ -0,0 +1,123 @@
+# http_cache.py
+# Requêtes conditionnelles et compression des réponses : ETag faibles calculés
+# à partir des données déjà chargées (sans sérialiser la réponse), réponses
+# 304 Not Modified, en-têtes Cache-Control par route, et compression gzip ou
+# brotli négociée avec Accept-Encoding au-delà d'une taille minimale.
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import make_response, request, session
+
+try:
+    import brotli
+except ImportError:  # brotli absent : gzip seulement
+    brotli = None
+
+COMPRESSIBLE = {
+    "text/html", "text/plain", "text/css", "text/javascript", "application/javascript",
+    "application/json", "image/svg+xml", "application/vnd.apple.mpegurl",
+}
+
+
+def weak_etag(*parts) -> str:
+    """Valeur d'ETag (sans ``W/``) dérivée de ``parts`` : identifiants, dates, compteurs"""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+class HttpCache:
+    """Branche les 304 et la compression sur une application Flask.
+
+    Les variantes compressées des réponses qui portent un ETag sont gardées
+    dans un petit LRU indexé par l'empreinte du corps : une page en cache
+    n'est compressée qu'une fois par encodage tant qu'elle ne change pas.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, cache_size=256):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._compressed = OrderedDict()  # (empreinte du corps, encodage) -> octets
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    def respond(self, etag, cache_control, render, vary=()):
+        """Réponse 304 si le client a déjà ``etag``, sinon ``render()`` avec ETag et Cache-Control"""
+        if "_flashes" in session:
+            return make_response(render())  # message à usage unique : la page doit être rendue
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(render())
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = cache_control
+        for header in vary:
+            response.vary.add(header)
+        return response
+
+    def _after_request(self, response):
+        if request.method not in ("GET", "HEAD"):
+            return response
+        if response.status_code == 304:
+            self.not_modified += 1
+            return response
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+        if response.get_etag()[0]:
+            response.make_conditional(request)
+            if response.status_code == 304:
+                self.not_modified += 1
+                return response
+        if response.mimetype not in COMPRESSIBLE or "Content-Encoding" in response.headers:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        offered = ("br", "gzip") if brotli is not None else ("gzip",)
+        encoding = request.accept_encodings.best_match(offered)
+        if encoding is None:
+            return response
+        response.set_data(self._compress(body, encoding, cache=bool(response.get_etag()[0])))
+        response.headers["Content-Encoding"] = encoding
+        self.compressed += 1
+        self.bytes_in += len(body)
+        self.bytes_out += response.content_length
+        return response
+
+    def _compress(self, body, encoding, cache):
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding) if cache else None
+        if cache:
+            with self._lock:
+                data = self._compressed.get(key)
+                if data is not None:
+                    self._compressed.move_to_end(key)
+                    return data
+        if encoding == "br":
+            data = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            data = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if cache:
+            with self._lock:
+                self._compressed[key] = data
+                while len(self._compressed) > self.cache_size:
+                    self._compressed.popitem(last=False)
+        return data
+
+    def stats(self):
+        return {
+            "not_modified": self.not_modified,
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.bytes_out / self.bytes_in if self.bytes_in else 0.0,
+            "brotli": brotli is not None,
+        }
@@ -0,0 +1,245 @@
+# jobs.py
+# File de tâches de fond durable, stockée dans la base de l'application (pas de
+# broker externe). Les tâches sont réservées par une seule requête UPDATE
+# atomique, retentées avec un délai exponentiel et dédupliquées par clé
+# d'idempotence. Pendant l'exécution, un battement de cœur renouvelle le bail
+# de la tâche : seules les tâches d'un worker disparu sont remises en file.
+import contextlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """File de tâches sur le modèle ``model`` (table jobs).
+
+    ``session`` est la session SQLAlchemy (scoped) de l'application et
+    ``context`` une fabrique de contexte (``app.app_context``) ouvert autour de
+    chaque tâche exécutée par un worker. Le bail d'une tâche en cours
+    (``locked_at``) est renouvelé toutes les ``heartbeat_interval`` secondes
+    (par défaut un quart de ``lock_timeout``).
+    """
+
+    def __init__(self, model, session, context, max_attempts=5, backoff_base=5.0,
+                 backoff_max=600.0, lock_timeout=3600.0, poll_interval=1.0,
+                 heartbeat_interval=None):
+        self.model = model
+        self.session = session
+        self.context = context
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or lock_timeout / 4
+        self.handlers = {}
+
+    def handler(self, kind, max_attempts=None, on_failure=None):
+        """Enregistre la fonction qui exécute les tâches ``kind``.
+
+        Elle reçoit le payload en arguments nommés. ``on_failure(payload, error)``
+        est appelée quand la tâche a épuisé ses tentatives.
+        """
+        def register(fn):
+            self.handlers[kind] = (fn, max_attempts, on_failure)
+            return fn
+        return register
+
+    def enqueue(self, kind, payload=None, key=None, delay=0, max_attempts=None):
+        """Ajoute une tâche dans la transaction en cours (validée par l'appelant).
+
+        Avec ``key``, une tâche déjà enregistrée sous cette clé est retournée
+        telle quelle au lieu d'en créer une seconde.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Type de tâche inconnu: {kind}")
+        if key is not None:
+            existing = self.session.query(self.model).filter_by(idempotency_key=key).first()
+            if existing is not None:
+                return existing
+        default_attempts = self.handlers[kind][1] or self.max_attempts
+        job = self.model(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            idempotency_key=key,
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max_attempts or default_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+        try:
+            with self.session.begin_nested():
+                self.session.add(job)
+        except IntegrityError:
+            # Même clé insérée en parallèle par une autre requête
+            return self.session.query(self.model).filter_by(idempotency_key=key).one()
+        return job
+
+    def backoff(self, attempts):
+        """Délai avant la tentative suivante : exponentiel, plafonné, avec gigue"""
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def claim(self, worker_id, kinds=None):
+        """Réserve la prochaine tâche due ; retourne son id ou None.
+
+        Le SELECT imbriqué dans l'UPDATE rend la réservation atomique : deux
+        workers ne peuvent pas prendre la même tâche (SKIP LOCKED sous
+        PostgreSQL, écritures sérialisées sous SQLite).
+        """
+        t = self.model.__table__
+        now = datetime.utcnow()
+        due = (
+            select(t.c.id)
+            .where(t.c.status == QUEUED, t.c.run_at <= now)
+            .order_by(t.c.run_at, t.c.id)
+            .limit(1)
+        )
+        if kinds:
+            due = due.where(t.c.kind.in_(kinds))
+        if self.session.get_bind().dialect.name == "postgresql":
+            due = due.with_for_update(skip_locked=True)
+        job_id = self.session.execute(
+            update(t)
+            .where(t.c.id == due.scalar_subquery(), t.c.status == QUEUED)
+            .values(status=RUNNING, attempts=t.c.attempts + 1, locked_by=worker_id,
+                    locked_at=now, updated_at=now)
+            .returning(t.c.id)
+        ).scalar()
+        self.session.commit()
+        return job_id
+
+    def requeue_stale(self):
+        """Remet en file les tâches dont le worker a disparu (tué, OOM...)"""
+        t = self.model.__table__
+        now = datetime.utcnow()
+        limit = now - timedelta(seconds=self.lock_timeout)
+        stale = (t.c.status == RUNNING, t.c.locked_at < limit)
+        failed = self.session.execute(
+            update(t).where(*stale, t.c.attempts >= t.c.max_attempts)
+            .values(status=FAILED, locked_by=None, updated_at=now, finished_at=now,
+                    last_error="Worker disparu pendant l'exécution")
+        ).rowcount
+        requeued = self.session.execute(
+            update(t).where(*stale)
+            .values(status=QUEUED, locked_by=None, run_at=now, updated_at=now)
+        ).rowcount
+        self.session.commit()
+        return requeued + failed
+
+    @contextlib.contextmanager
+    def heartbeat(self, job_id, worker_id):
+        """Renouvelle le bail de la tâche depuis un thread tant que le bloc s'exécute.
+
+        Le thread écrit sur sa propre connexion : la transaction du handler
+        n'est pas touchée. Le bail n'est renouvelé que si la tâche appartient
+        toujours à ``worker_id``.
+        """
+        t = self.model.__table__
+        engine = self.session.get_bind()
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(
+                            update(t)
+                            .where(t.c.id == job_id, t.c.status == RUNNING, t.c.locked_by == worker_id)
+                            .values(locked_at=datetime.utcnow())
+                        )
+                except Exception as e:
+                    print(f"Erreur battement de cœur tâche #{job_id}: {e}")
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run(self, job_id):
+        """Exécute la tâche réservée ``job_id`` et enregistre son issue"""
+        job = self.session.get(self.model, job_id)
+        payload = json.loads(job.payload or "{}")
+        fn, _, on_failure = self.handlers.get(job.kind, (None, None, None))
+        try:
+            if fn is None:
+                raise LookupError(f"Aucun handler pour {job.kind}")
+            with self.heartbeat(job_id, job.locked_by):
+                result = fn(**payload)
+        except Exception as e:
+            self.session.rollback()
+            job = self.session.get(self.model, job_id)
+            now = datetime.utcnow()
+            job.last_error = "".join(traceback.format_exception_only(type(e), e)).strip()[:2000]
+            job.locked_by = None
+            job.updated_at = now
+            dead = job.attempts >= job.max_attempts
+            if dead:
+                job.status, job.finished_at = FAILED, now
+            else:
+                job.status = QUEUED
+                job.run_at = now + timedelta(seconds=self.backoff(job.attempts))
+            self.session.commit()
+            print(f"Erreur tâche {job.kind} #{job_id} (tentative {job.attempts}/{job.max_attempts}): {e}")
+            if dead and on_failure is not None:
+                try:
+                    on_failure(payload, e)
+                    self.session.commit()
+                except Exception as hook_error:
+                    self.session.rollback()
+                    print(f"Erreur on_failure {job.kind} #{job_id}: {hook_error}")
+            return False
+        job.status = DONE
+        job.result = json.dumps(result) if result is not None else None
+        job.locked_by = None
+        job.finished_at = job.updated_at = datetime.utcnow()
+        self.session.commit()
+        return True
+
+    def work(self, stop, kinds=None, burst=False):
+        """Boucle d'un worker jusqu'à ``stop.is_set()`` (ou file vide si ``burst``)"""
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        last_reap = 0.0
+        processed = 0
+        while not stop.is_set():
+            with self.context():
+                if time.monotonic() - last_reap > 60:
+                    self.requeue_stale()
+                    last_reap = time.monotonic()
+                job_id = self.claim(worker_id, kinds)
+                if job_id is not None:
+                    self.run(job_id)
+                    processed += 1
+                    continue
+            if burst:
+                break
+            stop.wait(self.poll_interval)
+        return processed
+
+    def stats(self):
+        """Nombre de tâches par (type, statut) et retard de la plus ancienne tâche due"""
+        t = self.model.__table__
+        counts = {}
+        for kind, status, n in self.session.execute(
+            select(t.c.kind, t.c.status, func.count()).group_by(t.c.kind, t.c.status)
+        ):
+            counts.setdefault(kind, {})[status] = n
+        oldest = self.session.execute(
+            select(t.c.run_at).where(t.c.status == QUEUED, t.c.run_at <= datetime.utcnow())
+            .order_by(t.c.run_at).limit(1)
+        ).scalar()
+        lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+        return {"counts": counts, "queue_lag": lag}
@@ -1,4 +1,4 @@
-from home import app, db, User  # ⚠️ on réutilise app et db existants
+from home import app, db, User, invalidate_user  # ⚠️ on réutilise app et db existants
 
 email = "tonemail@example.com"  # <-- Mets ici ton email d'utilisateur déjà inscrit
 
@@ -7,6 +7,7 @@ with app.app_context():
     if user:
         user.is_admin = True
         db.session.commit()
+        invalidate_user(user.id)
         print(f"✅ Utilisateur {email} est maintenant admin.")
     else:
         print(f"❌ Utilisateur {email} introuvable.")
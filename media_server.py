@@ -0,0 +1,91 @@
+# media_server.py
+# Envoi de fichiers vidéo locaux avec HTTP Range (206), ETag / Last-Modified /
+# If-Range, sans jamais lire le fichier en entier côté Python.
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.http import http_date, quote_etag
+
+READ_SIZE = 64 * 1024
+
+
+def _read_range(fh, length):
+    """Itère sur ``length`` octets à partir de la position courante de ``fh``"""
+    try:
+        while length > 0:
+            buf = fh.read(min(READ_SIZE, length))
+            if not buf:
+                break
+            length -= len(buf)
+            yield buf
+    finally:
+        fh.close()
+
+
+def _body(environ, fh, start, length, size):
+    """Corps de réponse positionné sur ``start``.
+
+    ``wsgi.file_wrapper`` permet à gunicorn d'utiliser sendfile (zéro copie) en
+    bornant l'envoi au Content-Length. Les autres serveurs lisent jusqu'à la fin
+    du fichier : on ne leur confie le wrapper que si la plage va jusqu'au bout.
+    """
+    fh.seek(start)
+    wrapper = environ.get("wsgi.file_wrapper")
+    if wrapper and (start + length == size or environ.get("SERVER_SOFTWARE", "").startswith("gunicorn")):
+        return wrapper(fh, READ_SIZE)
+    return _read_range(fh, length)
+
+
+def send_media(request, path, max_age=31536000):
+    """Réponse 200/206/304/416 pour le fichier ``path`` (qui doit exister)"""
+    st = os.stat(path)
+    size = st.st_size
+    etag = f"{st.st_mtime_ns:x}-{size:x}"
+    last_modified = datetime.fromtimestamp(int(st.st_mtime), tz=timezone.utc)
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": quote_etag(etag),
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+
+    # Requête conditionnelle : le client a déjà cette version
+    if request.if_none_match:
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+    elif request.if_modified_since and request.if_modified_since >= last_modified:
+        return Response(status=304, headers=headers)
+
+    # If-Range : la plage n'est valable que si le fichier n'a pas changé
+    byte_range = request.range
+    if byte_range is not None and "If-Range" in request.headers:
+        if_range = request.if_range
+        if if_range.etag is not None:
+            valid = if_range.etag == etag
+        else:
+            valid = if_range.date is not None and if_range.date >= last_modified
+        if not valid:
+            byte_range = None
+
+    start, end, status = 0, size, 200
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            if len(byte_range.ranges) == 1:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status=416, headers=headers)
+            # Plusieurs plages (rare pour la vidéo) : on renvoie le fichier entier
+        else:
+            start, end = bounds
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    length = end - start
+    headers["Content-Length"] = str(length)
+    fh = open(path, "rb")
+    body = _body(request.environ, fh, start, length, size)
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
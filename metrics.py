@@ -0,0 +1,331 @@
+# metrics.py
+# Mesures par requête (temps SQL, nombre de requêtes, rendu des templates) et
+# export au format texte Prometheus, sans dépendance externe. Chaque worker
+# gunicorn écrit périodiquement un instantané dans un dossier partagé ; /metrics
+# additionne ceux des workers encore vivants.
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+
+from flask import before_render_template, g, request, template_rendered
+from sqlalchemy import event
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Mesures de la requête HTTP en cours (None hors requête : CLI, workers de tâches)
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+class RequestStats:
+    __slots__ = ("start", "db_count", "db_time", "template_time", "template_start")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_start = None
+
+
+class Registry:
+    """Compteurs et histogrammes d'un processus, étiquetés par endpoint"""
+
+    def __init__(self, snapshot_dir, flush_interval=5.0):
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self.gauge_fns = []  # fonctions -> {(nom, étiquettes): valeur}, lues à chaque instantané
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_flush = 0.0
+        self._reset()
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self.counters = {}    # (nom, étiquettes) -> valeur
+        self.histograms = {}  # (nom, étiquettes) -> [compte par bucket..., +Inf, somme]
+
+    def _check_pid(self):
+        # Après un fork, le worker repart de zéro au lieu d'hériter des valeurs du maître
+        if self._pid != os.getpid():
+            self._reset()
+
+    def record(self, increments=(), observations=()):
+        """Applique des ``(nom, étiquettes, valeur)`` aux compteurs et aux histogrammes, sous un seul verrou"""
+        with self._lock:
+            self._check_pid()
+            counters = self.counters
+            for name, labels, value in increments:
+                key = (name, labels)
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in observations:
+                key = (name, labels)
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+                hist[bisect.bisect_left(BUCKETS, value)] += 1
+                hist[-1] += value
+
+    def inc(self, name, labels, value=1):
+        self.record(increments=((name, labels, value),))
+
+    def observe(self, name, labels, value):
+        self.record(observations=((name, labels, value),))
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.snapshot_dir, f"{pid}.json")
+
+    def maybe_flush(self):
+        """Écrit l'instantané du processus, au plus une fois par ``flush_interval``"""
+        now = time.monotonic()
+        if now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._check_pid()
+            data = {
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, list(l), h] for (n, l), h in self.histograms.items()],
+            }
+        gauges = {}
+        for fn in self.gauge_fns:
+            gauges.update(fn())
+        data["gauges"] = [[n, list(l), v] for (n, l), v in gauges.items()]
+        path = self._snapshot_path(self._pid)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(data, fh)
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Valeurs additionnées de tous les workers vivants (instantanés périmés supprimés)"""
+        self.flush()
+        counters, gauges, histograms = {}, {}, {}
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(".json"):
+                continue
+            pid = int(name[:-5])
+            path = os.path.join(self.snapshot_dir, name)
+            if not _alive(pid):
+                _remove(path)
+                continue
+            try:
+                with open(path) as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for field, totals in (("counters", counters), ("gauges", gauges)):
+                for n, l, v in data.get(field, ()):
+                    key = (n, tuple(map(tuple, l)))
+                    totals[key] = totals.get(key, 0) + v
+            for n, l, h in data["histograms"]:
+                key = (n, tuple(map(tuple, l)))
+                total = histograms.setdefault(key, [0] * len(h))
+                for i, v in enumerate(h):
+                    total[i] += v
+        return counters, gauges, histograms
+
+
+def _alive(pid):
+    """Le processus ``pid`` existe-t-il ? En cas de doute, on le suppose vivant"""
+    try:
+        if os.name == "nt":
+            return _alive_windows(pid)
+        os.kill(pid, 0)  # signal 0 : simple test d'existence sous POSIX
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # PermissionError (processus d'un autre utilisateur) ou échec du test
+    return True
+
+
+def _alive_windows(pid):
+    # Sous Windows, os.kill(pid, 0) enverrait CTRL_C_EVENT au groupe de la console
+    import ctypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = ctypes.c_void_p
+    handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+    if not handle:
+        return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED : le processus existe
+    try:
+        code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(ctypes.c_void_p(handle), ctypes.byref(code)):
+            return True
+        return code.value == 259  # STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(ctypes.c_void_p(handle))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render(counters, gauges, histograms, help_texts):
+    """Format texte d'exposition Prometheus (version 0.0.4)"""
+    lines = []
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, ("counter", []))[1].append((labels, value))
+    for (name, labels), value in gauges.items():
+        by_name.setdefault(name, ("gauge", []))[1].append((labels, value))
+    for name in sorted(by_name):
+        kind, samples = by_name[name]
+        lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples):
+            lines.append(f"{name}{_labels(labels)} {value}")
+    hist_names = sorted({name for name, _ in histograms})
+    for name in hist_names:
+        lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), hist[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {hist[-1]}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class Instrumentation:
+    """Branche les mesures sur une application Flask et son moteur SQLAlchemy.
+
+    ``server_timing`` est un prédicat appelé à chaque réponse : l'en-tête
+    Server-Timing n'est ajouté que s'il retourne vrai (None : jamais).
+    """
+
+    HELP = {
+        "ashn_http_requests_total": "Requêtes HTTP par endpoint, méthode et statut",
+        "ashn_http_errors_total": "Réponses 5xx par endpoint",
+        "ashn_http_request_duration_seconds": "Durée des requêtes HTTP par endpoint",
+        "ashn_db_queries_total": "Requêtes SQL exécutées pendant les requêtes HTTP, par endpoint",
+        "ashn_db_duration_seconds_total": "Temps passé dans les requêtes SQL, par endpoint",
+        "ashn_template_duration_seconds_total": "Temps de rendu des templates, par endpoint",
+        "ashn_db_pool_size": "Taille des pools de connexions (somme des workers)",
+        "ashn_db_pool_checked_out": "Connexions empruntées au pool (somme des workers)",
+        "ashn_db_pool_overflow": "Connexions ouvertes au-delà de la taille du pool (somme des workers)",
+    }
+
+    def __init__(self, registry, server_timing=None):
+        self.registry = registry
+        self.server_timing = server_timing
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def init_engine(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    # SQL
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None and context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        start = getattr(context, "_metrics_start", None)
+        if stats is not None and start is not None:
+            stats.db_count += 1
+            stats.db_time += time.perf_counter() - start
+
+    # Templates (les gabarits inclus sont comptés dans leur parent)
+    @staticmethod
+    def _before_render(sender, template, context, **extra):
+        stats = _current.get()
+        if stats is not None and stats.template_start is None:
+            stats.template_start = (template, time.perf_counter())
+
+    @staticmethod
+    def _after_render(sender, template, context, **extra):
+        stats = _current.get()
+        if stats is not None and stats.template_start and stats.template_start[0] is template:
+            stats.template_time += time.perf_counter() - stats.template_start[1]
+            stats.template_start = None
+
+    # Requête HTTP
+    def _before_request(self):
+        g._metrics_token = _current.set(RequestStats())
+
+    def _after_request(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.start
+        endpoint = request.url_rule.endpoint if request.url_rule else "<unmatched>"
+        labels = (("endpoint", endpoint),)
+        increments = [("ashn_http_requests_total",
+                       labels + (("method", request.method), ("status", str(response.status_code))), 1)]
+        if response.status_code >= 500:
+            increments.append(("ashn_http_errors_total", labels, 1))
+        if stats.db_count:
+            increments.append(("ashn_db_queries_total", labels, stats.db_count))
+            increments.append(("ashn_db_duration_seconds_total", labels, stats.db_time))
+        if stats.template_time:
+            increments.append(("ashn_template_duration_seconds_total", labels, stats.template_time))
+        self.registry.record(increments, (("ashn_http_request_duration_seconds", labels, total),))
+        if self.server_timing is not None and self.server_timing():
+            app_time = max(0.0, total - stats.db_time - stats.template_time)
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_count} SQL", '
+                f"tpl;dur={stats.template_time * 1000:.1f}, "
+                f"app;dur={app_time * 1000:.1f}, "
+                f"total;dur={total * 1000:.1f}",
+            )
+        self.registry.maybe_flush()
+        return response
+
+    @staticmethod
+    def _teardown_request(exc):
+        token = g.pop("_metrics_token", None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                _current.set(None)
+
+    def watch_pool(self, get_engine, labels=()):
+        """Publie l'occupation du pool de ``get_engine()`` à chaque instantané, avec les étiquettes ``labels``"""
+        def gauges():
+            pool = get_engine().pool
+            values = {}
+            for name, attr in (("ashn_db_pool_size", "size"), ("ashn_db_pool_checked_out", "checkedout"),
+                               ("ashn_db_pool_overflow", "overflow")):
+                fn = getattr(pool, attr, None)  # absent des pools sans file (NullPool, StaticPool)
+                if fn is not None:
+                    values[(name, labels)] = max(0, fn())
+            return values
+        self.registry.gauge_fns.append(gauges)
+
+    def exposition(self):
+        return render(*self.registry.collect(), self.HELP)
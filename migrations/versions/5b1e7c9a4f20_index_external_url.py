@@ -0,0 +1,37 @@
+"""index sur videos.external_url
+
+Clé naturelle de l'import de catalogue (flask import-videos) : chaque lot
+vérifie les URL déjà présentes avec une recherche indexée.
+
+Revision ID: 5b1e7c9a4f20
+Revises: d0dd30f6fc2d
+Create Date: 2026-10-17 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c9a4f20'
+down_revision = 'd0dd30f6fc2d'
+branch_labels = None
+depends_on = None
+
+
+def _existing(inspector):
+    if not inspector.has_table("videos"):
+        return None
+    return {ix["name"] for ix in inspector.get_indexes("videos")}
+
+
+def upgrade():
+    existing = _existing(sa.inspect(op.get_bind()))
+    if existing is not None and "ix_videos_external_url" not in existing:
+        op.create_index("ix_videos_external_url", "videos", ["external_url"])
+
+
+def downgrade():
+    existing = _existing(sa.inspect(op.get_bind()))
+    if existing and "ix_videos_external_url" in existing:
+        op.drop_index("ix_videos_external_url", table_name="videos")
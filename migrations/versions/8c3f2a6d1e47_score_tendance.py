@@ -0,0 +1,46 @@
+"""score tendance des vidéos
+
+Ajoute videos.trending_base et videos.trending et l'index ix_videos_trending.
+Les scores valent 0 après la migration : lancer ensuite `flask rebuild-trending`.
+
+Revision ID: 8c3f2a6d1e47
+Revises: 5b1e7c9a4f20
+Create Date: 2026-10-17 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f2a6d1e47'
+down_revision = '5b1e7c9a4f20'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["trending_base", "trending"]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    for name in COLUMNS:
+        if name not in existing:
+            op.add_column("videos", sa.Column(name, sa.Float(), nullable=False, server_default="0"))
+    if "ix_videos_trending" not in {ix["name"] for ix in inspector.get_indexes("videos")}:
+        op.create_index("ix_videos_trending", "videos", ["trending", "id"])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    if "ix_videos_trending" in {ix["name"] for ix in inspector.get_indexes("videos")}:
+        op.drop_index("ix_videos_trending", table_name="videos")
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    with op.batch_alter_table("videos") as batch:
+        for name in reversed(COLUMNS):
+            if name in existing:
+                batch.drop_column(name)
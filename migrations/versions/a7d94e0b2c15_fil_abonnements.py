@@ -0,0 +1,34 @@
+"""fil d'abonnements précalculé
+
+Ajoute users.feed_inbox. La table feed_inbox est créée par db.create_all()
+(init_db), comme les autres tables.
+
+Revision ID: a7d94e0b2c15
+Revises: 8c3f2a6d1e47
+Create Date: 2026-10-17 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d94e0b2c15'
+down_revision = '8c3f2a6d1e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("users"):
+        return
+    if "feed_inbox" not in {c["name"] for c in inspector.get_columns("users")}:
+        op.add_column("users", sa.Column("feed_inbox", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("users") and "feed_inbox" in {c["name"] for c in inspector.get_columns("users")}:
+        with op.batch_alter_table("users") as batch:
+            batch.drop_column("feed_inbox")
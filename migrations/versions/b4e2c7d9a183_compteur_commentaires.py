@@ -0,0 +1,38 @@
+"""compteur de commentaires des vidéos
+
+Ajoute videos.comment_count et le recalcule à partir de la table comments.
+
+Revision ID: b4e2c7d9a183
+Revises: e3b81f5c9d62
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e2c7d9a183'
+down_revision = 'e3b81f5c9d62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    if "comment_count" not in {c["name"] for c in inspector.get_columns("videos")}:
+        op.add_column("videos", sa.Column("comment_count", sa.Integer(), nullable=False, server_default="0"))
+    if inspector.has_table("comments"):
+        op.execute(
+            "UPDATE videos SET comment_count = "
+            "(SELECT COUNT(*) FROM comments WHERE comments.video_id = videos.id)"
+        )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("videos") and "comment_count" in {c["name"] for c in inspector.get_columns("videos")}:
+        with op.batch_alter_table("videos") as batch:
+            batch.drop_column("comment_count")
@@ -0,0 +1,44 @@
+"""transcodage HLS des vidéos
+
+Ajoute videos.hls_manifest et videos.transcode_status. Les vidéos déjà
+publiées sont marquées « ready » : elles restent lues depuis leur URL
+d'origine et ne sont ni relancées par `flask resume-uploads` ni affichées
+comme en cours de traitement.
+
+Revision ID: c6f1a8e3b2d4
+Revises: b4e2c7d9a183
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8e3b2d4'
+down_revision = 'b4e2c7d9a183'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    if "hls_manifest" not in existing:
+        op.add_column("videos", sa.Column("hls_manifest", sa.String(length=500), nullable=True))
+    if "transcode_status" not in existing:
+        op.add_column("videos", sa.Column("transcode_status", sa.String(length=20), nullable=True))
+    op.execute("UPDATE videos SET transcode_status = 'ready' WHERE transcode_status IS NULL OR transcode_status = ''")
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    with op.batch_alter_table("videos") as batch:
+        for name in ("transcode_status", "hls_manifest"):
+            if name in existing:
+                batch.drop_column(name)
@@ -0,0 +1,52 @@
+"""index composites des requêtes chaudes
+
+Les tables sont créées par db.create_all() (init_db) : cette révision n'ajoute
+que les index, et seulement sur les tables existantes qui ne les ont pas encore.
+
+Revision ID: d0dd30f6fc2d
+Revises:
+Create Date: 2026-10-17 09:12:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0dd30f6fc2d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (nom, table, colonnes)
+INDEXES = [
+    ("ix_videos_category_created", "videos", ["category", "created_at", "id"]),
+    ("ix_videos_user_created", "videos", ["user_id", "created_at"]),
+    ("ix_videos_created", "videos", ["created_at", "id"]),
+    ("ix_likes_video", "likes", ["video_id", "is_like"]),
+    ("ix_follows_followed", "follows", ["followed_id", "follower_id"]),
+    ("ix_users_display_name", "users", ["display_name"]),
+    ("ix_comments_video_created", "comments", ["video_id", "created_at", "id"]),
+]
+
+
+def _existing(inspector, table):
+    if not inspector.has_table(table):
+        return None
+    return {ix["name"] for ix in inspector.get_indexes(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = _existing(inspector, table)
+        if existing is not None and name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in reversed(INDEXES):
+        existing = _existing(inspector, table)
+        if existing and name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,50 @@
+"""métadonnées d'analyse des vidéos
+
+Ajoute les colonnes renseignées par l'analyse post-upload : duration_seconds,
+width, height, video_codec, audio_codec et thumb_srcset. Elles restent vides
+pour les vidéos existantes, comme pour les URLs externes.
+
+Revision ID: d8a3f5b1c7e9
+Revises: c6f1a8e3b2d4
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a3f5b1c7e9'
+down_revision = 'c6f1a8e3b2d4'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ("duration_seconds", sa.Float()),
+    ("width", sa.Integer()),
+    ("height", sa.Integer()),
+    ("video_codec", sa.String(length=20)),
+    ("audio_codec", sa.String(length=20)),
+    ("thumb_srcset", sa.String(length=2000)),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    for name, column_type in COLUMNS:
+        if name not in existing:
+            op.add_column("videos", sa.Column(name, column_type, nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("videos"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("videos")}
+    with op.batch_alter_table("videos") as batch:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch.drop_column(name)
@@ -0,0 +1,50 @@
+"""compteurs dénormalisés et handle des profils
+
+Ajoute users.handle (index unique ix_users_handle) et les compteurs
+follower_count, following_count, video_count, total_views. Lancer ensuite
+`flask repair-users` pour attribuer les handles et calculer les compteurs.
+
+Revision ID: e3b81f5c9d62
+Revises: a7d94e0b2c15
+Create Date: 2026-10-17 19:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b81f5c9d62'
+down_revision = 'a7d94e0b2c15'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ("follower_count", "following_count", "video_count", "total_views")
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("users"):
+        return
+    columns = {c["name"] for c in inspector.get_columns("users")}
+    if "handle" not in columns:
+        op.add_column("users", sa.Column("handle", sa.String(length=40), nullable=True))
+    for name in COUNTERS:
+        if name not in columns:
+            column_type = sa.BigInteger() if name == "total_views" else sa.Integer()
+            op.add_column("users", sa.Column(name, column_type, nullable=False, server_default="0"))
+    if "ix_users_handle" not in {i["name"] for i in inspector.get_indexes("users")}:
+        op.create_index("ix_users_handle", "users", ["handle"], unique=True)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("users"):
+        return
+    if "ix_users_handle" in {i["name"] for i in inspector.get_indexes("users")}:
+        op.drop_index("ix_users_handle", table_name="users")
+    columns = {c["name"] for c in inspector.get_columns("users")}
+    with op.batch_alter_table("users") as batch:
+        for name in ("handle",) + COUNTERS:
+            if name in columns:
+                batch.drop_column(name)
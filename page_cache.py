@@ -0,0 +1,77 @@
+# page_cache.py
+# Cache LRU + TTL des pages rendues (et des utilisateurs connectés). Chaque
+# entrée porte une étiquette (catégorie, utilisateur) dont la version est un
+# fichier partagé : l'invalider le touche et périme aussitôt les entrées de
+# tous les workers gunicorn de la machine.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PageCache:
+    def __init__(self, stamp_dir, maxsize=512, ttl=60):
+        self.stamp_dir = stamp_dir
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        os.makedirs(stamp_dir, exist_ok=True)
+
+    def _stamp_path(self, tag):
+        return os.path.join(self.stamp_dir, "".join(c if c.isalnum() else "_" for c in str(tag)))
+
+    def _stamp(self, tag):
+        try:
+            return os.stat(self._stamp_path(tag)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get_or_render(self, key, tag, render):
+        """Retourne la page en cache ou appelle ``render()`` et la met en cache.
+
+        La version de l'étiquette est lue avant le rendu : une invalidation
+        pendant le rendu rend l'entrée aussitôt périmée.
+        """
+        stamp = self._stamp(tag)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[1] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        value = render()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, tag):
+        """Périme toutes les entrées de l'étiquette, dans tous les processus"""
+        path = self._stamp_path(tag)
+        now = time.time_ns()
+        with open(path, "a"):
+            pass
+        # Toujours croissant, même si deux invalidations tombent dans la même tranche d'horloge
+        os.utime(path, ns=(now, max(now, self._stamp(tag) + 1)))
+        self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,76 @@
+# query_audit.py
+# Audit des plans d'exécution : capture les SELECT émis par une route puis les
+# repasse dans EXPLAIN (SQLite ou PostgreSQL) pour repérer les parcours
+# séquentiels de table et les tris sans index.
+import contextlib
+import json
+
+from sqlalchemy import event
+
+
+@contextlib.contextmanager
+def capture_selects(engine):
+    """Collecte ``(requête, paramètres)`` de chaque SELECT exécuté dans le bloc"""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def _sqlite_plan(conn, statement, parameters, tables):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    plan, scans, sorts = [], [], []
+    for row in rows:
+        detail = row[-1]
+        plan.append(detail)
+        words = detail.split()
+        # "SCAN videos" : table entière ; "SCAN videos USING INDEX ..." : parcours d'index
+        if words[0] == "SCAN" and len(words) > 1 and words[1] in tables and " USING " not in detail:
+            scans.append(words[1])
+        elif detail.startswith("USE TEMP B-TREE"):
+            sorts.append(detail)
+    return plan, scans, sorts
+
+
+def _postgres_plan(conn, statement, parameters):
+    # Sur de petites tables le planificateur préfère toujours le parcours
+    # séquentiel : on le décourage pour voir s'il existe un index utilisable.
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    root = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    plan, scans, sorts = [], [], []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        relation = node.get("Relation Name")
+        plan.append("  " * depth + node["Node Type"] + (f" on {relation}" if relation else ""))
+        if node["Node Type"] == "Seq Scan":
+            scans.append(relation)
+        elif node["Node Type"] in ("Sort", "Incremental Sort"):
+            sorts.append(f"{node['Node Type']} ({', '.join(node.get('Sort Key', []))})")
+        stack.extend((child, depth + 1) for child in reversed(node.get("Plans", [])))
+    return plan, scans, sorts
+
+
+def explain(engine, statement, parameters, tables):
+    """Plan de ``statement`` : ``{"plan": [...], "seq_scans": [...], "sorts": [...]}``"""
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            if dialect == "sqlite":
+                plan, scans, sorts = _sqlite_plan(conn, statement, parameters, tables)
+            elif dialect == "postgresql":
+                plan, scans, sorts = _postgres_plan(conn, statement, parameters)
+            else:
+                raise ValueError(f"EXPLAIN non pris en charge pour {dialect}")
+        finally:
+            trans.rollback()
+    return {"plan": plan, "seq_scans": scans, "sorts": sorts}
@@ -0,0 +1,89 @@
+# recommend.py
+# Recommandations « plus de vidéos » par co-engagement : similarité cosinus
+# entre vidéos calculée sur la matrice creuse utilisateurs × vidéos (likes,
+# commentaires). Calcul hors ligne par blocs de vidéos, mémoire bornée ; seuls
+# les K plus proches voisins de chaque vidéo sont conservés.
+import numpy as np
+from scipy import sparse
+
+
+def load_interactions(chunks):
+    """Concatène des lots ``[(user_id, video_id, poids), ...]`` en trois tableaux numpy"""
+    users, videos, weights = [], [], []
+    for rows in chunks:
+        if not rows:
+            continue
+        arr = np.asarray(rows, dtype=np.float64)
+        users.append(arr[:, 0].astype(np.int64))
+        videos.append(arr[:, 1].astype(np.int64))
+        weights.append(arr[:, 2].astype(np.float32))
+    if not users:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(users), np.concatenate(videos), np.concatenate(weights)
+
+
+def engagement_matrix(users, videos, weights, max_items_per_user=500, seed=0):
+    """Matrice utilisateurs × vidéos (CSR) et identifiants des vidéos de chaque colonne.
+
+    Les doublons (like + commentaire) s'additionnent. Chaque utilisateur est
+    pondéré par 1 / log2(2 + n) : un compte qui aime tout pèse moins qu'un
+    compte sélectif. Au-delà de ``max_items_per_user`` vidéos, un échantillon
+    est tiré (le coût d'un utilisateur est quadratique en son nombre de vidéos).
+    """
+    video_ids, cols = np.unique(videos, return_inverse=True)
+    _, rows = np.unique(users, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (weights, (rows, cols)), shape=(rows.max() + 1 if len(rows) else 0, len(video_ids)), dtype=np.float32
+    )
+    matrix.sum_duplicates()
+
+    counts = np.diff(matrix.indptr)
+    heavy = np.flatnonzero(counts > max_items_per_user)
+    if len(heavy):
+        rng = np.random.default_rng(seed)
+        keep = np.ones(matrix.nnz, dtype=bool)
+        for row in heavy:
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            drop = rng.choice(end - start, size=end - start - max_items_per_user, replace=False)
+            keep[start + drop] = False
+        matrix = sparse.csr_matrix(
+            (matrix.data[keep], matrix.indices[keep], np.concatenate(([0], np.cumsum(
+                np.minimum(counts, max_items_per_user))))),
+            shape=matrix.shape,
+        )
+        counts = np.diff(matrix.indptr)
+
+    damping = (1.0 / np.log2(2.0 + counts)).astype(np.float32)
+    matrix = sparse.diags(damping) @ matrix
+    return matrix.tocsc(), video_ids
+
+
+def top_neighbours(matrix, video_ids, k=20, block_size=500, min_score=0.0):
+    """Itère sur ``(video_id, [(voisin_id, score), ...])``, voisins triés par score décroissant.
+
+    Les similarités sont calculées par blocs de ``block_size`` vidéos : la
+    mémoire dépend de la taille du bloc, pas du nombre total de vidéos.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inv_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+    scaled = matrix @ sparse.diags(inv_norms)
+    scaled_t = scaled.T.tocsr()
+    n = matrix.shape[1]
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        sims = (scaled_t[start:end] @ scaled).tocsr()
+        for offset in range(end - start):
+            item = start + offset
+            lo, hi = sims.indptr[offset], sims.indptr[offset + 1]
+            cols = sims.indices[lo:hi]
+            scores = sims.data[lo:hi]
+            mask = (cols != item) & (scores > min_score)
+            cols, scores = cols[mask], scores[mask]
+            if not len(cols):
+                continue
+            if len(cols) > k:
+                best = np.argpartition(-scores, k - 1)[:k]
+                cols, scores = cols[best], scores[best]
+            order = np.lexsort((video_ids[cols], -scores))
+            yield int(video_ids[item]), [(int(video_ids[c]), float(s)) for c, s in zip(cols[order], scores[order])]
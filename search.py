@@ -0,0 +1,92 @@
+# search.py
+# Recherche plein texte sur les vidéos (titre, créateur, description) :
+# table virtuelle FTS5 sous SQLite, colonne tsvector + index GIN sous PostgreSQL.
+import re
+
+from sqlalchemy import Float, Integer, func, literal_column, or_, text
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+        title, creator, description,
+        content='videos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_ai AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, creator, description)
+        VALUES (new.id, new.title, new.creator, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_ad AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, creator, description)
+        VALUES ('delete', old.id, old.title, old.creator, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_au AFTER UPDATE OF title, creator, description ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, creator, description)
+        VALUES ('delete', old.id, old.title, old.creator, old.description);
+        INSERT INTO videos_fts(rowid, title, creator, description)
+        VALUES (new.id, new.title, new.creator, new.description);
+    END""",
+]
+
+POSTGRES_DDL = [
+    """ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(creator, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_videos_search_vector ON videos USING GIN (search_vector)",
+]
+
+
+def install(connection):
+    """Crée l'index plein texte (idempotent) et l'alimente avec les vidéos existantes"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'videos_fts'")
+        ).first()
+        for ddl in SQLITE_DDL:
+            connection.execute(text(ddl))
+        if not exists:
+            connection.execute(text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for ddl in POSTGRES_DDL:
+            connection.execute(text(ddl))
+
+
+def tokenize(q):
+    """Découpe la saisie en mots ; la syntaxe FTS de l'utilisateur est ignorée"""
+    return re.findall(r"\w+", q.lower())
+
+
+def apply_search(query, model, q, rank=True):
+    """Filtre ``query`` sur ``q`` et la trie par pertinence (si ``rank``).
+
+    Chaque mot est cherché en préfixe pour suivre la saisie au clavier. Les
+    autres bases (ou une saisie sans mot) retombent sur un ILIKE sans classement.
+    """
+    terms = tokenize(q)
+    dialect = query.session.get_bind().dialect.name
+
+    # Poids des colonnes pour le classement : titre > créateur > description
+    if terms and dialect == "sqlite":
+        hits = (
+            text(
+                "SELECT rowid AS id, bm25(videos_fts, 10.0, 5.0, 1.0) AS rank "
+                "FROM videos_fts WHERE videos_fts MATCH :match"
+            )
+            .bindparams(match=" ".join(f'"{t}"*' for t in terms))
+            .columns(id=Integer, rank=Float)
+            .subquery("hits")
+        )
+        query = query.join(hits, hits.c.id == model.id)
+        return query.order_by(hits.c.rank) if rank else query
+
+    if terms and dialect == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column("videos.search_vector")
+        query = query.filter(vector.op("@@")(tsquery))
+        return query.order_by(func.ts_rank(vector, tsquery).desc()) if rank else query
+
+    like = f"%{q}%"
+    return query.filter(or_(model.title.ilike(like), model.creator.ilike(like), model.description.ilike(like)))
@@ -7,6 +7,9 @@ call .venv\Scripts\activate
 :: Lancer Flask en arrière-plan (port 8000)
 start cmd /k "flask run --host=0.0.0.0 --port=8000"
 
+:: Lancer les workers des tâches de fond (analyse, transcodage)
+start cmd /k "flask worker"
+
 :: Attendre un peu que Flask démarre
 timeout /t 5 >nul
 
@@ -0,0 +1,340 @@
+# storage.py
+# Stockage des vidéos : backend distant (Supabase) ou local, et sessions
+# d'upload par morceaux (reprenables) stockées sur le disque du serveur.
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+COPY_BUFFER_SIZE = 64 * 1024  # taille des lectures/écritures, borne la mémoire
+
+
+class UploadError(Exception):
+    """Erreur de protocole d'upload (morceau invalide, session inconnue...)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# -------------------------
+# Backends de stockage
+# -------------------------
+class SupabaseStorage:
+    """Stockage Supabase : le fichier est envoyé en flux depuis le disque"""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+
+    def upload(self, path, local_path, content_type):
+        with open(local_path, "rb") as fh:
+            self.client.storage.from_(self.bucket).upload(path, fh, {"content-type": content_type})
+        return path
+
+    def get_public_url(self, path):
+        return self.client.storage.from_(self.bucket).get_public_url(path)
+
+    def create_signed_urls(self, paths, expires_in):
+        """URLs signées pour plusieurs fichiers en un seul appel à l'API"""
+        res = self.client.storage.from_(self.bucket).create_signed_urls(list(paths), expires_in)
+        return {item["path"]: item["signedURL"] for item in res if item.get("signedURL")}
+
+
+class LocalStorage:
+    """Stockage sur le disque local (dev / tests), même interface que SupabaseStorage"""
+
+    def __init__(self, root, base_url="/media/"):
+        self.root = root
+        self.base_url = base_url
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, path):
+        full = os.path.abspath(os.path.join(self.root, path))
+        if not full.startswith(os.path.abspath(self.root) + os.sep):
+            raise UploadError("Chemin de stockage invalide")
+        return full
+
+    def upload(self, path, local_path, content_type):
+        dest = self.path_for(path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(local_path, "rb") as src, open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        return path
+
+    def get_public_url(self, path):
+        return self.base_url + path
+
+    def create_signed_urls(self, paths, expires_in):
+        return {path: self.get_public_url(path) for path in paths}
+
+
+# -------------------------
+# Résolution des URLs (cache LRU + TTL)
+# -------------------------
+class UrlResolver:
+    """Cache LRU des URLs de lecture, indexé par chemin de stockage.
+
+    Les URLs publiques sont gardées ``ttl`` secondes ; les URLs signées
+    (``signed=True``) jusqu'à ``margin`` secondes avant leur expiration.
+    """
+
+    def __init__(self, storage, maxsize=10000, ttl=3600, signed=False, signed_expires=3600, margin=300):
+        self.storage = storage
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.signed = signed
+        self.signed_expires = signed_expires
+        self.margin = margin
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, path, now):
+        entry = self._cache.get(path)
+        if entry is None or entry[0] <= now:
+            return None
+        self._cache.move_to_end(path)
+        return entry[1]
+
+    def _put(self, path, url, now):
+        lifetime = self.signed_expires - self.margin if self.signed else self.ttl
+        self._cache[path] = (now + lifetime, url)
+        self._cache.move_to_end(path)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def resolve(self, path):
+        return self.resolve_many([path]).get(path)
+
+    def resolve_many(self, paths):
+        """Résout plusieurs chemins ; les absents du cache sont générés en un seul lot"""
+        now = time.monotonic()
+        urls, missing = {}, []
+        with self._lock:
+            for path in paths:
+                url = self._get(path, now)
+                if url is None:
+                    missing.append(path)
+                else:
+                    urls[path] = url
+            self.hits += len(urls)
+            self.misses += len(missing)
+        if missing:
+            if self.signed:
+                fresh = self.storage.create_signed_urls(missing, self.signed_expires)
+            else:
+                fresh = {path: self.storage.get_public_url(path) for path in missing}
+            with self._lock:
+                for path, url in fresh.items():
+                    self._put(path, url, now)
+            urls.update(fresh)
+        return urls
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+
+# -------------------------
+# Upload par morceaux
+# -------------------------
+class ChunkedUploadStore:
+    """Sessions d'upload reprenables.
+
+    Chaque session est un dossier ``<root>/<upload_id>/`` contenant ``meta.json``
+    et ``data.bin``. Le morceau n est écrit à l'offset ``n * chunk_size`` : le
+    renvoyer est idempotent, et un morceau interrompu est tronqué pour que le
+    client reprenne au dernier morceau complet.
+    """
+
+    def __init__(self, root, chunk_size=8 * 1024 * 1024, max_age=24 * 3600):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id):
+        try:
+            uuid.UUID(upload_id)
+        except (ValueError, TypeError):
+            raise UploadError("Session d'upload inconnue", 404)
+        return os.path.join(self.root, upload_id)
+
+    def data_path(self, upload_id):
+        return os.path.join(self._dir(upload_id), "data.bin")
+
+    def create(self, user_id, filename, total_size):
+        """Crée une session et retourne ses métadonnées"""
+        self.purge_stale()
+        upload_id = str(uuid.uuid4())
+        os.makedirs(self._dir(upload_id))
+        meta = {
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "filename": filename,
+            "total_size": int(total_size),
+            "chunk_size": self.chunk_size,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(self._dir(upload_id), "meta.json"), "w") as fh:
+            json.dump(meta, fh)
+        open(self.data_path(upload_id), "wb").close()
+        return self.status(upload_id)
+
+    def meta(self, upload_id):
+        try:
+            with open(os.path.join(self._dir(upload_id), "meta.json")) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise UploadError("Session d'upload inconnue", 404)
+
+    def status(self, upload_id):
+        meta = self.meta(upload_id)
+        received = os.path.getsize(self.data_path(upload_id))
+        meta["received"] = received
+        meta["next_part"] = received // meta["chunk_size"]
+        meta["complete"] = received == meta["total_size"]
+        return meta
+
+    def write_part(self, upload_id, part, stream, length=None):
+        """Écrit le morceau ``part`` lu depuis ``stream`` par blocs de 64 Ko"""
+        meta = self.status(upload_id)
+        chunk_size = meta["chunk_size"]
+        start = part * chunk_size
+        if part < 0 or start > meta["received"] or start >= meta["total_size"]:
+            raise UploadError(f"Morceau inattendu, reprendre au morceau {meta['next_part']}", 409)
+        expected = min(chunk_size, meta["total_size"] - start)
+        if length is not None and length != expected:
+            raise UploadError(f"Taille du morceau invalide ({expected} octets attendus)")
+
+        appending = start == meta["received"]
+        written = 0
+        with open(self.data_path(upload_id), "r+b") as fh:
+            fh.seek(start)
+            try:
+                while written < expected:
+                    buf = stream.read(min(COPY_BUFFER_SIZE, expected - written))
+                    if not buf:
+                        break
+                    fh.write(buf)
+                    written += len(buf)
+                if written != expected:
+                    raise UploadError("Morceau incomplet")
+                fh.flush()
+                os.fsync(fh.fileno())
+            except BaseException:
+                if appending:
+                    fh.truncate(start)
+                raise
+        return self.status(upload_id)
+
+    def discard(self, upload_id):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def purge_stale(self):
+        """Supprime les sessions abandonnées depuis plus de ``max_age`` secondes"""
+        limit = time.time() - self.max_age
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(os.path.join(path, "data.bin")) < limit:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+
+# -------------------------
+# Envoi en arrière-plan
+# -------------------------
+class BackgroundUploader:
+    """Envoie les fichiers vers le stockage hors de la requête HTTP.
+
+    Un pool de ``workers`` threads (par processus) fait les envois ; au-delà de
+    ``max_pending`` fichiers en attente, ``submit`` refuse (503) pour ne pas
+    remplir le disque. Chaque envoi est retenté ``attempts`` fois avec un délai
+    doublé à chaque échec, puis ``on_done(error)`` est appelé (``None`` si réussi).
+    """
+
+    def __init__(self, storage, workers=4, max_pending=64, attempts=5, backoff=2.0):
+        self.storage = storage
+        self.workers = workers
+        self.max_pending = max_pending
+        self.attempts = attempts
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.pending = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _pool(self):
+        # Créé à la demande : un pool par worker gunicorn, après le fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="storage-upload")
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, path, local_path, content_type, on_done):
+        if not self._slots.acquire(blocking=False):
+            raise UploadError("Trop d'envois en cours, réessayez dans quelques minutes", 503)
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._pool().submit(self._run, path, local_path, content_type, on_done)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def _upload(self, path, local_path, content_type):
+        """Envoie avec retentatives ; retourne la dernière erreur ou None"""
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self.storage.upload(path, local_path, content_type)
+                self.uploaded += 1
+                return None
+            except Exception as e:
+                print(f"Erreur envoi {path} (tentative {attempt}/{self.attempts}): {e}")
+                if attempt == self.attempts:
+                    self.failed += 1
+                    return e
+                self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def _run(self, path, local_path, content_type, on_done):
+        # La place n'est rendue qu'après on_done, qui supprime le fichier local
+        try:
+            error = self._upload(path, local_path, content_type)
+            try:
+                on_done(error)
+            except Exception as e:
+                print(f"Erreur après l'envoi de {path}: {e}")
+        finally:
+            self._release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
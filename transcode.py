@@ -0,0 +1,154 @@
+# transcode.py
+# Traitement des vidéos avec ffmpeg-python : analyse, miniatures WebP et
+# transcodage HLS multi-débits. Ce module n'importe pas l'application : ses
+# fonctions tournent dans les handlers de la file de tâches (analyze_video,
+# transcode_video), exécutés par les processus de `flask worker`.
+import io
+import os
+import shutil
+import uuid
+
+import ffmpeg
+from PIL import Image
+
+# Échelle des qualités : (hauteur, débit vidéo, débit max, débit audio)
+HLS_LADDER = [
+    (1080, "5000k", "5350k", "192k"),
+    (720, "2800k", "2996k", "128k"),
+    (480, "1400k", "1498k", "128k"),
+    (360, "800k", "856k", "96k"),
+]
+SEGMENT_SECONDS = 6
+KEYFRAME_SECONDS = 2  # images clés alignées entre qualités pour changer de débit
+
+
+THUMB_WIDTHS = (320, 640, 1280)
+
+
+def _kbps(rate):
+    return int(rate.rstrip("k")) * 1000
+
+
+def renditions_for(height):
+    """Qualités applicables à une source de ``height`` pixels (au moins la plus basse)"""
+    ladder = [r for r in HLS_LADDER if r[0] <= height]
+    return ladder or [HLS_LADDER[-1]]
+
+
+def probe_media(source):
+    """Lit une seule fois le conteneur : durée, résolution et codecs"""
+    info = ffmpeg.probe(source)
+    video = next((s for s in info["streams"] if s["codec_type"] == "video"), None)
+    audio = next((s for s in info["streams"] if s["codec_type"] == "audio"), None)
+    if video is None:
+        raise ValueError("Aucun flux vidéo dans la source")
+    return {
+        "duration": float(info.get("format", {}).get("duration") or video.get("duration") or 0),
+        "width": int(video.get("width") or 0),
+        "height": int(video.get("height") or 0),
+        "video_codec": video.get("codec_name", ""),
+        "audio_codec": audio.get("codec_name", "") if audio else "",
+    }
+
+
+def format_duration(seconds):
+    """12.3 -> "0:12", 3725 -> "1:02:05" """
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def extract_thumbnails(source, out_dir, name, media):
+    """Extrait une image représentative et l'encode en WebP en plusieurs largeurs.
+
+    Le filtre ``thumbnail`` de ffmpeg choisit l'image la plus représentative
+    parmi un lot pris vers 10 % de la durée. Retourne ``{largeur: chemin}``.
+    """
+    at = media["duration"] * 0.1 if media["duration"] > 2 else 0
+    png, _ = (
+        ffmpeg.input(source, ss=at)
+        .filter("thumbnail", 50)
+        .output("pipe:", vframes=1, format="image2pipe", vcodec="png")
+        .run(capture_stdout=True, quiet=True)
+    )
+    frame = Image.open(io.BytesIO(png)).convert("RGB")
+    widths = [w for w in THUMB_WIDTHS if w <= frame.width] or [THUMB_WIDTHS[0]]
+    thumbs = {}
+    for width in widths:
+        height = round(frame.height * width / frame.width)
+        path = os.path.join(out_dir, f"{name}-{width}.webp")
+        frame.resize((width, height), Image.LANCZOS).save(path, "WEBP", quality=80, method=6)
+        thumbs[width] = path
+    return thumbs
+
+
+def analyze_video(source, out_dir, name):
+    """Étape post-upload : analyse du conteneur puis miniatures"""
+    os.makedirs(out_dir, exist_ok=True)
+    media = probe_media(source)
+    media["thumbnails"] = extract_thumbnails(source, out_dir, name, media)
+    return media
+
+
+def transcode_hls(source, hls_dir, name, media=None):
+    """Transcode ``source`` (chemin ou URL) en HLS dans ``hls_dir/<name>-<id>/``.
+
+    ``media`` est le résultat de probe_media() s'il est déjà connu. La source
+    n'est décodée qu'une fois (filtre split). Le résultat est écrit dans un
+    dossier temporaire puis renommé, pour que les fichiers publiés soient
+    immuables. Retourne le chemin du master playlist relatif à ``hls_dir``.
+    """
+    media = media or probe_media(source)
+    has_audio = bool(media["audio_codec"])
+    ladder = renditions_for(media["height"])
+
+    out_name = f"{name}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(hls_dir, f".{out_name}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        inp = ffmpeg.input(source)
+        split = inp.video.filter_multi_output("split", len(ladder))
+        outputs = []
+        for i, (height, bitrate, maxrate, audio_rate) in enumerate(ladder):
+            rendition_dir = os.path.join(tmp_dir, f"{height}p")
+            os.makedirs(rendition_dir)
+            streams = [split[i].filter("scale", -2, height)]
+            audio_args = {}
+            if has_audio:
+                streams.append(inp.audio)
+                audio_args = {"acodec": "aac", "b:a": audio_rate, "ac": 2}
+            outputs.append(ffmpeg.output(
+                *streams,
+                os.path.join(rendition_dir, "index.m3u8"),
+                f="hls",
+                vcodec="libx264",
+                preset="veryfast",
+                profile="main",
+                pix_fmt="yuv420p",
+                **{"b:v": bitrate, "maxrate": maxrate, "bufsize": maxrate},
+                force_key_frames=f"expr:gte(t,n_forced*{KEYFRAME_SECONDS})",
+                hls_time=SEGMENT_SECONDS,
+                hls_playlist_type="vod",
+                hls_segment_filename=os.path.join(rendition_dir, "seg_%05d.ts"),
+                **audio_args,
+            ))
+        ffmpeg.merge_outputs(*outputs).overwrite_output().run(quiet=True)
+
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+        for height, bitrate, maxrate, audio_rate in ladder:
+            bandwidth = _kbps(maxrate) + (_kbps(audio_rate) if has_audio else 0)
+            resolution = ""
+            if media["width"] and media["height"]:
+                width = media["width"] * height // media["height"] // 2 * 2
+                resolution = f",RESOLUTION={width}x{height}"
+            lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}{resolution}")
+            lines.append(f"{height}p/index.m3u8")
+        with open(os.path.join(tmp_dir, "master.m3u8"), "w") as fh:
+            fh.write("\n".join(lines) + "\n")
+
+        os.rename(tmp_dir, os.path.join(hls_dir, out_name))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return f"{out_name}/master.m3u8"
@@ -0,0 +1,127 @@
+# view_counter.py
+# Agrégation des vues en mémoire : les deltas par vidéo sont accumulés puis
+# écrits en une seule requête groupée (write-behind), au lieu d'un commit par vue.
+import atexit
+import os
+import threading
+import time
+
+
+class ViewCounter:
+    """Tampon de vues par vidéo, vidé périodiquement ou au-delà d'un seuil.
+
+    ``flush_fn(deltas)`` reçoit une liste ``[{"id": video_id, "delta": n}, ...]``
+    et doit l'écrire en base. En cas d'échec, les deltas sont réinjectés dans le
+    tampon et retentés au vidage suivant.
+    """
+
+    def __init__(self, flush_fn, interval=5.0, max_pending=1000):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._oldest = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()  # tampon plein : vidage anticipé par le thread
+        self._pid = None
+        self.flushes = 0
+        self.flushed_views = 0
+        self.errors = 0
+        self.last_flush_at = None
+        self.last_flush_duration = 0.0
+        self.last_flush_lag = 0.0
+        atexit.register(self.shutdown)
+
+    def _ensure_thread(self):
+        # Démarré à la première vue, donc dans chaque worker gunicorn après le fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = {}
+            self._oldest = None
+            self._stop.clear()
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.flush()
+
+    def add(self, video_id, n=1):
+        with self._lock:
+            self._ensure_thread()
+            self._pending[video_id] = self._pending.get(video_id, 0) + n
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_pending
+        if full:
+            # L'écriture reste hors de la requête : le thread de vidage est réveillé
+            self._wake.set()
+
+    def pending(self, video_id):
+        """Vues pas encore écrites en base pour cette vidéo"""
+        return self._pending.get(video_id, 0)
+
+    def discard(self):
+        """Oublie les vues en attente sans les écrire (requêtes d'audit)"""
+        with self._lock:
+            self._pending, self._oldest = {}, None
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                pending, oldest = self._pending, self._oldest
+                self._pending, self._oldest = {}, None
+            start = time.monotonic()
+            try:
+                self.flush_fn([{"id": vid, "delta": n} for vid, n in pending.items()])
+            except Exception as e:
+                print(f"Erreur lors du vidage des vues: {e}")
+                self.errors += 1
+                with self._lock:
+                    for vid, n in pending.items():
+                        self._pending[vid] = self._pending.get(vid, 0) + n
+                    if self._oldest is None or oldest < self._oldest:
+                        self._oldest = oldest
+                return 0
+            now = time.monotonic()
+            self.flushes += 1
+            self.flushed_views += sum(pending.values())
+            self.last_flush_at = time.time()
+            self.last_flush_duration = now - start
+            self.last_flush_lag = now - oldest
+            return len(pending)
+
+    def shutdown(self):
+        """Arrête le thread et écrit les vues restantes (appelé à la sortie du worker)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.interval)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending_videos = len(self._pending)
+            pending_views = sum(self._pending.values())
+            oldest = self._oldest
+        return {
+            "pending_videos": pending_videos,
+            "pending_views": pending_views,
+            "current_lag": time.monotonic() - oldest if oldest is not None else 0.0,
+            "flushes": self.flushes,
+            "flushed_views": self.flushed_views,
+            "errors": self.errors,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_duration": self.last_flush_duration,
+            "last_flush_lag": self.last_flush_lag,
+        }